@@ -2,6 +2,8 @@ from django.contrib import admin
 
 # Register your models here.
 from django.contrib import admin
-from .models import ClothingItem
+from .models import ClothingItem, DailyOutfit, IngestionJob
 
-admin.site.register(ClothingItem)
\ No newline at end of file
+admin.site.register(ClothingItem)
+admin.site.register(IngestionJob)
+admin.site.register(DailyOutfit)
\ No newline at end of file
@@ -1,6 +1,18 @@
+import threading
+
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class WardrobeConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'wardrobe'
+
+    def ready(self):
+        from . import signals  # noqa: F401  (connects the ClothingItem receivers)
+
+        if getattr(settings, 'WARDROBE_WARM_UP_EMBEDDING_MODEL', False):
+            from wardrobe.utils.embeddings import registry
+            # Load in the background so startup isn't blocked; the first
+            # request simply waits on the registry lock if it arrives early.
+            threading.Thread(target=registry.warm_up, name='embedding-warm-up', daemon=True).start()
@@ -1,44 +1,188 @@
+import json
+import os
+import time
+
+from django.conf import settings
 from django.core.management.base import BaseCommand
+from django.db.models import Q
 from wardrobe.models import ClothingItem
-from PIL import Image
-import open_clip
-import torch
-import os
+from wardrobe.utils.ann_index import CompressedIndex, catalog_index, resolve_backend
+from wardrobe.utils.codec import code_for, get_codec
+from wardrobe.signals import wardrobe_changed
+from wardrobe.utils.embeddings import get_embedding_model, set_inference_threads
+from wardrobe.utils.media import EMBEDDING_VARIANT, variant_path
+from wardrobe.utils.vectors import embedding_version, encode_vector
+
+
+class ImageDataset:
+    """
+    Map-style dataset of (item id, image path) pairs. Decoding and the CLIP transform run
+    in the DataLoader workers; unreadable images come back as None instead of raising.
+    """
+
+    def __init__(self, rows, preprocess):
+        self.rows = rows
+        self.preprocess = preprocess
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __getitem__(self, index):
+        from PIL import Image
+        item_id, path = self.rows[index]
+        try:
+            with Image.open(path) as image:
+                return item_id, self.preprocess(image.convert("RGB")), None
+        except Exception as e:
+            return item_id, None, str(e)
+
+
+def collate(samples):
+    import numpy as np
+    import torch
+    ok = [(item_id, tensor) for item_id, tensor, _ in samples if tensor is not None]
+    failed = [(item_id, error) for item_id, tensor, error in samples if tensor is None]
+    batch = None
+    if ok:
+        # The ONNX backends preprocess to NumPy arrays.
+        stack = torch.stack if isinstance(ok[0][1], torch.Tensor) else np.stack
+        batch = stack([tensor for _, tensor in ok])
+    return [item_id for item_id, _ in ok], batch, failed
+
 
 class Command(BaseCommand):
-    help = 'Automatically generate and save feature vectors for items missing them'
+    help = (
+        'Automatically generate and save feature vectors for items missing them. With --outdated, '
+        'also re-embed vectors from another model version, in throttled batches that go live as they finish.'
+    )
 
-    def handle(self, *args, **options):
-        model, _, preprocess = open_clip.create_model_and_transforms(
-            'ViT-B-32', pretrained='laion2b_s34b_b79k'
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=32, help='Images per forward pass')
+        parser.add_argument('--workers', type=int, default=2, help='Processes decoding and preprocessing images')
+        parser.add_argument('--threads', type=int, default=None, help='Inference threads (torch or onnxruntime)')
+        parser.add_argument('--limit', type=int, default=None, help='Stop after this many items')
+        parser.add_argument('--all', action='store_true', help='Re-embed every item, not only those missing a vector')
+        parser.add_argument(
+            '--outdated', action='store_true',
+            help='Also re-embed items whose vector comes from a different model than the configured one',
         )
-        device = "cuda" if torch.cuda.is_available() else "cpu"
-        model.to(device)
+        parser.add_argument('--sleep', type=float, default=0, help='Seconds to pause between batches (throttling)')
+        parser.add_argument('--resume', action='store_true', help='Continue after the last item in the checkpoint')
+        parser.add_argument(
+            '--checkpoint',
+            default=os.path.join(settings.MEDIA_ROOT, 'indexes', 'autofix_vectors.json'),
+            help='File recording the last committed item id',
+        )
+
+    def handle(self, *args, **options):
+        # The catalog index is rebuilt at the end, after every batch has been committed.
+        if resolve_backend() is CompressedIndex and get_codec() is None:
+            self.stdout.write(self.style.ERROR(
+                "❌ WARDROBE_ANN_BACKEND is 'pca-int8' but no codec is fitted; run `manage.py fit_embedding_codec` first."
+            ))
+            return
+
+        import torch
+        from torch.utils.data import DataLoader
+
+        version = embedding_version()
+        mode = 'all' if options['all'] else 'outdated' if options['outdated'] else 'missing'
+        items = ClothingItem.objects.exclude(image='').order_by('id')
+        if mode == 'outdated':
+            items = items.filter(Q(feature_vector__isnull=True) | ~Q(embedding_model=version))
+        elif mode == 'missing':
+            items = items.filter(feature_vector__isnull=True)
+        if options['resume']:
+            last_id = self._read_checkpoint(options['checkpoint'], mode)
+            if last_id:
+                self.stdout.write(f"Resuming after item {last_id}")
+                items = items.filter(id__gt=last_id)
 
-        items = ClothingItem.objects.filter(feature_vector__isnull=True)
+        rows = []
+        for item_id, name, variants in items.values_list('id', 'image', 'image_variants').iterator():
+            # The same downscaled copy ingestion embeds, so vectors match freshly uploaded items.
+            path = variant_path(variants, EMBEDDING_VARIANT, os.path.join(settings.MEDIA_ROOT, name))
+            if not os.path.exists(path):
+                self.stdout.write(self.style.WARNING(f"⚠️ Image not found: {path}"))
+                continue
+            rows.append((item_id, path))
+            if options['limit'] and len(rows) >= options['limit']:
+                break
 
-        if not items.exists():
-            self.stdout.write(self.style.SUCCESS("✅ All items already have feature vectors."))
+        if not rows:
+            self.stdout.write(self.style.SUCCESS(f"✅ All items already have {version} feature vectors."))
             return
 
-        for item in items:
-            try:
-                image_path = item.image.path
-                if not os.path.exists(image_path):
-                    self.stdout.write(self.style.WARNING(f"⚠️ Image not found: {image_path}"))
-                    continue
+        if options['threads']:
+            set_inference_threads(options['threads'])
+        embedding_model = get_embedding_model()
+        stats = embedding_model.stats()
+        self.stdout.write(
+            f"Loaded {version} ({stats['backend']}) in {stats['load_seconds']}s "
+            f"({stats['parameter_bytes'] / 2**20:.0f} MB of weights), "
+            f"embedding {len(rows)} items with {options['threads'] or torch.get_num_threads()} threads"
+        )
+
+        loader = DataLoader(
+            ImageDataset(rows, embedding_model.preprocess),
+            batch_size=options['batch_size'],
+            num_workers=options['workers'],
+            collate_fn=collate,
+            persistent_workers=False,
+        )
+
+        done, failures, started = 0, 0, time.perf_counter()
+        for item_ids, batch, failed in loader:
+            for item_id, error in failed:
+                failures += 1
+                self.stdout.write(self.style.ERROR(f"❌ Failed for item {item_id}: {error}"))
+            if batch is None:
+                continue
+
+            vectors = embedding_model.encode_tensor(batch)
+            updates = list(ClothingItem.objects.filter(id__in=item_ids).only('id', 'user_id'))
+            by_id = dict(zip(item_ids, vectors))
+            for item in updates:
+                item.feature_vector = encode_vector(by_id[item.id])
+                item.embedding_code, item.embedding_codec = code_for(by_id[item.id])
+                item.embedding_model = version
+            # bulk_update skips post_save: bump the batch's users' WardrobeVersion so every web
+            # worker refreshes their cached matrices and responses on its next lookup. The catalog
+            # index snapshot is only republished at the end.
+            ClothingItem.objects.bulk_update(
+                updates, ['feature_vector', 'embedding_code', 'embedding_codec', 'embedding_model'],
+            )
+            for user_id in {item.user_id for item in updates}:
+                wardrobe_changed(user_id)
+            self._write_checkpoint(options['checkpoint'], max(item_ids), mode)
 
-                image = Image.open(image_path).convert("RGB")
-                image_input = preprocess(image).unsqueeze(0).to(device)
+            done += len(updates)
+            rate = done / (time.perf_counter() - started)
+            self.stdout.write(self.style.SUCCESS(f"✔ {done}/{len(rows)} feature vectors updated ({rate:.1f} items/s)"))
+            if options['sleep']:
+                time.sleep(options['sleep'])
 
-                with torch.no_grad():
-                    features = model.encode_image(image_input)
+        if done:
+            index = catalog_index.rebuild()
+            self.stdout.write(f"Rebuilt catalog index with {len(index)} vectors")
 
-                item.feature_vector = features.cpu().tolist()[0]
-                item.save()
-                self.stdout.write(self.style.SUCCESS(f"✔ Feature vector updated for: {item.name} (ID: {item.id})"))
+        if os.path.exists(options['checkpoint']) and not options['limit']:
+            os.remove(options['checkpoint'])
+        self.stdout.write(self.style.SUCCESS(f"🎉 Auto-fix complete: {done} updated, {failures} failed."))
 
-            except Exception as e:
-                self.stdout.write(self.style.ERROR(f"❌ Failed for {item.name} (ID: {item.id}): {e}"))
+    def _read_checkpoint(self, path, mode):
+        try:
+            with open(path) as f:
+                checkpoint = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if checkpoint.get('mode') != mode:
+            return None
+        return checkpoint.get('last_id')
 
-        self.stdout.write(self.style.SUCCESS("🎉 Auto-fix complete."))
+    def _write_checkpoint(self, path, last_id, mode):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.tmp"
+        with open(tmp, 'w') as f:
+            json.dump({'last_id': last_id, 'mode': mode}, f)
+        os.replace(tmp, path)
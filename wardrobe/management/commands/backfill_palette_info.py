@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+from wardrobe.models import ClothingItem
+from wardrobe.signals import wardrobe_changed
+from wardrobe.utils.process_clothing import palette_fields
+
+FIELDS = ['primary_color', 'color_palette', 'palette_names', 'palette_families', 'palette_lab']
+
+class Command(BaseCommand):
+    help = 'Normalize stored palettes to hex and fill in colour names, families and Lab values'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Recompute items that already have palette names')
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        items = ClothingItem.objects.exclude(color_palette=None).order_by('id')
+        if not options['all']:
+            items = items.filter(palette_names=None)
+
+        batch, updated = [], 0
+        for item in items.only('id', 'user_id', *FIELDS).iterator(chunk_size=options['batch_size']):
+            for field, value in palette_fields(item.color_palette).items():
+                setattr(item, field, value)
+            batch.append(item)
+            if len(batch) >= options['batch_size']:
+                updated += self._save(batch)
+                batch = []
+        updated += self._save(batch)
+
+        self.stdout.write(self.style.SUCCESS(f"🎨 Palette info backfilled for {updated} items."))
+
+    def _save(self, batch):
+        ClothingItem.objects.bulk_update(batch, FIELDS)
+        # bulk_update sends no signals: refresh cached scores and outfits of the batch's users.
+        for user_id in {item.user_id for item in batch}:
+            wardrobe_changed(user_id)
+        return len(batch)
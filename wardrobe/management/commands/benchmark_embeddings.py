@@ -0,0 +1,92 @@
+import json
+import os
+import time
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from wardrobe.utils.embeddings import BACKENDS, registry, set_inference_threads
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp')
+
+
+class Command(BaseCommand):
+    help = 'Compare embedding backends for throughput, model size and cosine agreement with the first backend'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dir', default=os.path.join(settings.MEDIA_ROOT, 'clothes'), help='Folder of sample images')
+        parser.add_argument('--backends', default=','.join(BACKENDS), help='Comma-separated; the first is the reference')
+        parser.add_argument('--batch-size', type=int, default=8)
+        parser.add_argument('--threads', type=int, default=None, help='Inference threads')
+        parser.add_argument('--limit', type=int, default=64)
+        parser.add_argument('--json', dest='json_path', default=None, help='Also write the results here')
+
+    def handle(self, *args, **options):
+        from PIL import Image
+
+        backends = [backend.strip() for backend in options['backends'].split(',') if backend.strip()]
+        unknown = set(backends) - set(BACKENDS)
+        if unknown:
+            raise CommandError(f"Unknown backends {sorted(unknown)}; expected some of {BACKENDS}")
+
+        paths = sorted(
+            os.path.join(options['dir'], name)
+            for name in os.listdir(options['dir'])
+            if name.lower().endswith(IMAGE_EXTENSIONS)
+        )[:options['limit']]
+        if not paths:
+            self.stdout.write(self.style.WARNING(f"⚠️ No images in {options['dir']}"))
+            return
+        images = []
+        for path in paths:
+            with Image.open(path) as image:
+                images.append(image.convert('RGB'))
+
+        if options['threads']:
+            set_inference_threads(options['threads'])
+
+        results, reference = [], None
+        for backend in backends:
+            try:
+                model = registry.get(backend=backend)
+            except Exception as e:
+                self.stdout.write(self.style.ERROR(f"❌ Could not load {backend}: {e}"))
+                continue
+
+            model.encode_images(images[:1])  # warm-up
+            started = time.perf_counter()
+            vectors = []
+            for start in range(0, len(images), options['batch_size']):
+                vectors.extend(model.encode_images(images[start:start + options['batch_size']]))
+            seconds = time.perf_counter() - started
+
+            vectors = np.array(vectors, dtype=np.float32)
+            vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-8)
+            result = {
+                **model.stats(),
+                'images': len(images),
+                'images_per_second': round(len(images) / seconds, 2),
+            }
+            if reference is None:
+                reference = vectors
+            else:
+                cosine = (vectors * reference).sum(axis=1)
+                result['cosine_mean'] = round(float(cosine.mean()), 5)
+                result['cosine_min'] = round(float(cosine.min()), 5)
+            results.append(result)
+
+            self.stdout.write(
+                f"{backend:>10}: {result['images_per_second']:>7} img/s, "
+                f"{result['parameter_bytes'] / 2**20:>6.0f} MB weights, "
+                f"RSS +{result['rss_delta_bytes'] / 2**20:.0f} MB, load {result['load_seconds']}s"
+                + (f", cosine mean {result['cosine_mean']} min {result['cosine_min']}" if 'cosine_mean' in result else '')
+            )
+
+        if len(results) > 1:
+            base = results[0]['images_per_second']
+            for result in results[1:]:
+                self.stdout.write(f"{result['backend']:>10}: {result['images_per_second'] / base:.1f}x {results[0]['backend']}")
+        if options['json_path']:
+            with open(options['json_path'], 'w') as f:
+                json.dump(results, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"✅ Wrote {options['json_path']}"))
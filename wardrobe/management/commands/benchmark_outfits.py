@@ -0,0 +1,188 @@
+import json
+import platform
+import statistics
+import subprocess
+import time
+import tracemalloc
+
+import numpy as np
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+from rest_framework.test import APIClient
+from wardrobe.models import ClothingItem, DailyOutfit
+from wardrobe.signals import wardrobe_changed
+from wardrobe.utils.colors import hex_to_names
+from wardrobe.utils.compatibility import build_compatibility_matrix
+from wardrobe.utils.outfits import best_outfit, load_wardrobe
+from wardrobe.utils.process_clothing import palette_fields
+from wardrobe.utils.scoring import color_match_scores_palette
+from wardrobe.utils.vectors import embedding_version, encode_vector
+
+TYPES = ['Top', 'Bottom', 'Shoes', 'Outerwear']
+STYLES = ['casual', 'formal', 'sporty', 'streetwear']
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Time the outfit endpoints and scoring functions on synthetic wardrobes '
+        '(random embeddings and palettes, no model download). All data is rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='10,100,1000,10000', help='Comma-separated wardrobe sizes')
+        parser.add_argument('--repeat', type=int, default=10, help='Timed runs per measurement')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--dim', type=int, default=512, help='Embedding dimension')
+        parser.add_argument('--json', dest='json_path', default=None, help='Write the results here')
+
+    def handle(self, *args, **options):
+        try:
+            sizes = [int(size) for size in options['sizes'].split(',') if size.strip()]
+        except ValueError:
+            raise CommandError('--sizes must be comma-separated integers')
+
+        report = {'environment': self._environment(), 'repeat': options['repeat'], 'wardrobes': []}
+        # The synthetic users only live inside this transaction.
+        try:
+            with transaction.atomic(), override_settings(ALLOWED_HOSTS=['testserver']):
+                for size in sizes:
+                    report['wardrobes'].append(self._benchmark(size, options))
+                raise Rollback
+        except Rollback:
+            pass
+
+        for wardrobe in report['wardrobes']:
+            self.stdout.write(f"\nWardrobe of {wardrobe['size']} items (setup {wardrobe['setup_seconds']}s)")
+            for name, result in wardrobe['results'].items():
+                queries = f"{result['queries']:>4} queries" if 'queries' in result else ' ' * 12
+                self.stdout.write(
+                    f"{name:>28}: p50 {result['p50_ms']:>9} ms  p95 {result['p95_ms']:>9} ms  "
+                    f"{queries}  peak {result['peak_kb']:>9} KB"
+                )
+        if options['json_path']:
+            with open(options['json_path'], 'w') as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"✅ Wrote {options['json_path']}"))
+
+    def _benchmark(self, size, options):
+        rng = np.random.default_rng(options['seed'] + size)
+        started = time.perf_counter()
+        user = User.objects.create_user(username=f"benchmark-{size}-{options['seed']}")
+        items = ClothingItem.objects.bulk_create([
+            ClothingItem(
+                user=user,
+                name=f"synthetic {i}",
+                image=f"clothes/synthetic-{i}.jpg",
+                clothing_type=TYPES[i % len(TYPES)],
+                style=STYLES[rng.integers(len(STYLES))],
+                feature_vector=encode_vector(rng.normal(size=options['dim'])),
+                embedding_model=embedding_version(),
+                **palette_fields(_random_palette(rng)),
+            )
+            for i in range(size)
+        ], batch_size=1000)
+        setup_seconds = round(time.perf_counter() - started, 2)
+
+        client = APIClient()
+        client.force_authenticate(user)
+        base = next(item for item in items if item.clothing_type == 'Top')
+
+        def drop_caches():
+            # Only the synthetic user's entries: the 'recommendations' cache is shared
+            # with the running app, and clearing it would flush everyone's responses.
+            wardrobe_changed(user.id)
+            DailyOutfit.objects.filter(user=user).delete()
+
+        def request(method, path, data=None):
+            def call():
+                response = getattr(client, method)(path, data, format='json')
+                if response.status_code not in (200, 400):
+                    raise CommandError(f"{path} returned {response.status_code}: {response.content[:200]}")
+            return call
+
+        endpoints = {
+            'generate_outfit': request('post', '/api/clothing/generate_outfit/', {'base_item_id': base.id}),
+            'similar': request('get', f'/api/clothing/{base.id}/similar/'),
+            'outfit_of_the_day': request('get', '/api/clothing/outfit-of-the-day/'),
+        }
+        results = {}
+        for name, call in endpoints.items():
+            results[f"{name}.cold"] = self._measure(call, options['repeat'], before=drop_caches)
+            results[f"{name}.cached"] = self._measure(call, options['repeat'])
+
+        wardrobe = load_wardrobe(user.id)
+        matrix = build_compatibility_matrix(user.id)
+        palettes = [item.color_palette for item in wardrobe]
+        names = [item.palette_names for item in wardrobe]
+        results['load_wardrobe'] = self._measure(lambda: load_wardrobe(user.id), options['repeat'])
+        results['compatibility_matrix'] = self._measure(lambda: build_compatibility_matrix(user.id), options['repeat'])
+        results['compatibility_row'] = self._measure(
+            lambda: matrix._compute_row(matrix.position[base.id]), options['repeat'],
+        )
+        results['best_outfit'] = self._measure(lambda: best_outfit(base, wardrobe, matrix), options['repeat'])
+        results['palette_scores'] = self._measure(
+            lambda: color_match_scores_palette(base.color_palette, palettes, base.palette_names, names),
+            options['repeat'],
+        )
+        results['hex_to_names'] = self._measure(
+            lambda: hex_to_names(_random_palette(rng)), options['repeat'], queries=False,
+        )
+        return {'size': size, 'setup_seconds': setup_seconds, 'results': results}
+
+    def _measure(self, call, repeat, before=None, queries=True):
+        """
+        Latency percentiles over `repeat` runs, then the query count and peak traced
+        memory of one more run (tracing is too slow to leave on while timing).
+        """
+        timings = []
+        for _ in range(repeat):
+            if before:
+                before()
+            started = time.perf_counter()
+            call()
+            timings.append((time.perf_counter() - started) * 1000)
+
+        if before:
+            before()
+        tracemalloc.start()
+        with CaptureQueriesContext(connection) as captured:
+            call()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        timings.sort()
+        result = {
+            'p50_ms': round(statistics.median(timings), 3),
+            'p95_ms': round(timings[min(len(timings) - 1, int(0.95 * len(timings)))], 3),
+            'max_ms': round(timings[-1], 3),
+            'peak_kb': round(peak / 1024, 1),
+        }
+        if queries:
+            result['queries'] = len(captured)
+        return result
+
+    def _environment(self):
+        try:
+            commit = subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, cwd=settings.BASE_DIR,
+            ).stdout.strip() or None
+        except OSError:
+            commit = None
+        return {
+            'commit': commit,
+            'database': connection.vendor,
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'machine': platform.machine(),
+        }
+
+
+def _random_palette(rng, size=5):
+    return ['#{:02x}{:02x}{:02x}'.format(*rgb) for rgb in rng.integers(0, 256, size=(size, 3))]
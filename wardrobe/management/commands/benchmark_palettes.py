@@ -0,0 +1,108 @@
+import json
+import os
+import statistics
+import time
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from wardrobe.utils.colors import ciede2000, describe_palette, rgb_to_lab
+from wardrobe.utils.palette import PALETTE_METHODS, extract_palette
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp')
+
+
+class Command(BaseCommand):
+    help = 'Compare the NumPy palette extractor with ColorThief for speed and palette agreement'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dir', default=os.path.join(settings.MEDIA_ROOT, 'clothes'), help='Folder of sample images')
+        parser.add_argument('--colors', type=int, default=5)
+        parser.add_argument('--method', choices=PALETTE_METHODS, default='kmeans')
+        parser.add_argument('--no-mask', action='store_true', help='Disable background masking')
+        parser.add_argument('--limit', type=int, default=None)
+        parser.add_argument('--json', dest='json_path', default=None, help='Also write per-image results here')
+
+    def handle(self, *args, **options):
+        from colorthief import ColorThief
+
+        paths = sorted(
+            os.path.join(options['dir'], name)
+            for name in os.listdir(options['dir'])
+            if name.lower().endswith(IMAGE_EXTENSIONS)
+        )[:options['limit']]
+        if not paths:
+            self.stdout.write(self.style.WARNING(f"⚠️ No images in {options['dir']}"))
+            return
+
+        results = []
+        for path in paths:
+            started = time.perf_counter()
+            try:
+                reference = ColorThief(path).get_palette(color_count=options['colors'])
+            except Exception as e:
+                self.stdout.write(self.style.ERROR(f"❌ ColorThief failed on {path}: {e}"))
+                continue
+            colorthief_seconds = time.perf_counter() - started
+
+            started = time.perf_counter()
+            palette = extract_palette(
+                path, num_colors=options['colors'], method=options['method'],
+                mask_background=not options['no_mask'],
+            )
+            numpy_seconds = time.perf_counter() - started
+            if not palette:
+                continue
+
+            results.append({
+                'image': os.path.basename(path),
+                'colorthief_ms': round(colorthief_seconds * 1000, 2),
+                'numpy_ms': round(numpy_seconds * 1000, 2),
+                'primary_delta_e': round(float(ciede2000(rgb_to_lab(reference[0]), rgb_to_lab(palette[0]))), 2),
+                'palette_delta_e': round(_palette_distance(reference, palette), 2),
+                'same_family': _family(reference[0]) == _family(palette[0]),
+                'colorthief': [_hex(c) for c in reference],
+                'numpy': [_hex(c) for c in palette],
+            })
+
+        if not results:
+            self.stdout.write(self.style.WARNING("⚠️ Nothing to compare."))
+            return
+
+        colorthief_ms = [r['colorthief_ms'] for r in results]
+        numpy_ms = [r['numpy_ms'] for r in results]
+        summary = {
+            'images': len(results),
+            'method': options['method'],
+            'mask_background': not options['no_mask'],
+            'colorthief_median_ms': round(statistics.median(colorthief_ms), 2),
+            'numpy_median_ms': round(statistics.median(numpy_ms), 2),
+            'speedup': round(sum(colorthief_ms) / sum(numpy_ms), 1),
+            'primary_delta_e_median': round(statistics.median(r['primary_delta_e'] for r in results), 2),
+            'palette_delta_e_median': round(statistics.median(r['palette_delta_e'] for r in results), 2),
+            'same_primary_family': round(sum(r['same_family'] for r in results) / len(results), 3),
+        }
+
+        for key, value in summary.items():
+            self.stdout.write(f"{key:>24}: {value}")
+        if options['json_path']:
+            with open(options['json_path'], 'w') as f:
+                json.dump({'summary': summary, 'images': results}, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"✅ Wrote {options['json_path']}"))
+
+
+def _hex(rgb):
+    return '#{:02x}{:02x}{:02x}'.format(*rgb)
+
+
+def _family(rgb):
+    return describe_palette([_hex(rgb)])['families'][0]
+
+
+def _palette_distance(a, b):
+    """
+    Symmetric mean nearest-colour CIEDE2000 between two palettes.
+    """
+    lab_a, lab_b = rgb_to_lab(np.array(a)), rgb_to_lab(np.array(b))
+    dist = ciede2000(lab_a[:, None, :], lab_b[None, :, :])
+    return float((dist.min(axis=1).mean() + dist.min(axis=0).mean()) / 2)
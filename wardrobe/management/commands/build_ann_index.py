@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from wardrobe.utils.ann_index import BACKENDS, catalog_index
+import time
+
+class Command(BaseCommand):
+    help = 'Build the catalog-wide nearest-neighbour index from stored feature vectors and publish it to every worker'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--backend',
+            choices=['auto'] + sorted(BACKENDS),
+            default=None,
+            help='Index backend (defaults to settings.WARDROBE_ANN_BACKEND)',
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        index = catalog_index.rebuild(backend=options['backend'])
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Built {index.backend} index with {len(index)} items in {elapsed:.1f}s "
+            f"→ {catalog_index.directory}"
+        ))
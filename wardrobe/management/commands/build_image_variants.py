@@ -0,0 +1,50 @@
+import os
+
+from django.core.management.base import BaseCommand
+from wardrobe.models import ClothingItem
+from wardrobe.utils.media import (
+    build_variants, content_store, hash_file, original_name, perceptual_bands, perceptual_hash,
+)
+
+
+class Command(BaseCommand):
+    help = 'Move existing originals into the content-addressed store and build their image variants and hashes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Also process items that already have variants')
+        parser.add_argument('--prune', action='store_true', help='Delete old originals no other item references')
+
+    def handle(self, *args, **options):
+        items = ClothingItem.objects.exclude(image='').order_by('id')
+        if not options['all']:
+            items = items.filter(image_variants={})
+
+        storage = content_store()
+        updated, pruned = 0, 0
+        for item in items.iterator():
+            old_name = item.image.name
+            old_path = storage.path(old_name)
+            if not os.path.exists(old_path):
+                self.stdout.write(self.style.WARNING(f"⚠️ Image not found: {old_path}"))
+                continue
+            try:
+                item.content_hash = hash_file(old_path)
+                new_name = original_name(item.content_hash, old_name)
+                if new_name != old_name:
+                    with open(old_path, 'rb') as f:
+                        storage.save(new_name, f)
+                    item.image.name = new_name
+                item.image_variants = build_variants(storage.path(new_name), item.content_hash)
+                item.perceptual_hash = perceptual_hash(storage.path(new_name))
+                item.perceptual_bands = perceptual_bands(item.perceptual_hash)
+                item.save(update_fields=['image', 'content_hash', 'image_variants', 'perceptual_hash', 'perceptual_bands'])
+            except Exception as e:
+                self.stdout.write(self.style.ERROR(f"❌ Failed for {item.name} (ID: {item.id}): {e}"))
+                continue
+            updated += 1
+
+            if options['prune'] and new_name != old_name and not ClothingItem.objects.filter(image=old_name).exists():
+                storage.delete(old_name)
+                pruned += 1
+
+        self.stdout.write(self.style.SUCCESS(f"✅ Updated {updated} items, pruned {pruned} duplicate originals."))
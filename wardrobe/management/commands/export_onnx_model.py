@@ -0,0 +1,59 @@
+import os
+
+from django.core.management.base import BaseCommand
+from wardrobe.utils.embeddings import (
+    CLIP_IMAGE_SIZE, CLIP_MEAN, CLIP_STD, onnx_model_path, registry, write_onnx_metadata,
+)
+
+
+class Command(BaseCommand):
+    help = 'Export the CLIP image tower to ONNX (and optionally an int8 copy) for the onnx embedding backends'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--quantize', action='store_true', help='Also write a dynamically quantized int8 model')
+        parser.add_argument('--opset', type=int, default=17)
+
+    def handle(self, *args, **options):
+        import torch
+
+        clip = registry.get(backend='torch')
+        visual = clip.model.visual.to('cpu').eval()
+        preprocess_cfg = getattr(visual, 'preprocess_cfg', {}) or {}
+        size = preprocess_cfg.get('size', getattr(visual, 'image_size', CLIP_IMAGE_SIZE))
+        size = size[0] if isinstance(size, (tuple, list)) else size
+        metadata = {
+            'model': clip.name,
+            'pretrained': clip.pretrained,
+            'preprocess': {
+                'image_size': int(size),
+                'mean': list(preprocess_cfg.get('mean', CLIP_MEAN)),
+                'std': list(preprocess_cfg.get('std', CLIP_STD)),
+            },
+        }
+
+        path = onnx_model_path(clip.name, clip.pretrained)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # encode_image is the visual tower's forward pass, so exporting it gives the same vectors.
+        with torch.no_grad():
+            torch.onnx.export(
+                visual,
+                torch.randn(1, 3, size, size),
+                path,
+                input_names=['pixel_values'],
+                output_names=['image_embeds'],
+                dynamic_axes={'pixel_values': {0: 'batch'}, 'image_embeds': {0: 'batch'}},
+                opset_version=options['opset'],
+                do_constant_folding=True,
+            )
+        write_onnx_metadata(path, {**metadata, 'quantized': False})
+        self.stdout.write(self.style.SUCCESS(f"✅ Wrote {path} ({os.path.getsize(path) / 2**20:.0f} MB)"))
+
+        if options['quantize']:
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+
+            int8_path = onnx_model_path(clip.name, clip.pretrained, quantized=True)
+            quantize_dynamic(path, int8_path, weight_type=QuantType.QInt8)
+            write_onnx_metadata(int8_path, {**metadata, 'quantized': True})
+            self.stdout.write(self.style.SUCCESS(
+                f"✅ Wrote {int8_path} ({os.path.getsize(int8_path) / 2**20:.0f} MB)"
+            ))
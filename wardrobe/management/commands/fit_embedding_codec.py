@@ -0,0 +1,95 @@
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from wardrobe.models import ClothingItem
+from wardrobe.utils.ann_index import RERANK_FACTOR, CompressedIndex, catalog_index, resolve_backend
+from wardrobe.utils.codec import DEFAULT_CODE_DIM, EmbeddingCodec, codec_path, encode_code, reset_codec
+from wardrobe.utils.embedding_cache import normalize_rows
+from wardrobe.utils.vectors import decode_vector, embedding_version
+
+
+class Command(BaseCommand):
+    help = 'Fit the PCA + int8 embedding codec on stored vectors and write every item\'s embedding_code'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dim', type=int, default=DEFAULT_CODE_DIM, help='PCA dimensions per code')
+        parser.add_argument('--sample', type=int, default=50000, help='Vectors to fit on')
+        parser.add_argument('--batch-size', type=int, default=2000)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(options['seed'])
+        # Only vectors from the configured model; the rest get codes when they are re-embedded.
+        current = ClothingItem.objects.filter(embedding_model=embedding_version()).exclude(feature_vector=None)
+        ids = np.array(current.values_list('id', flat=True))
+        if len(ids) < 2:
+            self.stdout.write(self.style.WARNING("⚠️ Not enough stored vectors to fit a codec."))
+            return
+        sample_ids = rng.choice(ids, size=min(options['sample'], len(ids)), replace=False)
+        vectors = self._load_vectors(sample_ids.tolist(), options['batch_size'])
+        code_dim = min(options['dim'], vectors.shape[1])
+
+        started = time.perf_counter()
+        codec = EmbeddingCodec.fit(vectors, code_dim)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(f"Fitted {vectors.shape[1]} → {code_dim} dims on {len(vectors)} vectors in {elapsed:.1f}s")
+        self._report_quality(codec, vectors, rng)
+
+        codec.save(codec_path())
+        reset_codec()
+
+        updated = 0
+        items = current.order_by('id').only('id', 'feature_vector')
+        batch = []
+        for item in items.iterator(chunk_size=options['batch_size']):
+            vector = decode_vector(item.feature_vector)
+            valid = vector is not None and vector.shape[0] == codec.input_dim
+            item.embedding_code = encode_code(codec.encode(vector)[0]) if valid else None
+            item.embedding_codec = codec.version if valid else ''
+            batch.append(item)
+            if len(batch) >= options['batch_size']:
+                updated += self._save(batch)
+                batch = []
+        updated += self._save(batch)
+        self.stdout.write(self.style.SUCCESS(f"✔ {updated} embedding codes written ({code_dim} bytes each)"))
+
+        if resolve_backend() is CompressedIndex:
+            index = catalog_index.rebuild()
+            self.stdout.write(f"Rebuilt {index.backend} catalog index with {len(index)} items")
+        self.stdout.write(self.style.SUCCESS(
+            f"🎉 Codec saved to {codec_path()}. Restart ingestion workers so new uploads use it."
+        ))
+
+    def _load_vectors(self, item_ids, batch_size):
+        vectors = []
+        for start in range(0, len(item_ids), batch_size):
+            chunk = item_ids[start:start + batch_size]
+            rows = ClothingItem.objects.filter(id__in=chunk).values_list('feature_vector', flat=True)
+            vectors.extend(vector for vector in map(decode_vector, rows) if vector is not None)
+        # Fit on the most common dimension only.
+        dims, counts = np.unique([vector.shape[0] for vector in vectors], return_counts=True)
+        dim = dims[np.argmax(counts)]
+        return normalize_rows(np.stack([vector for vector in vectors if vector.shape[0] == dim]))
+
+    def _report_quality(self, codec, vectors, rng, queries=100, k=10):
+        """
+        Reconstruction cosine, and how often the true top k survive candidate generation on codes.
+        """
+        codes = codec.encode(vectors)
+        reconstruction = (codec.decode(codes) * vectors).sum(axis=1)
+        recalls = []
+        for row in rng.choice(len(vectors), size=min(queries, len(vectors)), replace=False):
+            exact = np.argsort(-(vectors @ vectors[row]))[:k]
+            keep = min(len(vectors), k * RERANK_FACTOR)
+            candidates = np.argsort(-codec.score(codes, vectors[row]))[:keep]
+            recalls.append(len(np.intersect1d(exact, candidates)) / len(exact))
+        self.stdout.write(
+            f"Reconstruction cosine: mean {reconstruction.mean():.4f}, min {reconstruction.min():.4f}; "
+            f"recall@{k} after re-ranking {k * RERANK_FACTOR} candidates: {np.mean(recalls):.3f}; "
+            f"{vectors.shape[1] * 4 // codec.code_dim}x smaller than float32"
+        )
+
+    def _save(self, batch):
+        ClothingItem.objects.bulk_update(batch, ['embedding_code', 'embedding_codec'])
+        return len(batch)
@@ -0,0 +1,47 @@
+import datetime
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from wardrobe.models import ClothingItem, DailyOutfit
+from wardrobe.utils.outfits import store_outfit_of_the_day
+
+
+class Command(BaseCommand):
+    help = "Precompute every user's Outfit of the Day (run daily from cron, e.g. shortly after midnight)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', default=None, help='YYYY-MM-DD (defaults to today)')
+        parser.add_argument('--users', type=int, nargs='*', help='Only these user ids')
+        parser.add_argument('--force', action='store_true', help='Recompute outfits that are already stored')
+        parser.add_argument('--keep-days', type=int, default=7, help='Delete stored outfits older than this')
+
+    def handle(self, *args, **options):
+        try:
+            day = datetime.date.fromisoformat(options['date']) if options['date'] else timezone.localdate()
+        except ValueError:
+            raise CommandError("--date must be YYYY-MM-DD")
+
+        user_ids = ClothingItem.objects.values_list('user_id', flat=True).distinct()
+        if options['users']:
+            user_ids = user_ids.filter(user_id__in=options['users'])
+        if not options['force']:
+            done = DailyOutfit.objects.filter(date=day).values_list('user_id', flat=True)
+            user_ids = user_ids.exclude(user_id__in=done)
+
+        started = time.perf_counter()
+        stored, failed = 0, 0
+        for user_id in user_ids.order_by('user_id'):
+            try:
+                store_outfit_of_the_day(user_id, day, force=options['force'])
+                stored += 1
+            except Exception as e:
+                failed += 1
+                self.stdout.write(self.style.ERROR(f"❌ User {user_id}: {e}"))
+
+        cutoff = day - datetime.timedelta(days=options['keep_days'])
+        pruned, _ = DailyOutfit.objects.filter(date__lt=cutoff).delete()
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Stored {stored} outfits for {day} in {elapsed:.1f}s ({failed} failed, {pruned} old rows pruned)."
+        ))
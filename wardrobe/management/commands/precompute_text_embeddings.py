@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from wardrobe.utils.embeddings import get_text_model
+from wardrobe.utils.text_search import encode_queries, fashion_vocabulary, save_vocabulary, vocabulary_path
+
+
+class Command(BaseCommand):
+    help = 'Embed the common fashion vocabulary with the CLIP text tower for /api/clothing/search/'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=256)
+
+    def handle(self, *args, **options):
+        queries = fashion_vocabulary()
+        model = get_text_model()
+        vectors = []
+        for start in range(0, len(queries), options['batch_size']):
+            vectors.extend(encode_queries(queries[start:start + options['batch_size']]))
+            self.stdout.write(f"✔ {min(start + options['batch_size'], len(queries))}/{len(queries)} queries embedded")
+
+        save_vocabulary(queries, vectors, model.name, model.pretrained)
+        self.stdout.write(self.style.SUCCESS(f"✅ Wrote {len(queries)} text embeddings to {vocabulary_path()}"))
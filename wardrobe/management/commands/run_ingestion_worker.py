@@ -0,0 +1,116 @@
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import multiprocessing
+import time
+
+from django.core.management.base import BaseCommand
+from wardrobe.utils import ingestion
+
+
+def _init_worker(torch_threads):
+    # Spawned workers start from a clean interpreter: set Django up and cap the
+    # inference thread pool so N processes don't oversubscribe the CPU.
+    import django
+    django.setup()
+    if torch_threads:
+        from wardrobe.utils.embeddings import set_inference_threads
+        set_inference_threads(torch_threads)
+
+
+def _compute(image_path, content_hash):
+    return ingestion.compute_item_fields(image_path, content_hash)
+
+
+class Command(BaseCommand):
+    help = 'Process queued uploads: compute embeddings and palettes in a local process pool'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=2, help='Worker processes in the pool')
+        parser.add_argument('--torch-threads', type=int, default=1, help='Inference threads per worker process (torch or onnxruntime)')
+        parser.add_argument('--batch-size', type=int, default=8, help='Jobs claimed per poll')
+        parser.add_argument('--poll-interval', type=float, default=1.0, help='Seconds to sleep when the queue is empty')
+        parser.add_argument('--max-attempts', type=int, default=3)
+        parser.add_argument('--stale-after', type=int, default=600, help='Requeue jobs running longer than this many seconds')
+        parser.add_argument('--once', action='store_true', help='Drain the queue and exit')
+
+    def handle(self, *args, **options):
+        requeued = ingestion.requeue_stale_jobs(options['stale_after'])
+        if requeued:
+            self.stdout.write(self.style.WARNING(f"⚠️ Requeued {requeued} stale jobs."))
+
+        pool = self._make_pool(options)
+        self.stdout.write(self.style.SUCCESS(f"🚚 Ingestion worker started with {options['processes']} processes."))
+        try:
+            while True:
+                jobs = ingestion.claim_jobs(options['batch_size'])
+                if not jobs:
+                    if options['once']:
+                        break
+                    time.sleep(options['poll_interval'])
+                    continue
+
+                futures = [(job, self._submit(pool, job)) for job in jobs]
+                crashed = [job for job, future in futures if not self._finish(job, future, options)]
+                if crashed:
+                    # A dead worker process takes every unfinished job of the pool with it. Rerun
+                    # those one at a time in a new pool: a job that kills it again is failed, the
+                    # others never really ran and keep the attempt they were claimed with.
+                    self.stdout.write(self.style.WARNING(
+                        f"⚠️ A worker process died; retrying {len(crashed)} jobs one at a time."
+                    ))
+                    pool = self._replace_pool(pool, options)
+                    for job in crashed:
+                        if not self._finish(job, self._submit(pool, job), options):
+                            ingestion.fail_job(job, "Worker process died on this item", options['max_attempts'])
+                            self.stdout.write(self.style.ERROR(f"❌ Job {job.id} (item {job.item_id}) killed its worker"))
+                            pool = self._replace_pool(pool, options)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            pool.shutdown(cancel_futures=True)
+
+    def _submit(self, pool, job):
+        try:
+            return pool.submit(_compute, job.item.image.path, job.item.content_hash)
+        except BrokenProcessPool as e:
+            # The pool broke while jobs were still being submitted.
+            future = Future()
+            future.set_exception(e)
+            return future
+
+    def _finish(self, job, future, options):
+        """
+        Store or fail one job's result. Returns False, leaving the job alone, if the pool broke.
+        """
+        try:
+            fields, errors = future.result()
+        except BrokenProcessPool:
+            return False
+        except Exception as e:
+            ingestion.fail_job(job, e, options['max_attempts'])
+            self.stdout.write(self.style.ERROR(f"❌ Job {job.id} (item {job.item_id}) failed: {e}"))
+            return True
+        try:
+            stored = ingestion.finish_job(job, fields, errors)
+        except Exception as e:
+            # Storing one result must not stop the loop (and strand the other claimed jobs).
+            ingestion.fail_job(job, e, options['max_attempts'])
+            self.stdout.write(self.style.ERROR(f"❌ Job {job.id} (item {job.item_id}) could not be saved: {e}"))
+            return True
+        if stored:
+            self.stdout.write(self.style.SUCCESS(f"✔ Ingested item {job.item_id}"))
+        else:
+            self.stdout.write(self.style.WARNING(f"⚠️ Item {job.item_id} was deleted while it was being ingested"))
+        return True
+
+    def _replace_pool(self, pool, options):
+        pool.shutdown(wait=False, cancel_futures=True)
+        return self._make_pool(options)
+
+    def _make_pool(self, options):
+        return ProcessPoolExecutor(
+            max_workers=options['processes'],
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker,
+            initargs=(options['torch_threads'],),
+        )
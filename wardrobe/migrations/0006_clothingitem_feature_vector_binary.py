@@ -0,0 +1,64 @@
+# Converts feature_vector from JSON text to packed float32 bytes.
+
+import json
+
+import numpy as np
+from django.db import migrations, models
+
+
+def text_to_binary(apps, schema_editor):
+    ClothingItem = apps.get_model('wardrobe', 'ClothingItem')
+    batch = []
+    for item in ClothingItem.objects.exclude(feature_vector=None).only('id', 'feature_vector').iterator():
+        try:
+            values = json.loads(item.feature_vector)
+        except ValueError:
+            continue
+        if not isinstance(values, list) or not values:
+            continue
+        item.feature_vector_bin = np.asarray(values, dtype='<f4').tobytes()
+        batch.append(item)
+        if len(batch) >= 500:
+            ClothingItem.objects.bulk_update(batch, ['feature_vector_bin'])
+            batch = []
+    if batch:
+        ClothingItem.objects.bulk_update(batch, ['feature_vector_bin'])
+
+
+def binary_to_text(apps, schema_editor):
+    ClothingItem = apps.get_model('wardrobe', 'ClothingItem')
+    batch = []
+    for item in ClothingItem.objects.exclude(feature_vector_bin=None).only('id', 'feature_vector_bin').iterator():
+        values = np.frombuffer(bytes(item.feature_vector_bin), dtype='<f4')
+        item.feature_vector = json.dumps(values.tolist())
+        batch.append(item)
+        if len(batch) >= 500:
+            ClothingItem.objects.bulk_update(batch, ['feature_vector'])
+            batch = []
+    if batch:
+        ClothingItem.objects.bulk_update(batch, ['feature_vector'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wardrobe', '0005_clothingitem_user_alter_clothingitem_clothing_type'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='clothingitem',
+            name='feature_vector_bin',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+        migrations.RunPython(text_to_binary, binary_to_text),
+        migrations.RemoveField(
+            model_name='clothingitem',
+            name='feature_vector',
+        ),
+        migrations.RenameField(
+            model_name='clothingitem',
+            old_name='feature_vector_bin',
+            new_name='feature_vector',
+        ),
+    ]
@@ -0,0 +1,27 @@
+import django.contrib.postgres.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wardrobe', '0006_clothingitem_feature_vector_binary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='clothingitem',
+            name='palette_names',
+            field=django.contrib.postgres.fields.ArrayField(base_field=models.CharField(max_length=100), blank=True, null=True, size=None),
+        ),
+        migrations.AddField(
+            model_name='clothingitem',
+            name='palette_families',
+            field=django.contrib.postgres.fields.ArrayField(base_field=models.CharField(max_length=30), blank=True, null=True, size=None),
+        ),
+        migrations.AddField(
+            model_name='clothingitem',
+            name='palette_lab',
+            field=django.contrib.postgres.fields.ArrayField(base_field=django.contrib.postgres.fields.ArrayField(base_field=models.FloatField(), size=3), blank=True, null=True, size=None),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-17 13:55
+
+import wardrobe.utils.media
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wardrobe', '0008_ingestion_queue'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='clothingitem',
+            name='content_hash',
+            field=models.CharField(blank=True, db_index=True, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='clothingitem',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AlterField(
+            model_name='clothingitem',
+            name='image',
+            field=models.ImageField(storage=wardrobe.utils.media.content_store, upload_to=wardrobe.utils.media.content_addressed_upload),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-17 13:56
+
+import django.contrib.postgres.fields
+import django.contrib.postgres.indexes
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wardrobe', '0009_image_variants'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='clothingitem',
+            name='perceptual_bands',
+            field=django.contrib.postgres.fields.ArrayField(base_field=models.IntegerField(), blank=True, null=True, size=None),
+        ),
+        migrations.AddField(
+            model_name='clothingitem',
+            name='perceptual_hash',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='clothingitem',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['perceptual_bands'], name='wardrobe_cl_percept_5f9094_gin'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-17 13:58
+
+import django.db.models.functions.text
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wardrobe', '0010_perceptual_hash'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='clothingitem',
+            index=models.Index(fields=['user', '-id'], name='wardrobe_item_user_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='clothingitem',
+            index=models.Index(models.F('user'), django.db.models.functions.text.Lower('clothing_type'), name='wardrobe_item_user_type_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='clothingitem',
+            index=models.Index(fields=['user', 'style'], name='wardrobe_item_user_style_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='clothingitem',
+            index=models.Index(models.F('user'), django.db.models.functions.text.Lower('primary_color'), name='wardrobe_item_user_color_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 14:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wardrobe', '0013_wardrobe_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='clothingitem',
+            name='embedding_code',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+    ]
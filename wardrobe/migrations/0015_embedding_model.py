@@ -0,0 +1,31 @@
+# Records which embedding model produced each feature_vector. Existing vectors were all
+# computed with the configured model (the only one used so far), so they are tagged with it.
+
+from django.conf import settings
+from django.db import migrations, models
+
+LEGACY_MODEL = 'ViT-B-32'
+LEGACY_PRETRAINED = 'laion2b_s34b_b79k'
+
+
+def tag_existing_vectors(apps, schema_editor):
+    ClothingItem = apps.get_model('wardrobe', 'ClothingItem')
+    name = getattr(settings, 'WARDROBE_EMBEDDING_MODEL', LEGACY_MODEL)
+    pretrained = getattr(settings, 'WARDROBE_EMBEDDING_PRETRAINED', LEGACY_PRETRAINED)
+    ClothingItem.objects.exclude(feature_vector=None).update(embedding_model=f"{name}:{pretrained}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wardrobe', '0014_embedding_code'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='clothingitem',
+            name='embedding_model',
+            field=models.CharField(blank=True, default='', editable=False, max_length=100),
+        ),
+        migrations.RunPython(tag_existing_vectors, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-17 14:44
+# Records which codec produced each embedding_code. Existing codes are left untagged: there
+# is no telling which fit made them, so index builds re-encode them until
+# `manage.py fit_embedding_codec` is run again.
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wardrobe', '0015_embedding_model'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='clothingitem',
+            name='embedding_codec',
+            field=models.CharField(blank=True, default='', editable=False, max_length=16),
+        ),
+    ]
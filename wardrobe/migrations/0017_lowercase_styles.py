@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-17 16:05
+# Style filters match the stored value exactly (ClothingItemQuerySet.with_style), so any
+# row saved with a differently cased style is normalised to its lower-case choice value.
+
+from django.db import migrations
+from django.db.models.functions import Lower
+
+
+def lowercase_styles(apps, schema_editor):
+    ClothingItem = apps.get_model('wardrobe', 'ClothingItem')
+    ClothingItem.objects.exclude(style=Lower('style')).update(style=Lower('style'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wardrobe', '0016_embedding_codec'),
+    ]
+
+    operations = [
+        migrations.RunPython(lowercase_styles, migrations.RunPython.noop),
+    ]
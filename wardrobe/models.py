@@ -1,6 +1,33 @@
 from django.db import models
 from django.contrib.auth.models import User
 from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex
+from django.db.models import F
+from django.db.models.functions import Lower
+
+from .utils.media import content_addressed_upload, content_store
+
+class ClothingItemQuerySet(models.QuerySet):
+    """
+    Case-insensitive filters written as LOWER(col) = 'value', which the functional
+    indexes on ClothingItem can serve (`__iexact` compiles to UPPER() and can't).
+    """
+
+    def of_type(self, clothing_type):
+        return self.alias(clothing_type_lower=Lower('clothing_type')).filter(clothing_type_lower=clothing_type.lower())
+
+    def of_types(self, clothing_types):
+        return self.alias(clothing_type_lower=Lower('clothing_type')).filter(
+            clothing_type_lower__in=[t.lower() for t in clothing_types]
+        )
+
+    def with_primary_color(self, color):
+        return self.alias(primary_color_lower=Lower('primary_color')).filter(primary_color_lower=color.lower())
+
+    def with_style(self, style):
+        # Styles are stored as their lower-case choice values, so the plain (user, style) index serves this.
+        return self.filter(style=style.lower())
+
 
 class ClothingItem(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='clothing_items')  # Link to user
@@ -12,6 +39,15 @@ class ClothingItem(models.Model):
         ('Outerwear', 'Outerwear'),
     ]
 
+    STATUS_PROCESSING = 'processing'
+    STATUS_READY = 'ready'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PROCESSING, 'Processing'),
+        (STATUS_READY, 'Ready'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
     STYLE_CHOICES = [
         ('casual', 'Casual'),
         ('formal', 'Formal'),
@@ -20,16 +56,111 @@ class ClothingItem(models.Model):
     ]
 
     name = models.CharField(max_length=100)
-    image = models.ImageField(upload_to='clothes/')
+    # Stored under its SHA-256 (see wardrobe.utils.media), so identical uploads share one file.
+    image = models.ImageField(upload_to=content_addressed_upload, storage=content_store)
+    content_hash = models.CharField(max_length=64, blank=True, db_index=True)
+    # dHash of the image and its four tagged 16-bit bands, for near-duplicate lookups.
+    perceptual_hash = models.BigIntegerField(blank=True, null=True)
+    perceptual_bands = ArrayField(models.IntegerField(), blank=True, null=True)
+    # {variant: {format: storage name}} for the downscaled copies written at ingestion.
+    image_variants = models.JSONField(default=dict, blank=True)
     clothing_type = models.CharField(max_length=20, choices=TYPE_CHOICES)
     style = models.CharField(max_length=20, choices=STYLE_CHOICES)
-    feature_vector = models.TextField(blank=True, null=True)
+    # Packed float32 embedding; read it with wardrobe.utils.vectors.decode_vector.
+    feature_vector = models.BinaryField(blank=True, null=True)
+    # PCA + int8 code of the embedding for coarse ranking (wardrobe.utils.codec); None until a codec is fitted.
+    embedding_code = models.BinaryField(blank=True, null=True, editable=False)
+    # Codec that produced embedding_code (EmbeddingCodec.version); '' when there is none.
+    embedding_codec = models.CharField(max_length=16, blank=True, default='', editable=False)
+    # Model that produced feature_vector (wardrobe.utils.vectors.embedding_version); '' when there is none.
+    embedding_model = models.CharField(max_length=100, blank=True, default='', editable=False)
     primary_color = models.CharField(max_length=100, blank=True, null=True)
     color_palette = ArrayField(
         models.CharField(max_length=100),
         blank=True,
         null=True
     )
+    # Resolved once per palette entry (same order as color_palette) so scoring never re-derives them.
+    palette_names = ArrayField(models.CharField(max_length=100), blank=True, null=True)
+    palette_families = ArrayField(models.CharField(max_length=30), blank=True, null=True)
+    palette_lab = ArrayField(ArrayField(models.FloatField(), size=3), blank=True, null=True)
+    # 'processing' until the ingestion worker has stored the embedding and palette.
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_READY)
+
+    objects = ClothingItemQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            GinIndex(fields=['perceptual_bands']),
+            # Per-user listing in cursor order, and the per-user filters used by the views.
+            models.Index(fields=['user', '-id'], name='wardrobe_item_user_id_idx'),
+            models.Index(F('user'), Lower('clothing_type'), name='wardrobe_item_user_type_idx'),
+            models.Index(fields=['user', 'style'], name='wardrobe_item_user_style_idx'),
+            models.Index(F('user'), Lower('primary_color'), name='wardrobe_item_user_color_idx'),
+        ]
 
     def __str__(self):
         return f"{self.name} ({self.user.username})"
+
+
+class IngestionJob(models.Model):
+    """
+    DB-backed queue entry for computing an uploaded item's embedding and palette.
+    Claimed by `manage.py run_ingestion_worker` with SELECT ... FOR UPDATE SKIP LOCKED.
+    """
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_DONE, 'Done'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    item = models.ForeignKey(ClothingItem, on_delete=models.CASCADE, related_name='ingestion_jobs')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['status', 'created_at'])]
+
+    def __str__(self):
+        return f"Ingestion of item {self.item_id} ({self.status})"
+
+
+class DailyOutfit(models.Model):
+    """
+    A user's Outfit of the Day, stored as the ready-to-serve response body.
+    Written by `manage.py precompute_daily_outfits` (or on the first request of the
+    day) and deleted by the ClothingItem signals when the wardrobe changes.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='daily_outfits')
+    date = models.DateField()
+    payload = models.JSONField()
+    status_code = models.PositiveSmallIntegerField(default=200)
+    etag = models.CharField(max_length=32)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['user', 'date'], name='wardrobe_daily_outfit_user_date')]
+
+    def __str__(self):
+        return f"Outfit of the day for user {self.user_id} on {self.date}"
+
+
+class WardrobeVersion(models.Model):
+    """
+    Per-user counter bumped by the ClothingItem signals on every change. Cached
+    recommendation responses are keyed by it, so a bump invalidates them all.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='wardrobe_version')
+    version = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Wardrobe of user {self.user_id} at version {self.version}"
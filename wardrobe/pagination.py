@@ -0,0 +1,13 @@
+from rest_framework.pagination import CursorPagination
+
+
+class WardrobeCursorPagination(CursorPagination):
+    """
+    Keyset pagination over a user's items, newest first. Each page is an index range
+    scan on (user, id), so its cost doesn't grow with the size of the wardrobe or how
+    far the client has paged. Responses look like {"next", "previous", "results"}.
+    """
+    ordering = '-id'
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
@@ -2,9 +2,27 @@
 
 from rest_framework import serializers
 from .models import ClothingItem
+from .utils.media import content_store
+from .utils.vectors import decode_vector
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 
-class ClothingItemSerializer(serializers.ModelSerializer):
+class SparseFieldsMixin:
+    """
+    Lets clients ask for a subset of fields with ?fields=id,name,image.
+    Unknown names are ignored.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        requested = request.query_params.get('fields') if request is not None else None
+        if requested:
+            wanted = {name.strip() for name in requested.split(',') if name.strip()}
+            for name in set(self.fields) - wanted:
+                self.fields.pop(name)
+
+
+class ClothingItemSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """
     Serializer for the ClothingItem model.
     """
@@ -12,6 +30,10 @@ class ClothingItemSerializer(serializers.ModelSerializer):
     # It tells Django not to require the 'user' field from the frontend during uploads.
     # Instead, the user will be assigned automatically from the request on the backend.
     user = serializers.ReadOnlyField(source='user.username')
+    # The model stores packed float32 bytes; clients keep receiving a list of floats.
+    feature_vector = serializers.SerializerMethodField()
+    # Downscaled copies for display: {'thumb': {'webp': url, 'avif': url}, 'medium': {...}}.
+    image_variants = serializers.SerializerMethodField()
 
     class Meta:
         model = ClothingItem
@@ -28,10 +50,55 @@ class ClothingItemSerializer(serializers.ModelSerializer):
             'primary_color', 
             'color_palette',
             'feature_vector',
+            'image_variants',
+            'status',
         ]
         
         # These fields are populated by the server, not the client.
-        read_only_fields = ['primary_color', 'color_palette', 'feature_vector']
+        read_only_fields = ['primary_color', 'color_palette', 'feature_vector', 'status']
+
+    def get_feature_vector(self, obj):
+        vector = decode_vector(obj.feature_vector)
+        return vector.tolist() if vector is not None else None
+
+    def get_image_variants(self, obj):
+        request = self.context.get('request')
+        storage = content_store()
+        variants = {}
+        for variant, names in (obj.image_variants or {}).items():
+            urls = {fmt: storage.url(name) for fmt, name in names.items()}
+            if request is not None:
+                urls = {fmt: request.build_absolute_uri(url) for fmt, url in urls.items()}
+            variants[variant] = urls
+        return variants
+
+
+class ClothingItemListSerializer(ClothingItemSerializer):
+    """
+    Wardrobe listings and similarity results: everything but the embedding.
+    Ask for ?fields=...,feature_vector to get the full serializer instead.
+    """
+
+    class Meta(ClothingItemSerializer.Meta):
+        fields = [name for name in ClothingItemSerializer.Meta.fields if name != 'feature_vector']
+
+
+class OutfitItemSerializer(ClothingItemSerializer):
+    """
+    What an outfit card needs to render an item.
+    """
+
+    class Meta(ClothingItemSerializer.Meta):
+        fields = ['id', 'name', 'clothing_type', 'style', 'image', 'image_variants', 'primary_color', 'color_palette']
+
+
+class CatalogItemSerializer(ClothingItemSerializer):
+    """
+    Other users' items in store-wide results: what the item looks like, nothing about its owner.
+    """
+
+    class Meta(ClothingItemSerializer.Meta):
+        fields = ['id', 'name', 'clothing_type', 'style', 'image', 'image_variants', 'primary_color', 'color_palette']
 
 
 class MyTokenObtainPairSerializer(TokenObtainPairSerializer):
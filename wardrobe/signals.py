@@ -0,0 +1,30 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import ClothingItem
+from .utils.compatibility import compatibility_cache
+from .utils.embedding_cache import embedding_cache
+from .utils.outfits import invalidate_outfit_of_the_day
+from .utils.response_cache import bump_wardrobe_version
+
+
+def wardrobe_changed(user_id, create=True):
+    """
+    Everything a change to one of the user's items invalidates. Called by the receivers
+    below and by commands that write items with bulk_update, which sends no signals.
+    """
+    embedding_cache.invalidate(user_id)
+    compatibility_cache.invalidate(user_id)
+    invalidate_outfit_of_the_day(user_id)
+    bump_wardrobe_version(user_id, create=create)
+
+
+@receiver(post_save, sender=ClothingItem)
+def invalidate_on_save(sender, instance, **kwargs):
+    wardrobe_changed(instance.user_id)
+
+
+@receiver(post_delete, sender=ClothingItem)
+def invalidate_on_delete(sender, instance, **kwargs):
+    # Deletes (including the cascade from deleting the user) must not insert a version row.
+    wardrobe_changed(instance.user_id, create=False)
@@ -1,3 +1,1018 @@
-from django.test import TestCase
+import importlib.util
+import io
+import itertools
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+from datetime import timedelta
+from unittest import mock, skipUnless
 
-# Create your tests here.
+import numpy as np
+from PIL import Image
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from .management.commands import run_ingestion_worker
+from .models import ClothingItem, DailyOutfit, IngestionJob, WardrobeVersion
+from .utils.ann_index import CatalogIndex, CompressedIndex, ExactIndex, catalog_index
+from .utils.codec import EmbeddingCodec, decode_code, get_codec, reset_codec
+from .utils.compatibility import build_compatibility_matrix, compatibility_cache
+from .utils.embedding_cache import embedding_cache
+from .utils.media import ContentAddressedStorage, build_variants, hamming_distance
+from .utils.outfit_search import OutfitSearch
+from .utils.process_clothing import palette_fields
+from .utils.ingestion import apply_item_fields, claim_jobs, enqueue, fail_job, finish_job, requeue_stale_jobs
+from .utils.response_cache import bump_wardrobe_version, get_cache
+from .utils.scoring import COLOR_COMPATIBLE, color_match_score_palette, color_match_scores_palette
+from .utils.text_search import save_vocabulary, text_cache
+from .utils.vectors import decode_vector, embedding_version, encode_vector
+
+PALETTES = [['#ff0000', '#ffffff'], ['#000080', '#808080'], ['#f5f5dc', '#000000'], ['#008000', '#ffffff']]
+TYPES = ['Top', 'Bottom', 'Shoes']
+STYLES = ['casual', 'formal']
+
+
+def make_wardrobe(user, size, seed=0):
+    rng = np.random.default_rng(seed)
+    items = []
+    for i in range(size):
+        items.append(ClothingItem.objects.create(
+            user=user,
+            name=f"item {i}",
+            image=f"clothes/item-{i}.jpg",
+            clothing_type=TYPES[i % len(TYPES)],
+            style=STYLES[i % len(STYLES)],
+            feature_vector=encode_vector(rng.normal(size=512)),
+            embedding_model=embedding_version(),
+            **palette_fields(PALETTES[i % len(PALETTES)]),
+        ))
+    return items
+
+
+class OutfitQueryCountTests(TestCase):
+    """
+    The outfit endpoints load the wardrobe once, so the number of queries they run
+    must not grow with the number of items.
+    """
+
+    def setUp(self):
+        compatibility_cache.clear()
+        embedding_cache.clear()
+        get_cache().clear()
+        self.client = APIClient()
+
+    def count_queries(self, size, method, path, data=None):
+        user = User.objects.create_user(username=f"user-{size}-{path}", password="pw")
+        items = make_wardrobe(user, size)
+        self.client.force_authenticate(user)
+        payload = {'base_item_id': items[0].id, **(data or {})} if data is not None else None
+        with CaptureQueriesContext(connection) as queries:
+            if method == 'post':
+                response = self.client.post(path, payload, format='json')
+            else:
+                response = self.client.get(path)
+        self.assertEqual(response.status_code, 200, response.content)
+        return len(queries)
+
+    def assertConstantQueries(self, method, path, data=None):
+        small = self.count_queries(6, method, path, data)
+        large = self.count_queries(60, method, path, data)
+        self.assertEqual(small, large)
+        return small
+
+    def test_generate_outfit(self):
+        self.assertConstantQueries('post', '/api/clothing/generate_outfit/', {})
+
+    def test_generate_outfit_with_occasion(self):
+        self.assertConstantQueries('post', '/api/clothing/generate_outfit/', {'occasion': 'casual'})
+
+    def test_outfit_of_the_day(self):
+        # Cold path: lookup, wardrobe, compatibility matrix and the insert.
+        self.assertConstantQueries('get', '/api/clothing/outfit-of-the-day/')
+
+    def test_list(self):
+        self.assertConstantQueries('get', '/api/clothing/')
+
+    def test_outfit_of_the_day_does_not_sort_randomly(self):
+        user = User.objects.create_user(username="random", password="pw")
+        make_wardrobe(user, 9)
+        self.client.force_authenticate(user)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get('/api/clothing/outfit-of-the-day/')
+        self.assertFalse(any('RANDOM()' in query['sql'].upper() for query in queries))
+
+
+class OutfitOfTheDayTests(TestCase):
+    URL = '/api/clothing/outfit-of-the-day/'
+
+    def setUp(self):
+        compatibility_cache.clear()
+        self.user = User.objects.create_user(username="daily", password="pw")
+        self.items = make_wardrobe(self.user, 12)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_stored_outfit_is_one_query_and_stable(self):
+        first = self.client.get(self.URL)
+        self.assertEqual(first.status_code, 200)
+        with self.assertNumQueries(1):
+            second = self.client.get(self.URL)
+        self.assertEqual(first.json(), second.json())
+        self.assertEqual(first['ETag'], second['ETag'])
+
+    def test_conditional_get(self):
+        first = self.client.get(self.URL)
+        response = self.client.get(self.URL, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 304)
+        response = self.client.get(self.URL, HTTP_IF_MODIFIED_SINCE=first['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_wardrobe_change_invalidates(self):
+        self.client.get(self.URL)
+        self.assertEqual(DailyOutfit.objects.filter(user=self.user).count(), 1)
+        self.items[0].name = "renamed"
+        self.items[0].save()
+        self.assertFalse(DailyOutfit.objects.filter(user=self.user).exists())
+
+    def test_precompute_command(self):
+        other = User.objects.create_user(username="other", password="pw")
+        make_wardrobe(other, 3)
+        call_command('precompute_daily_outfits', stdout=io.StringIO())
+        self.assertEqual(DailyOutfit.objects.count(), 2)
+        with self.assertNumQueries(1):
+            response = self.client.get(self.URL)
+        self.assertEqual(response.status_code, 200)
+
+
+class ResponseCacheTests(TestCase):
+
+    def setUp(self):
+        compatibility_cache.clear()
+        embedding_cache.clear()
+        get_cache().clear()
+        self.user = User.objects.create_user(username="cached", password="pw")
+        self.items = make_wardrobe(self.user, 12)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def generate(self):
+        return self.client.post('/api/clothing/generate_outfit/', {'base_item_id': self.items[0].id}, format='json')
+
+    def test_repeat_is_served_from_cache(self):
+        first = self.generate()
+        self.assertEqual(first.status_code, 200)
+        # Only the wardrobe version is read.
+        with self.assertNumQueries(1):
+            second = self.generate()
+        self.assertEqual(first.json(), second.json())
+
+    def test_change_bumps_version_and_invalidates(self):
+        before = WardrobeVersion.objects.get(user=self.user).version
+        self.generate()
+        self.items[1].delete()
+        self.assertEqual(WardrobeVersion.objects.get(user=self.user).version, before + 1)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.generate()
+        self.assertEqual(response.status_code, 200)
+        self.assertGreater(len(queries), 1)
+        self.assertNotIn(str(self.items[1].id), response.json()['items'])
+
+    def test_similar_conditional_get(self):
+        url = f'/api/clothing/{self.items[0].id}/similar/'
+        first = self.client.get(url)
+        self.assertEqual(first.status_code, 200)
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.items[2].save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag']).status_code, 200)
+
+    def test_sparse_fields_without_id(self):
+        response = self.client.post('/api/clothing/generate_outfit/?fields=name', {'base_item_id': self.items[0].id}, format='json')
+        self.assertEqual(response.status_code, 200)
+        items = response.json()['items']
+        self.assertIn(str(self.items[0].id), items)
+        self.assertEqual(items[str(self.items[0].id)], {'name': self.items[0].name})
+
+    def test_errors_are_not_cached(self):
+        response = self.client.post('/api/clothing/generate_outfit/', {'base_item_id': 0}, format='json')
+        self.assertEqual(response.status_code, 404)
+        make_wardrobe(self.user, 1)
+        self.assertEqual(self.generate().status_code, 200)
+
+
+class CursorPaginationTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="pager", password="pw")
+        ClothingItem.objects.bulk_create(
+            ClothingItem(user=self.user, name=f"item {i}", image=f"clothes/item-{i}.jpg", clothing_type='Top', style='casual')
+            for i in range(230)
+        )
+        self.ids = sorted(ClothingItem.objects.filter(user=self.user).values_list('id', flat=True), reverse=True)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_pages_cover_the_wardrobe_newest_first(self):
+        url, seen, pages = '/api/clothing/?fields=id', [], []
+        while url:
+            body = self.client.get(url).json()
+            self.assertEqual(set(body), {'next', 'previous', 'results'})
+            pages.append(body)
+            seen.extend(item['id'] for item in body['results'])
+            url = body['next']
+        self.assertEqual([len(page['results']) for page in pages], [50, 50, 50, 50, 30])
+        self.assertEqual(seen, self.ids)
+        self.assertIsNone(pages[0]['previous'])
+        previous = self.client.get(pages[1]['previous']).json()
+        self.assertEqual([item['id'] for item in previous['results']], self.ids[:50])
+
+    def test_page_size_is_capped(self):
+        body = self.client.get('/api/clothing/?fields=id&page_size=500').json()
+        self.assertEqual(len(body['results']), 200)
+        self.assertEqual(len(self.client.get('/api/clothing/?fields=id&page_size=10').json()['results']), 10)
+
+
+class PaletteScoringTests(TestCase):
+
+    def test_matrix_is_symmetric(self):
+        self.assertTrue((COLOR_COMPATIBLE == COLOR_COMPATIBLE.T).all())
+
+    def test_batch_matches_pairwise(self):
+        palettes = PALETTES + [[], ['#123456', '#123456', '#ffffff']]
+        for base in palettes:
+            expected = [color_match_score_palette(base, other) for other in palettes]
+            self.assertEqual(list(color_match_scores_palette(base, palettes)), expected)
+
+
+class ImportTimeTests(TestCase):
+    """
+    API-only processes import the URLconf; that must not pull in the ML stack,
+    which only loads when an embedding is actually computed.
+    """
+    HEAVY_MODULES = ('torch', 'open_clip', 'wardrobe.utils.embeddings')
+    # Summed self-times, so it doesn't depend on import order. The URLconf takes well under
+    # a second; torch alone takes several, so this catches it without flaking on slow machines.
+    IMPORT_BUDGET_SECONDS = 5.0
+
+    def import_urlconf(self):
+        """
+        (modules loaded, total self import time in seconds) for a fresh `import wardrobe.urls`.
+        """
+        script = 'import django, json, sys; django.setup(); import wardrobe.urls; print(json.dumps(sorted(sys.modules)))'
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', script],
+            capture_output=True, text=True, cwd=settings.BASE_DIR,
+            env={**os.environ, 'DJANGO_SETTINGS_MODULE': 'zyvia_backend.settings'},
+        )
+        self.assertEqual(result.returncode, 0, result.stderr[-2000:])
+        # Lines look like "import time:  self [us] | cumulative | <indent>module".
+        self_us = 0
+        for line in result.stderr.splitlines():
+            fields = line.split('|')
+            head = fields[0].removeprefix('import time:').strip()
+            if line.startswith('import time:') and len(fields) == 3 and head.isdigit():
+                self_us += int(head)
+        return json.loads(result.stdout.splitlines()[-1]), self_us / 1e6
+
+    def test_views_do_not_import_torch(self):
+        modules, seconds = self.import_urlconf()
+        self.assertIn('wardrobe.views', modules)
+        for name in modules:
+            self.assertFalse(name.split('.')[0] in self.HEAVY_MODULES or name in self.HEAVY_MODULES, name)
+        self.assertGreater(seconds, 0)
+        self.assertLess(seconds, self.IMPORT_BUDGET_SECONDS)
+
+
+def installed(*modules):
+    return all(importlib.util.find_spec(module) is not None for module in modules)
+
+
+@skipUnless(installed('torch', 'open_clip', 'onnxruntime'), 'torch, open_clip and onnxruntime are required')
+class OnnxParityTests(TestCase):
+    """
+    The ONNX backends must give (nearly) the same embeddings as torch on the sample images.
+    Export the models first with `manage.py export_onnx_model --quantize`.
+    """
+    MIN_COSINE = {'onnx': 0.99, 'onnx-int8': 0.95}
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        from PIL import Image
+        directory = os.path.join(settings.MEDIA_ROOT, 'clothes')
+        names = sorted(name for name in os.listdir(directory) if name.lower().endswith(('.jpg', '.png')))[:8]
+        cls.images = []
+        for name in names:
+            with Image.open(os.path.join(directory, name)) as image:
+                cls.images.append(image.convert('RGB'))
+
+    def embed(self, backend):
+        from .utils.embeddings import registry
+        vectors = np.array(registry.get(backend=backend).encode_images(self.images), dtype=np.float32)
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    def assertParity(self, backend):
+        from .utils.embeddings import onnx_model_path
+        if not os.path.exists(onnx_model_path(quantized=backend == 'onnx-int8')):
+            self.skipTest(f"{backend} model not exported")
+        cosine = (self.embed('torch') * self.embed(backend)).sum(axis=1)
+        self.assertGreaterEqual(cosine.min(), self.MIN_COSINE[backend])
+
+    def test_onnx(self):
+        self.assertParity('onnx')
+
+    def test_onnx_int8(self):
+        self.assertParity('onnx-int8')
+
+
+class TextSearchTests(TestCase):
+    """
+    Queries from the precomputed vocabulary are answered without loading the text model.
+    """
+
+    def setUp(self):
+        embedding_cache.clear()
+        get_cache().clear()
+        self.user = User.objects.create_user(username="searcher", password="pw")
+        self.items = make_wardrobe(self.user, 9)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, 'vocabulary.npz')
+        # "navy blazer" points exactly at item 4, "jeans" at item 5.
+        vectors = [decode_vector(self.items[4].feature_vector), decode_vector(self.items[5].feature_vector)]
+        save_vocabulary(['navy blazer', 'jeans'], vectors, settings.WARDROBE_EMBEDDING_MODEL,
+                        settings.WARDROBE_EMBEDDING_PRETRAINED, path)
+        overrides = override_settings(WARDROBE_TEXT_VOCABULARY_PATH=path)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        text_cache.clear()
+        self.addCleanup(text_cache.clear)
+
+    def test_ranks_by_cosine(self):
+        response = self.client.get('/api/clothing/search/', {'q': '  Navy   Blazer'})
+        self.assertEqual(response.status_code, 200)
+        results = response.json()
+        self.assertEqual(results[0]['id'], self.items[4].id)
+        self.assertAlmostEqual(results[0]['score'], 1.0, places=3)
+        self.assertEqual([r['score'] for r in results], sorted((r['score'] for r in results), reverse=True))
+
+    def test_filters(self):
+        response = self.client.get('/api/clothing/search/', {'q': 'jeans', 'clothing_type': 'top', 'limit': 50})
+        ids = {r['id'] for r in response.json()}
+        self.assertEqual(ids, {item.id for item in self.items if item.clothing_type == 'Top'})
+
+    def test_style_filter_can_use_the_user_style_index(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/clothing/search/', {'q': 'jeans', 'style': 'Formal', 'limit': 50})
+        self.assertEqual({r['id'] for r in response.json()}, {item.id for item in self.items if item.style == 'formal'})
+        self.assertFalse(any('UPPER(' in query['sql'] for query in queries))
+
+    def test_query_required(self):
+        self.assertEqual(self.client.get('/api/clothing/search/').status_code, 400)
+        self.assertEqual(self.client.get('/api/clothing/search/', {'q': 'x' * 201}).status_code, 400)
+
+    def test_model_unavailable(self):
+        with mock.patch('wardrobe.utils.text_search.encode_queries', side_effect=ImportError('no torch')):
+            response = self.client.get('/api/clothing/search/', {'q': 'red scarf'})
+        self.assertEqual(response.status_code, 503)
+
+    def test_other_errors_are_not_hidden(self):
+        with mock.patch('wardrobe.utils.text_search.encode_queries', side_effect=ValueError('bug')):
+            with self.assertRaises(ValueError):
+                self.client.get('/api/clothing/search/', {'q': 'red scarf'})
+
+
+class EmbeddingCodecTests(TestCase):
+
+    def setUp(self):
+        # CLIP embeddings live near a low-dimensional subspace; mimic that.
+        rng = np.random.default_rng(0)
+        self.vectors = rng.normal(size=(400, 48)) @ rng.normal(size=(48, 512)) + 0.05 * rng.normal(size=(400, 512))
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        overrides = override_settings(
+            WARDROBE_EMBEDDING_CODEC_PATH=os.path.join(directory.name, 'codec.npz'),
+            WARDROBE_ANN_INDEX_DIR=os.path.join(directory.name, 'catalog'),
+            WARDROBE_ANN_BACKEND='pca-int8',
+        )
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        reset_codec()
+        catalog_index.clear()
+        self.addCleanup(reset_codec)
+        self.addCleanup(catalog_index.clear)
+
+    def test_codes_preserve_ranking(self):
+        codec = EmbeddingCodec.fit(self.vectors)
+        codes = codec.encode(self.vectors)
+        self.assertEqual(codes.dtype, np.int8)
+        self.assertEqual(codes.shape, (400, 128))
+        units = self.vectors / np.linalg.norm(self.vectors, axis=1, keepdims=True)
+        self.assertGreater((codec.decode(codes) * units).sum(axis=1).min(), 0.99)
+        approx = codec.score(codes, units[0])
+        np.testing.assert_allclose(approx, units @ units[0], atol=0.02)
+
+    def test_fit_command_and_compressed_index(self):
+        user = User.objects.create_user(username="codec", password="pw")
+        items = make_wardrobe(user, 40)
+        for item, vector in zip(items, self.vectors):
+            item.feature_vector = encode_vector(vector)
+        ClothingItem.objects.bulk_update(items, ['feature_vector'])
+
+        call_command('fit_embedding_codec', stdout=io.StringIO())
+        code = decode_code(ClothingItem.objects.get(id=items[3].id).embedding_code)
+        self.assertEqual(len(code), 128)
+
+        index = catalog_index.get()
+        self.assertIsInstance(index, CompressedIndex)
+        results = index.search(self.vectors[3], k=5)
+        self.assertEqual(results[0][0], items[3].id)
+        self.assertAlmostEqual(results[0][1], 1.0, places=4)
+
+    def test_autofix_needs_a_codec_before_it_starts(self):
+        out = io.StringIO()
+        call_command('autofix_vectors', stdout=out)
+        self.assertIn('run `manage.py fit_embedding_codec` first', out.getvalue())
+
+    def test_codes_from_another_fit_are_reencoded(self):
+        user = User.objects.create_user(username="refit", password="pw")
+        items = make_wardrobe(user, 40)
+        for item, vector in zip(items, self.vectors):
+            item.feature_vector = encode_vector(vector)
+        ClothingItem.objects.bulk_update(items, ['feature_vector'])
+        call_command('fit_embedding_codec', stdout=io.StringIO())
+        codec = get_codec()
+        self.assertEqual(set(ClothingItem.objects.filter(user=user).values_list('embedding_codec', flat=True)), {codec.version})
+
+        # Codes written by an earlier fit no longer mean anything under this codec.
+        stale = EmbeddingCodec.fit(-self.vectors[:40])
+        self.assertNotEqual(stale.version, codec.version)
+        for item, vector in zip(items, self.vectors):
+            item.embedding_code, item.embedding_codec = stale.encode(vector)[0].tobytes(), stale.version
+        ClothingItem.objects.bulk_update(items, ['embedding_code', 'embedding_codec'])
+
+        index = catalog_index.rebuild()
+        np.testing.assert_array_equal(index._codes[list(index.item_ids).index(items[3].id)], codec.encode(self.vectors[3])[0])
+        self.assertEqual(index.search(self.vectors[3], k=5)[0][0], items[3].id)
+
+
+class EmbeddingVersionTests(TestCase):
+    """
+    Vectors from an older model stay usable but are never compared with current ones.
+    """
+
+    def setUp(self):
+        embedding_cache.clear()
+        get_cache().clear()
+        self.user = User.objects.create_user(username="versions", password="pw")
+        self.items = make_wardrobe(self.user, 8)
+        # Half the wardrobe still carries vectors from a previous model.
+        self.old = self.items[:4]
+        ClothingItem.objects.filter(id__in=[item.id for item in self.old]).update(embedding_model='RN50:openai')
+        # Make an old item's nearest neighbour a current one, so mixing would show up.
+        ClothingItem.objects.filter(id=self.items[5].id).update(
+            feature_vector=encode_vector(decode_vector(self.old[0].feature_vector) + 0.1)
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_similar_stays_within_version(self):
+        current_ids = {item.id for item in self.items[4:]}
+        response = self.client.get(f'/api/clothing/{self.old[0].id}/similar/')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse({r['id'] for r in response.json()} & current_ids)
+
+        response = self.client.get(f'/api/clothing/{self.items[5].id}/similar/')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse({r['id'] for r in response.json()} & {item.id for item in self.old})
+
+    def test_outdated_items_excluded_from_user_matrix(self):
+        matrix = embedding_cache.get(self.user.id)
+        self.assertIsNone(matrix.vector_of(self.old[0].id))
+        self.assertIsNotNone(matrix.vector_of(self.items[5].id))
+
+    def test_catalog_scope_waits_for_re_embedding(self):
+        response = self.client.get(f'/api/clothing/{self.old[0].id}/similar/', {'scope': 'catalog'})
+        self.assertEqual(response.status_code, 409)
+
+
+class BinaryVectorMigrationTests(TransactionTestCase):
+    """
+    Migration 0006 converts JSON text vectors to packed float32 bytes and back.
+    """
+    before = [('wardrobe', '0005_clothingitem_user_alter_clothingitem_clothing_type')]
+    after = [('wardrobe', '0006_clothingitem_feature_vector_binary')]
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def tearDown(self):
+        self.migrate(MigrationExecutor(connection).loader.graph.leaf_nodes())
+
+    def test_text_to_binary_and_back(self):
+        apps = self.migrate(self.before)
+        user = apps.get_model('auth', 'User').objects.create(username="legacy")
+        ClothingItem = apps.get_model('wardrobe', 'ClothingItem')
+        item = ClothingItem.objects.create(
+            user=user, name="legacy", image="clothes/legacy.jpg", clothing_type='Top', feature_vector='[0.5, -1.25, 2.0]',
+        )
+        broken = ClothingItem.objects.create(
+            user=user, name="broken", image="clothes/broken.jpg", clothing_type='Top', feature_vector='not json',
+        )
+
+        apps = self.migrate(self.after)
+        ClothingItem = apps.get_model('wardrobe', 'ClothingItem')
+        np.testing.assert_array_equal(
+            decode_vector(ClothingItem.objects.get(id=item.id).feature_vector), np.float32([0.5, -1.25, 2.0]),
+        )
+        self.assertIsNone(ClothingItem.objects.get(id=broken.id).feature_vector)
+
+        apps = self.migrate(self.before)
+        ClothingItem = apps.get_model('wardrobe', 'ClothingItem')
+        self.assertEqual(json.loads(ClothingItem.objects.get(id=item.id).feature_vector), [0.5, -1.25, 2.0])
+
+
+class CatalogIndexTests(TestCase):
+    """
+    The exact backend, and snapshots shared between processes.
+    """
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        overrides = override_settings(WARDROBE_ANN_INDEX_DIR=directory.name, WARDROBE_ANN_BACKEND='exact')
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        catalog_index.clear()
+        self.addCleanup(catalog_index.clear)
+        self.user = User.objects.create_user(username="catalog", password="pw")
+
+    def test_exact_backend_matches_brute_force(self):
+        rng = np.random.default_rng(0)
+        vectors = rng.normal(size=(50, 16))
+        types = [TYPES[i % len(TYPES)] for i in range(50)]
+        index = ExactIndex(16)
+        index.add(list(range(1, 51)), vectors, [i % 2 for i in range(50)], types, ['casual'] * 50)
+        units = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+        query = rng.normal(size=16)
+        scores = units @ (query / np.linalg.norm(query))
+
+        results = index.search(query, k=5, user_id=1, clothing_type='top', exclude_ids=[4])
+        expected = [
+            i + 1 for i in np.argsort(-scores)
+            if i % 2 == 1 and types[i] == 'Top' and i + 1 != 4
+        ][:5]
+        self.assertEqual([item_id for item_id, _ in results], expected)
+        np.testing.assert_allclose([score for _, score in results], scores[np.array(expected) - 1], rtol=1e-5)
+
+        # Re-adding tombstones the old row; removed items never come back.
+        index.add([expected[0]], -vectors[expected[0] - 1][None, :], [1], ['Top'], ['casual'])
+        index.remove([expected[1]])
+        self.assertEqual(len(index), 49)
+        ids = [item_id for item_id, _ in index.search(query, k=5, user_id=1, clothing_type='top', exclude_ids=[4])]
+        self.assertNotIn(expected[0], ids[:3])
+        self.assertNotIn(expected[1], ids)
+
+        with tempfile.TemporaryDirectory() as directory:
+            index.save(directory)
+            self.assertEqual(ExactIndex.load(directory).search(query, k=5), index.search(query, k=5))
+
+    def test_other_processes_see_new_items_and_snapshots(self):
+        items = make_wardrobe(self.user, 6)
+        catalog_index.rebuild()
+        # A web worker's handle on the same directory.
+        worker = CatalogIndex()
+        query = decode_vector(items[0].feature_vector)
+        self.assertEqual(worker.search(query, k=1)[0][0], items[0].id)
+
+        # Ingested by another process after the snapshot: found through the overlay.
+        new = make_wardrobe(self.user, 1, seed=7)[0]
+        vector = decode_vector(new.feature_vector)
+        self.assertEqual(worker.search(vector, k=1)[0][0], new.id)
+        self.assertNotIn(new.id, worker.get()._row_of)
+
+        # A newer snapshot is picked up on the next query.
+        catalog_index.rebuild()
+        self.assertIn(new.id, worker.get()._row_of)
+        self.assertEqual(len(os.listdir(catalog_index.directory)), 3)
+
+    def test_catalog_scope(self):
+        other = User.objects.create_user(username="stranger", password="pw")
+        base = np.random.default_rng(1).normal(size=512)
+        mine = make_wardrobe(self.user, 1)[0]
+        theirs = make_wardrobe(other, 1)[0]
+        for item, noise in ((mine, 0.1), (theirs, 0.3)):
+            item.feature_vector = encode_vector(base + noise * np.random.default_rng(item.id).normal(size=512))
+            item.save()
+        client = APIClient()
+        client.force_authenticate(self.user)
+        url = f'/api/clothing/{mine.id}/similar/'
+
+        # Requests never build the index themselves.
+        self.assertEqual(client.get(url, {'scope': 'catalog'}).status_code, 503)
+
+        catalog_index.rebuild()
+        response = client.get(url, {'scope': 'catalog'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([r['id'] for r in response.json()], [theirs.id])
+        self.assertNotIn('user', response.json()[0])
+        self.assertNotIn('status', response.json()[0])
+
+    def test_processing_items_stay_in_the_overlay(self):
+        item = make_wardrobe(self.user, 2)[0]
+        ClothingItem.objects.filter(id=item.id).update(status=ClothingItem.STATUS_PROCESSING, feature_vector=None)
+        index = catalog_index.rebuild()
+        self.assertLess(index.indexed_through, item.id)
+        ClothingItem.objects.filter(id=item.id).update(
+            status=ClothingItem.STATUS_READY, feature_vector=encode_vector(np.ones(512)),
+        )
+        self.assertEqual(catalog_index.search(np.ones(512), k=1)[0][0], item.id)
+
+
+class OutfitSearchTests(TestCase):
+    """
+    Branch and bound returns exactly the brute-force top K.
+    """
+
+    def make_slots(self, seed, missing_vectors=False):
+        rng = np.random.default_rng(seed)
+        # Shared directions make visual scores matter as much as the pair scores.
+        basis = rng.normal(size=(4, 32))
+
+        def item(i):
+            vector = None if missing_vectors and i % 5 == 0 else rng.normal(size=4) @ basis + 0.3 * rng.normal(size=32)
+            return ClothingItem(
+                id=i, name=f"item {i}", style=STYLES[rng.integers(len(STYLES))],
+                feature_vector=encode_vector(vector), **palette_fields(PALETTES[rng.integers(len(PALETTES))]),
+            )
+
+        base = item(1000)
+        slots = {'bottom': [item(i) for i in range(12)], 'shoes': [item(i) for i in range(100, 109)],
+                 'outerwear': [item(i) for i in range(200, 207)]}
+        return base, slots
+
+    def brute_force(self, search, k):
+        outfits = [search._outfit(idx) for idx in itertools.product(*(range(len(slot)) for slot in search.slots))]
+        return sorted((outfit.score for outfit in outfits), reverse=True)[:k]
+
+    def test_exact_matches_brute_force(self):
+        for seed in range(3):
+            for missing_vectors in (False, True):
+                search = OutfitSearch(*self.make_slots(seed, missing_vectors))
+                found = [outfit.score for outfit in search.top_k(10, mode='exact')]
+                np.testing.assert_allclose(found, self.brute_force(search, 10))
+
+    def test_fast_is_close(self):
+        search = OutfitSearch(*self.make_slots(0))
+        best = self.brute_force(search, 1)[0]
+        self.assertGreater(search.top_k(1, mode='fast')[0].score, best - 0.05)
+
+
+class CompatibilityMatrixTests(TestCase):
+    """
+    An invalidated matrix is patched from the items that changed, and ends up equal
+    to one built from scratch.
+    """
+
+    def setUp(self):
+        compatibility_cache.clear()
+        self.addCleanup(compatibility_cache.clear)
+        self.user = User.objects.create_user(username="compat", password="pw")
+        self.items = make_wardrobe(self.user, 12)
+
+    def assertSameRows(self, matrix, fresh):
+        self.assertEqual(sorted(matrix.position), sorted(fresh.position))
+        for item_id in fresh.position:
+            got, expected = matrix.row(item_id), fresh.row(item_id)
+            order = [matrix.position[int(other)] for other in fresh.item_ids]
+            for field in ('palette', 'style', 'harmony_ids', 'primary', 'total'):
+                np.testing.assert_allclose(getattr(got, field)[order], getattr(expected, field), err_msg=field)
+            np.testing.assert_allclose(got.visual[order], expected.visual, rtol=1e-5)
+
+    def test_incremental_refresh(self):
+        matrix = compatibility_cache.get(self.user.id)
+        for item in self.items[:6]:
+            matrix.row(item.id)
+
+        changed, restyled, deleted = self.items[1], self.items[2], self.items[3]
+        deleted_id = deleted.id
+        for field, value in palette_fields(['#000080', '#ffff00']).items():
+            setattr(changed, field, value)
+        changed.feature_vector = encode_vector(np.ones(512))
+        changed.save()
+        restyled.style = 'party'
+        restyled.save()
+        deleted.delete()
+        added = make_wardrobe(self.user, 1, seed=3)[0]
+
+        with CaptureQueriesContext(connection) as queries:
+            patched = compatibility_cache.get(self.user.id)
+        # The wardrobe version, the fingerprint scan, then the two changed items and the new one.
+        self.assertEqual(len(queries), 3)
+        self.assertIsNot(patched, matrix)
+        self.assertNotIn(deleted_id, patched)
+        self.assertIn(added.id, patched)
+        # Rows memoized before the change were patched, not dropped.
+        self.assertIn(patched.position[self.items[0].id], patched._rows)
+        self.assertSameRows(patched, build_compatibility_matrix(self.user.id))
+
+    def test_unchanged_wardrobe_is_reused(self):
+        matrix = compatibility_cache.get(self.user.id)
+        compatibility_cache.invalidate(self.user.id)
+        self.assertIs(compatibility_cache.get(self.user.id), matrix)
+
+
+class BackfillPaletteInfoTests(TestCase):
+
+    def test_backfill_invalidates_cached_outfits(self):
+        user = User.objects.create_user(username="backfill", password="pw")
+        items = make_wardrobe(user, 6)
+        ClothingItem.objects.filter(user=user).update(palette_names=None, palette_families=None, palette_lab=None)
+        client = APIClient()
+        client.force_authenticate(user)
+        self.assertEqual(client.get('/api/clothing/outfit-of-the-day/').status_code, 200)
+        before = WardrobeVersion.objects.get(user=user).version
+
+        call_command('backfill_palette_info', stdout=io.StringIO())
+        self.assertEqual(ClothingItem.objects.get(id=items[0].id).palette_names, palette_fields(PALETTES[0])['palette_names'])
+        self.assertGreater(WardrobeVersion.objects.get(user=user).version, before)
+        self.assertFalse(DailyOutfit.objects.filter(user=user).exists())
+
+
+class CrossProcessCacheTests(TestCase):
+    """
+    Changes saved by another process (e.g. the ingestion worker) reach this process's
+    caches through the WardrobeVersion, without any signal running here.
+    """
+
+    def setUp(self):
+        compatibility_cache.clear()
+        embedding_cache.clear()
+        self.user = User.objects.create_user(username="elsewhere", password="pw")
+        self.items = make_wardrobe(self.user, 6)
+
+    def save_elsewhere(self, item, **fields):
+        ClothingItem.objects.filter(id=item.id).update(**fields)
+        bump_wardrobe_version(self.user.id)
+
+    def test_caches_follow_the_wardrobe_version(self):
+        base, other = self.items[0], self.items[1]
+        matrix = compatibility_cache.get(self.user.id)
+        before = matrix.row(base.id).pair_score(matrix.position[other.id])
+        self.assertIsNotNone(embedding_cache.get(self.user.id).vector_of(base.id))
+
+        self.save_elsewhere(other, **palette_fields(base.color_palette), style=base.style)
+        self.save_elsewhere(base, feature_vector=None)
+
+        matrix = compatibility_cache.get(self.user.id)
+        after = matrix.row(base.id).pair_score(matrix.position[other.id])
+        fresh = build_compatibility_matrix(self.user.id)
+        self.assertNotEqual(after, before)
+        self.assertEqual(after, fresh.row(base.id).pair_score(fresh.position[other.id]))
+        self.assertIsNone(embedding_cache.get(self.user.id).vector_of(base.id))
+
+    def test_finished_job_bumps_the_version(self):
+        item = self.items[2]
+        job = IngestionJob.objects.create(item=item, status=IngestionJob.STATUS_RUNNING)
+        before = WardrobeVersion.objects.get(user=self.user).version
+        finish_job(job, {'feature_vector': encode_vector(np.ones(512)), 'embedding_model': embedding_version()}, [])
+        self.assertGreater(WardrobeVersion.objects.get(user=self.user).version, before)
+
+
+class IngestionQueueTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="queue", password="pw")
+        self.items = make_wardrobe(self.user, 3)
+        ClothingItem.objects.filter(user=self.user).update(status=ClothingItem.STATUS_PROCESSING)
+        self.jobs = [enqueue(item) for item in self.items]
+
+    def test_claim_locks_only_job_rows(self):
+        with CaptureQueriesContext(connection) as queries:
+            jobs = claim_jobs(2)
+        self.assertEqual([job.id for job in jobs], [job.id for job in self.jobs[:2]])
+        self.assertTrue(all(job.status == IngestionJob.STATUS_RUNNING and job.attempts == 1 for job in jobs))
+        locking = next(query['sql'] for query in queries if 'FOR UPDATE' in query['sql'])
+        self.assertIn('FOR UPDATE OF "wardrobe_ingestionjob" SKIP LOCKED', locking)
+        # Claimed jobs are not handed out again.
+        self.assertEqual([job.id for job in claim_jobs(5)], [self.jobs[2].id])
+
+    def test_retry_then_fail(self):
+        job = claim_jobs(1)[0]
+        fail_job(job, "decoder crashed", max_attempts=2)
+        self.assertEqual(IngestionJob.objects.get(id=job.id).status, IngestionJob.STATUS_PENDING)
+
+        job = claim_jobs(1)[0]
+        self.assertEqual(job.attempts, 2)
+        fail_job(job, "decoder crashed again", max_attempts=2)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.error), (IngestionJob.STATUS_FAILED, "decoder crashed again"))
+        self.assertEqual(ClothingItem.objects.get(id=job.item_id).status, ClothingItem.STATUS_FAILED)
+
+    def test_stale_running_jobs_are_requeued(self):
+        job = claim_jobs(1)[0]
+        self.assertEqual(requeue_stale_jobs(older_than=3600), 0)
+        IngestionJob.objects.filter(id=job.id).update(updated_at=timezone.now() - timedelta(hours=2))
+        self.assertEqual(requeue_stale_jobs(older_than=3600), 1)
+        self.assertEqual(IngestionJob.objects.get(id=job.id).status, IngestionJob.STATUS_PENDING)
+
+    def test_finish_marks_item_ready(self):
+        job = claim_jobs(1)[0]
+        finish_job(job, {'feature_vector': encode_vector(np.ones(512))}, ["Color extraction failed: boom"])
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.error), (IngestionJob.STATUS_DONE, "Color extraction failed: boom"))
+        self.assertEqual(ClothingItem.objects.get(id=job.item_id).status, ClothingItem.STATUS_READY)
+
+    def test_item_deleted_while_running(self):
+        job = claim_jobs(1)[0]
+        self.items[0].delete()
+        self.assertFalse(finish_job(job, {'feature_vector': encode_vector(np.ones(512))}, []))
+        fail_job(job, "too late", max_attempts=3)
+        self.assertFalse(IngestionJob.objects.filter(id=job.id).exists())
+
+
+class FakePool:
+    """
+    Stands in for the worker's process pool: images named "poison" kill it, and a
+    dead pool breaks every job submitted after.
+    """
+
+    def __init__(self, pools):
+        self.broken = False
+        self.shut_down = False
+        pools.append(self)
+
+    def submit(self, fn, image_path, content_hash):
+        future = Future()
+        if self.broken or 'poison' in image_path:
+            self.broken = True
+            future.set_exception(BrokenProcessPool("A child process terminated abruptly"))
+        else:
+            future.set_result(({'feature_vector': encode_vector(np.ones(512)), 'embedding_model': embedding_version()}, []))
+        return future
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        self.shut_down = True
+
+
+class IngestionWorkerTests(TestCase):
+
+    def test_broken_pool_is_replaced_once_and_only_the_culprit_fails(self):
+        user = User.objects.create_user(username="worker", password="pw")
+        items = make_wardrobe(user, 4)
+        ClothingItem.objects.filter(id=items[1].id).update(image="clothes/poison.jpg")
+        jobs = [enqueue(item) for item in items]
+        pools = []
+        command = run_ingestion_worker.Command()
+        command._make_pool = lambda options: FakePool(pools)
+
+        call_command(command, once=True, max_attempts=3, stdout=io.StringIO())
+        statuses = {job.item_id: (job.status, job.attempts) for job in IngestionJob.objects.filter(id__in=[j.id for j in jobs])}
+        done = (IngestionJob.STATUS_DONE, 1)
+        self.assertEqual(statuses[items[0].id], done)
+        self.assertEqual(statuses[items[2].id], done)
+        self.assertEqual(statuses[items[3].id], done)
+        # The poisoned job went back to the queue once per claim, then failed for good.
+        self.assertEqual(statuses[items[1].id], (IngestionJob.STATUS_FAILED, 3))
+        self.assertTrue(all(pool.shut_down for pool in pools))
+
+    def test_one_bad_result_does_not_stop_the_worker(self):
+        user = User.objects.create_user(username="deleter", password="pw")
+        items = make_wardrobe(user, 3)
+        jobs = [enqueue(item) for item in items]
+        command = run_ingestion_worker.Command()
+        command._make_pool = lambda options: FakePool([])
+        finish_job_ = run_ingestion_worker.ingestion.finish_job
+
+        def finish(job, fields, errors):
+            if job.item_id == items[0].id:
+                # Deleted by its owner while the job ran.
+                ClothingItem.objects.filter(id=job.item_id).delete()
+            if job.item_id == items[1].id:
+                raise ValueError("unsaveable")
+            return finish_job_(job, fields, errors)
+
+        with mock.patch.object(run_ingestion_worker.ingestion, 'finish_job', side_effect=finish):
+            call_command(command, once=True, max_attempts=3, stdout=io.StringIO())
+        self.assertFalse(IngestionJob.objects.filter(id=jobs[0].id).exists())
+        # Retried like any other failure until max_attempts.
+        failed = IngestionJob.objects.get(id=jobs[1].id)
+        self.assertEqual((failed.status, failed.attempts, failed.error), (IngestionJob.STATUS_FAILED, 3, "unsaveable"))
+        self.assertEqual(IngestionJob.objects.get(id=jobs[2].id).status, IngestionJob.STATUS_DONE)
+
+
+def picture(seed, fmt='PNG', size=200, **save_options):
+    """
+    A synthetic photo: smooth colour blobs, so re-encodes and resizes keep its dHash.
+    """
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:size, 0:size] / size
+    channels = [
+        sum(rng.uniform(0.3, 1) * np.exp(-((x - rng.uniform()) ** 2 + (y - rng.uniform()) ** 2) / 0.05) for _ in range(3))
+        for _ in range(3)
+    ]
+    pixels = (255 * np.clip(np.stack(channels, axis=-1), 0, 1)).astype(np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, format=fmt, **save_options)
+    return buffer.getvalue()
+
+
+class DuplicateUploadTests(TestCase):
+    """
+    Uploads of an already processed picture reuse its embedding and palette instead
+    of queueing an ingestion job.
+    """
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        overrides = override_settings(MEDIA_ROOT=directory.name, WARDROBE_INGESTION_MODE='async')
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        self.user = User.objects.create_user(username="dedup", password="pw")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+        # The first upload is processed by the worker; stand in for it.
+        response = self.upload(picture(0), 'original.png')
+        self.source = ClothingItem.objects.get(id=response.json()['id'])
+        self.assertEqual(self.source.status, ClothingItem.STATUS_PROCESSING)
+        IngestionJob.objects.all().delete()
+        apply_item_fields(self.source, {
+            'feature_vector': encode_vector(np.arange(512)), 'embedding_code': None,
+            'embedding_model': embedding_version(),
+            'image_variants': build_variants(self.source.image.path, self.source.content_hash),
+            **palette_fields(['#102030', '#ffffff']),
+        })
+
+    def upload(self, data, filename):
+        image = SimpleUploadedFile(filename, data, content_type='image/png')
+        response = self.client.post(
+            '/api/clothing/', {'name': filename, 'clothing_type': 'Top', 'style': 'casual', 'image': image},
+            format='multipart',
+        )
+        self.assertEqual(response.status_code, 201, response.content)
+        return response
+
+    def assertReused(self, response):
+        item = ClothingItem.objects.get(id=response.json()['id'])
+        self.assertEqual(item.status, ClothingItem.STATUS_READY)
+        self.assertEqual(bytes(item.feature_vector), bytes(self.source.feature_vector))
+        self.assertEqual(item.color_palette, self.source.color_palette)
+        self.assertFalse(IngestionJob.objects.filter(item=item).exists())
+        return item
+
+    def test_identical_file(self):
+        item = self.assertReused(self.upload(picture(0), 'again.png'))
+        self.assertEqual(item.image.name, self.source.image.name)
+        self.assertEqual(item.image_variants, self.source.image_variants)
+
+    def test_re_encoded_picture(self):
+        item = self.assertReused(self.upload(picture(0, fmt='JPEG', size=180, quality=85), 'again.jpg'))
+        self.assertNotEqual(item.content_hash, self.source.content_hash)
+        self.assertLessEqual(hamming_distance(item.perceptual_hash, self.source.perceptual_hash), 3)
+        # Its own file, so its own variants.
+        self.assertNotEqual(item.image_variants, self.source.image_variants)
+
+    def test_different_picture_is_queued(self):
+        response = self.upload(picture(1), 'other.png')
+        item = ClothingItem.objects.get(id=response.json()['id'])
+        self.assertEqual(item.status, ClothingItem.STATUS_PROCESSING)
+        self.assertTrue(IngestionJob.objects.filter(item=item).exists())
+
+    def test_concurrent_saves_of_the_same_content(self):
+        with tempfile.TemporaryDirectory() as directory:
+            storage = ContentAddressedStorage(location=directory)
+            storage.save('clothes/ab/abc.png', ContentFile(b'first'))
+            # The other upload checked exists() before this one's file was written.
+            with mock.patch.object(ContentAddressedStorage, 'exists', return_value=False):
+                worker = threading.Thread(
+                    target=storage.save, args=('clothes/ab/abc.png', ContentFile(b'first')), daemon=True,
+                )
+                worker.start()
+                worker.join(timeout=5)
+            self.assertFalse(worker.is_alive())
+            self.assertEqual(os.listdir(os.path.join(directory, 'clothes', 'ab')), ['abc.png'])
+            with storage.open('clothes/ab/abc.png') as f:
+                self.assertEqual(f.read(), b'first')
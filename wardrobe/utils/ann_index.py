@@ -0,0 +1,668 @@
+"""
+Approximate nearest-neighbour index over ClothingItem embeddings for catalog-wide
+similarity search.
+
+Backends share one small interface (VectorIndex):
+  - 'faiss'    HNSW graph from faiss-cpu
+  - 'hnswlib'  HNSW graph from hnswlib
+  - 'exact'    brute-force NumPy, used for tests and small catalogs
+  - 'pca-int8' brute force over 128-byte codes (wardrobe.utils.codec), re-ranked
+               exactly with the full vectors; ~16x less memory than 'exact'
+
+The index keeps item id, owner, clothing_type and style per row so queries can be
+filtered. Only vectors from the current embedding model are indexed; an index built
+for another model version is discarded on load.
+
+The index is a snapshot with a single writer: `manage.py build_ann_index` (run it
+periodically) rebuilds it and publishes it under MEDIA_ROOT, and every process
+reloads when a newer snapshot appears. Items ingested after the snapshot are
+scored exactly from the database and merged into the results, so new uploads are
+searchable right away; edits and deletions reach the index at the next rebuild.
+"""
+import logging
+import os
+import shutil
+import threading
+import time
+
+import numpy as np
+from django.conf import settings
+
+from wardrobe.utils.codec import EmbeddingCodec, decode_code, get_codec
+from wardrobe.utils.embedding_cache import normalize_rows
+from wardrobe.utils.vectors import decode_vector, embedding_version
+
+logger = logging.getLogger(__name__)
+
+# Below this many matching rows a filtered query is answered exactly instead of
+# over-fetching from the graph, which is both faster and always complete.
+EXACT_FILTER_THRESHOLD = 4096
+
+# Dimension of an empty index (ViT-B-32 image embeddings).
+DEFAULT_DIM = 512
+
+# 'pca-int8': candidates ranked on codes per requested result, then re-ranked with full vectors.
+RERANK_FACTOR = 10
+
+
+class VectorIndex:
+    """
+    Base class holding per-row metadata; subclasses store the vectors themselves.
+    Rows are append-only: updating an item tombstones its old row.
+    """
+    backend = None
+
+    def __init__(self, dim):
+        self.dim = dim
+        self.version = ''
+        # Every item with an id up to this one that had a vector at build time is indexed.
+        self.indexed_through = 0
+        self.item_ids = np.empty(0, dtype=np.int64)
+        self.user_ids = np.empty(0, dtype=np.int64)
+        self.clothing_types = np.empty(0, dtype='<U20')
+        self.styles = np.empty(0, dtype='<U20')
+        self.alive = np.empty(0, dtype=bool)
+        self._row_of = {}
+
+    def __len__(self):
+        return int(self.alive.sum())
+
+    @property
+    def size(self):
+        return len(self.item_ids)
+
+    def add(self, item_ids, vectors, user_ids, clothing_types, styles):
+        vectors = normalize_rows(vectors)
+        if vectors.shape[1] != self.dim:
+            raise ValueError(f"Expected {self.dim}-dim vectors, got {vectors.shape[1]}")
+        self.remove(item_ids)
+
+        self._add_vectors(vectors)
+        self._append_rows(item_ids, user_ids, clothing_types, styles)
+
+    def _append_rows(self, item_ids, user_ids, clothing_types, styles):
+        start, count = self.size, len(item_ids)
+        self.item_ids = np.concatenate([self.item_ids, np.asarray(item_ids, dtype=np.int64)])
+        self.user_ids = np.concatenate([self.user_ids, np.asarray(user_ids, dtype=np.int64)])
+        self.clothing_types = np.concatenate([self.clothing_types, _lower_array(clothing_types)])
+        self.styles = np.concatenate([self.styles, _lower_array(styles)])
+        self.alive = np.concatenate([self.alive, np.ones(count, dtype=bool)])
+        for offset, item_id in enumerate(item_ids):
+            self._row_of[int(item_id)] = start + offset
+
+    def remove(self, item_ids):
+        for item_id in item_ids:
+            row = self._row_of.pop(int(item_id), None)
+            if row is not None:
+                self.alive[row] = False
+
+    def search(self, query, k=10, user_id=None, clothing_type=None, style=None, exclude_ids=()):
+        """
+        Return up to k (item_id, cosine) pairs, best first, matching the optional filters.
+        """
+        query = normalize_rows(query)[0]
+        if query.shape[0] != self.dim or not self.size:
+            return []
+        mask = self._filter_mask(user_id, clothing_type, style, exclude_ids)
+        matching = np.flatnonzero(mask)
+        if not len(matching):
+            return []
+
+        if len(matching) <= EXACT_FILTER_THRESHOLD:
+            scores = self._vectors_at(matching) @ query
+            order = np.argsort(-scores, kind='stable')[:k]
+            return [(int(self.item_ids[matching[i]]), float(scores[i])) for i in order]
+
+        # Large candidate set: over-fetch from the graph until enough rows pass the filter.
+        fetch = k * 4
+        while True:
+            rows, scores = self._search_vectors(query, min(fetch, self.size))
+            results = [
+                (int(self.item_ids[row]), float(score))
+                for row, score in zip(rows, scores)
+                if row >= 0 and mask[row]
+            ]
+            if len(results) >= k or fetch >= self.size:
+                return results[:k]
+            fetch *= 4
+
+    def save(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        np.savez(
+            os.path.join(directory, 'metadata.npz'),
+            backend=np.array(self.backend),
+            dim=np.array(self.dim),
+            version=np.array(self.version),
+            indexed_through=np.array(self.indexed_through),
+            item_ids=self.item_ids,
+            user_ids=self.user_ids,
+            clothing_types=self.clothing_types,
+            styles=self.styles,
+            alive=self.alive,
+        )
+        self._save_vectors(directory)
+
+    @classmethod
+    def load(cls, directory):
+        with np.load(os.path.join(directory, 'metadata.npz')) as data:
+            index = cls(int(data['dim']))
+            index.version = str(data['version']) if 'version' in data else ''
+            index.indexed_through = int(data['indexed_through']) if 'indexed_through' in data else 0
+            index.item_ids = data['item_ids']
+            index.user_ids = data['user_ids']
+            index.clothing_types = data['clothing_types']
+            index.styles = data['styles']
+            index.alive = data['alive']
+        index._row_of = {
+            int(item_id): row
+            for row, item_id in enumerate(index.item_ids)
+            if index.alive[row]
+        }
+        index._load_vectors(directory)
+        return index
+
+    def _filter_mask(self, user_id, clothing_type, style, exclude_ids):
+        mask = self.alive.copy()
+        if user_id is not None:
+            mask &= self.user_ids == int(user_id)
+        if clothing_type:
+            mask &= self.clothing_types == clothing_type.lower()
+        if style:
+            mask &= self.styles == style.lower()
+        for item_id in exclude_ids:
+            row = self._row_of.get(int(item_id))
+            if row is not None:
+                mask[row] = False
+        return mask
+
+    # Backend hooks
+
+    def _add_vectors(self, vectors):
+        raise NotImplementedError
+
+    def _vectors_at(self, rows):
+        raise NotImplementedError
+
+    def _search_vectors(self, query, k):
+        """
+        Return (rows, scores) of the k nearest rows, alive or not; row -1 means "no result".
+        """
+        raise NotImplementedError
+
+    def _save_vectors(self, directory):
+        raise NotImplementedError
+
+    def _load_vectors(self, directory):
+        raise NotImplementedError
+
+
+class ExactIndex(VectorIndex):
+    """
+    Brute-force inner product over a NumPy matrix. Exact, dependency-free, O(n) per query.
+    """
+    backend = 'exact'
+
+    def __init__(self, dim):
+        super().__init__(dim)
+        self._matrix = np.empty((0, dim), dtype=np.float32)
+
+    def _add_vectors(self, vectors):
+        self._matrix = np.concatenate([self._matrix, vectors])
+
+    def _vectors_at(self, rows):
+        return self._matrix[rows]
+
+    def _search_vectors(self, query, k):
+        scores = self._matrix @ query
+        rows = np.argpartition(-scores, k - 1)[:k] if k < len(scores) else np.arange(len(scores))
+        rows = rows[np.argsort(-scores[rows], kind='stable')]
+        return rows, scores[rows]
+
+    def search(self, query, k=10, user_id=None, clothing_type=None, style=None, exclude_ids=()):
+        query = normalize_rows(query)[0]
+        if query.shape[0] != self.dim or not self.size:
+            return []
+        mask = self._filter_mask(user_id, clothing_type, style, exclude_ids)
+        matching = np.flatnonzero(mask)
+        scores = self._matrix[matching] @ query
+        if len(matching) > k:
+            best = np.argpartition(-scores, k - 1)[:k]
+        else:
+            best = np.arange(len(matching))
+        best = best[np.argsort(-scores[best], kind='stable')]
+        return [(int(self.item_ids[matching[i]]), float(scores[i])) for i in best]
+
+    def _save_vectors(self, directory):
+        np.save(os.path.join(directory, 'vectors.npy'), self._matrix)
+
+    def _load_vectors(self, directory):
+        self._matrix = np.load(os.path.join(directory, 'vectors.npy'))
+
+
+class FaissIndex(VectorIndex):
+    """
+    HNSW graph from faiss-cpu using inner product on unit vectors (= cosine).
+    """
+    backend = 'faiss'
+
+    def __init__(self, dim, m=32, ef_search=128):
+        import faiss
+        super().__init__(dim)
+        self._faiss = faiss
+        self._index = faiss.IndexHNSWFlat(dim, m, faiss.METRIC_INNER_PRODUCT)
+        self._index.hnsw.efSearch = ef_search
+
+    def _add_vectors(self, vectors):
+        self._index.add(np.ascontiguousarray(vectors, dtype=np.float32))
+
+    def _vectors_at(self, rows):
+        return self._index.reconstruct_batch(np.asarray(rows, dtype=np.int64))
+
+    def _search_vectors(self, query, k):
+        self._index.hnsw.efSearch = max(self._index.hnsw.efSearch, k)
+        scores, rows = self._index.search(query[None, :].astype(np.float32), k)
+        return rows[0], scores[0]
+
+    def _save_vectors(self, directory):
+        self._faiss.write_index(self._index, os.path.join(directory, 'vectors.faiss'))
+
+    def _load_vectors(self, directory):
+        self._index = self._faiss.read_index(os.path.join(directory, 'vectors.faiss'))
+
+
+class HnswlibIndex(VectorIndex):
+    """
+    HNSW graph from hnswlib using inner product on unit vectors (= cosine).
+    """
+    backend = 'hnswlib'
+
+    def __init__(self, dim, m=16, ef_construction=200, ef_search=128, initial_capacity=1024):
+        import hnswlib
+        super().__init__(dim)
+        self._hnswlib = hnswlib
+        self._ef_search = ef_search
+        self._index = hnswlib.Index(space='ip', dim=dim)
+        self._index.init_index(max_elements=initial_capacity, ef_construction=ef_construction, M=m)
+        self._index.set_ef(ef_search)
+
+    def _add_vectors(self, vectors):
+        start = self.size
+        needed = start + len(vectors)
+        if needed > self._index.get_max_elements():
+            self._index.resize_index(max(needed, 2 * self._index.get_max_elements()))
+        self._index.add_items(vectors, np.arange(start, needed))
+
+    def _vectors_at(self, rows):
+        return np.asarray(self._index.get_items([int(row) for row in rows]), dtype=np.float32)
+
+    def _search_vectors(self, query, k):
+        self._index.set_ef(max(self._ef_search, k))
+        rows, distances = self._index.knn_query(query, k=min(k, self._index.get_current_count()))
+        # hnswlib's 'ip' space reports 1 - <a, b>.
+        return rows[0].astype(np.int64), 1.0 - distances[0]
+
+    def _save_vectors(self, directory):
+        self._index.save_index(os.path.join(directory, 'vectors.hnsw'))
+
+    def _load_vectors(self, directory):
+        self._index = self._hnswlib.Index(space='ip', dim=self.dim)
+        self._index.load_index(os.path.join(directory, 'vectors.hnsw'), max_elements=max(self.size, 1))
+        self._index.set_ef(self._ef_search)
+
+
+class CompressedIndex(VectorIndex):
+    """
+    PCA + int8 codes instead of vectors: 128 bytes per row rather than 2 KB. Every
+    matching row is scored on its code, then the best k * RERANK_FACTOR are re-ranked
+    with their full vectors from the database, so returned scores are exact cosines.
+    The codec the codes were made with is saved alongside them.
+    """
+    backend = 'pca-int8'
+
+    def __init__(self, dim, codec=None):
+        super().__init__(dim)
+        self.codec = codec or get_codec()
+        code_dim = self.codec.code_dim if self.codec is not None else 0
+        self._codes = np.empty((0, code_dim), dtype=np.int8)
+
+    def add_codes(self, item_ids, codes, user_ids, clothing_types, styles):
+        """
+        Add rows from stored codes (ClothingItem.embedding_code) without their vectors.
+        """
+        self.remove(item_ids)
+        self._codes = np.concatenate([self._codes, np.asarray(codes, dtype=np.int8)])
+        self._append_rows(item_ids, user_ids, clothing_types, styles)
+
+    def search(self, query, k=10, user_id=None, clothing_type=None, style=None, exclude_ids=()):
+        query = normalize_rows(query)[0]
+        if query.shape[0] != self.dim or not self.size:
+            return []
+        matching = np.flatnonzero(self._filter_mask(user_id, clothing_type, style, exclude_ids))
+        if not len(matching):
+            return []
+        scores = self.codec.score(self._codes[matching], query)
+        keep = min(len(matching), k * RERANK_FACTOR)
+        best = np.argpartition(-scores, keep - 1)[:keep] if keep < len(matching) else np.arange(len(matching))
+        return self._rerank(self.item_ids[matching[best]], query, k)
+
+    def _rerank(self, item_ids, query, k):
+        from wardrobe.models import ClothingItem
+        stored = dict(ClothingItem.objects.filter(id__in=item_ids.tolist()).values_list('id', 'feature_vector'))
+        ids, vectors = [], []
+        for item_id in item_ids.tolist():
+            vector = decode_vector(stored.get(item_id))
+            if vector is not None and vector.shape[0] == self.dim:
+                ids.append(item_id)
+                vectors.append(vector)
+        if not ids:
+            return []
+        scores = normalize_rows(np.stack(vectors)) @ query
+        order = np.argsort(-scores, kind='stable')[:k]
+        return [(ids[i], float(scores[i])) for i in order]
+
+    def _add_vectors(self, vectors):
+        if self.codec is None:
+            raise ValueError("No embedding codec; run `manage.py fit_embedding_codec` first")
+        self._codes = np.concatenate([self._codes, self.codec.encode(vectors)])
+
+    def _vectors_at(self, rows):
+        return self.codec.decode(self._codes[rows])
+
+    def _search_vectors(self, query, k):
+        scores = self.codec.score(self._codes, query)
+        rows = np.argpartition(-scores, k - 1)[:k] if k < len(scores) else np.arange(len(scores))
+        rows = rows[np.argsort(-scores[rows], kind='stable')]
+        return rows, scores[rows]
+
+    def _save_vectors(self, directory):
+        np.save(os.path.join(directory, 'codes.npy'), self._codes)
+        self.codec.save(os.path.join(directory, 'codec.npz'))
+
+    def _load_vectors(self, directory):
+        self.codec = EmbeddingCodec.load(os.path.join(directory, 'codec.npz'))
+        self._codes = np.load(os.path.join(directory, 'codes.npy'))
+
+
+BACKENDS = {
+    ExactIndex.backend: ExactIndex,
+    FaissIndex.backend: FaissIndex,
+    HnswlibIndex.backend: HnswlibIndex,
+    CompressedIndex.backend: CompressedIndex,
+}
+
+
+def resolve_backend(name=None):
+    """
+    Map a backend name (or 'auto') to an index class, preferring faiss, then hnswlib.
+    """
+    name = name or getattr(settings, 'WARDROBE_ANN_BACKEND', 'auto')
+    if name != 'auto':
+        return BACKENDS[name]
+    for module, cls in (('faiss', FaissIndex), ('hnswlib', HnswlibIndex)):
+        try:
+            __import__(module)
+        except ImportError:
+            continue
+        return cls
+    return ExactIndex
+
+
+def _lower_array(values):
+    return np.array([(value or '').lower() for value in values], dtype='<U20')
+
+
+class CatalogIndex:
+    """
+    Process-wide handle on the published catalog index snapshot.
+
+    Snapshots are written to a fresh subdirectory and published by atomically
+    replacing the CURRENT file, so readers never see a half-written index; a process
+    checks CURRENT on every query and reloads when it names a newer snapshot.
+    """
+
+    def __init__(self):
+        self._index = None
+        self._snapshot = None
+        self._lock = threading.RLock()
+
+    @property
+    def directory(self):
+        default = os.path.join(settings.MEDIA_ROOT, 'indexes', 'catalog')
+        return str(getattr(settings, 'WARDROBE_ANN_INDEX_DIR', default))
+
+    def get(self):
+        """
+        The current snapshot, or None until build_ann_index has published one. Never
+        builds: that reads every stored embedding, which no request should wait for.
+        """
+        with self._lock:
+            snapshot = self._published()
+            if snapshot is not None and snapshot != self._snapshot:
+                index = self._load(snapshot)
+                if index is None:
+                    logger.warning(f"Catalog index snapshot {snapshot} is unusable; run `manage.py build_ann_index`")
+                else:
+                    self._index = index
+                # Not retried on every query; the next published snapshot is.
+                self._snapshot = snapshot
+            return self._index
+
+    def search(self, query, k=10, user_id=None, clothing_type=None, style=None, exclude_ids=()):
+        """
+        Snapshot results merged with items ingested since the snapshot was built;
+        None when no snapshot has been published yet.
+        """
+        index = self.get()
+        if index is None:
+            return None
+        results = index.search(
+            query, k=k, user_id=user_id, clothing_type=clothing_type, style=style, exclude_ids=exclude_ids,
+        )
+        recent = _recent_matches(index, query, k, user_id, clothing_type, style, exclude_ids)
+        if not recent:
+            return results
+        merged = dict(results)
+        merged.update(recent)
+        return sorted(merged.items(), key=lambda pair: -pair[1])[:k]
+
+    def build(self, backend=None):
+        """
+        A fresh index of every stored embedding from the current model.
+        """
+        from wardrobe.models import ClothingItem
+
+        indexed_through = _indexed_through()
+        index_cls = resolve_backend(backend)
+        if index_cls is CompressedIndex:
+            index = _build_compressed_index()
+        else:
+            rows = (
+                ClothingItem.objects
+                .filter(embedding_model=embedding_version())
+                .exclude(feature_vector=None)
+                .order_by('id')
+                .values_list('id', 'user_id', 'clothing_type', 'style', 'feature_vector')
+                .iterator(chunk_size=2000)
+            )
+            index = None
+            batch = []
+            for row in rows:
+                batch.append(row)
+                if len(batch) >= 2000:
+                    index = _add_rows(index, index_cls, batch)
+                    batch = []
+            index = _add_rows(index, index_cls, batch) or index_cls(DEFAULT_DIM)
+        index.version = embedding_version()
+        index.indexed_through = indexed_through
+        return index
+
+    def rebuild(self, backend=None):
+        """
+        Build a fresh index and publish it as the new snapshot for every process.
+        """
+        index = self.build(backend)
+        snapshot = f"{time.time_ns()}-{os.getpid()}"
+        index.save(os.path.join(self.directory, snapshot))
+        previous = self._published()
+        tmp = os.path.join(self.directory, f"CURRENT.{snapshot}.tmp")
+        with open(tmp, 'w') as f:
+            f.write(snapshot)
+        os.replace(tmp, os.path.join(self.directory, 'CURRENT'))
+        self._prune(keep={snapshot, previous})
+
+        with self._lock:
+            self._index, self._snapshot = index, snapshot
+        logger.info(f"Published {index.backend} catalog index with {len(index)} items as {snapshot}")
+        return index
+
+    def clear(self):
+        """
+        Drop the in-memory index; the next query loads the published snapshot again.
+        """
+        with self._lock:
+            self._index = None
+            self._snapshot = None
+
+    def _published(self):
+        try:
+            with open(os.path.join(self.directory, 'CURRENT')) as f:
+                return f.read().strip() or None
+        except OSError:
+            return None
+
+    def _load(self, snapshot):
+        directory = os.path.join(self.directory, snapshot)
+        try:
+            with np.load(os.path.join(directory, 'metadata.npz')) as data:
+                backend = str(data['backend'])
+            index = BACKENDS[backend].load(directory)
+        except Exception as e:
+            logger.warning(f"Could not load catalog index from {directory}: {e}")
+            return None
+        if index.version != embedding_version():
+            logger.info(f"Catalog index in {directory} is for {index.version or 'an unknown model'}")
+            return None
+        return index
+
+    def _prune(self, keep):
+        """
+        Delete old snapshots. The previous one is kept for processes still loading it.
+        """
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if name not in keep and os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+
+
+def _indexed_through():
+    """
+    Highest item id a build starting now is guaranteed to cover: newer items, and items
+    still being processed, are left to the recent-items overlay.
+    """
+    from django.db.models import Max, Min
+    from wardrobe.models import ClothingItem
+
+    last = ClothingItem.objects.aggregate(last=Max('id'))['last'] or 0
+    processing = ClothingItem.objects.filter(status=ClothingItem.STATUS_PROCESSING).aggregate(first=Min('id'))['first']
+    return last if processing is None else min(last, processing - 1)
+
+
+def _recent_matches(index, query, k, user_id, clothing_type, style, exclude_ids):
+    """
+    Exact (item_id, cosine) pairs for matching items the snapshot doesn't cover.
+    """
+    from wardrobe.models import ClothingItem
+
+    rows = (
+        ClothingItem.objects
+        .filter(id__gt=index.indexed_through, embedding_model=index.version)
+        .exclude(feature_vector=None)
+        .exclude(id__in=list(exclude_ids))
+    )
+    if user_id is not None:
+        rows = rows.filter(user_id=user_id)
+    if clothing_type:
+        rows = rows.of_type(clothing_type)
+    if style:
+        rows = rows.with_style(style)
+    ids, vectors = [], []
+    for item_id, raw in rows.values_list('id', 'feature_vector'):
+        vector = decode_vector(raw)
+        if int(item_id) not in index._row_of and vector is not None and vector.shape[0] == index.dim:
+            ids.append(item_id)
+            vectors.append(vector)
+    if not ids:
+        return []
+    scores = normalize_rows(np.stack(vectors)) @ normalize_rows(query)[0]
+    order = np.argsort(-scores, kind='stable')[:k]
+    return [(ids[i], float(scores[i])) for i in order]
+
+
+def _add_rows(index, index_cls, rows):
+    decoded = [(row, decode_vector(row[4])) for row in rows]
+    decoded = [(row, vec) for row, vec in decoded if vec is not None]
+    if index is None and decoded:
+        index = index_cls(decoded[0][1].shape[0])
+    decoded = [(row, vec) for row, vec in decoded if index is not None and vec.shape[0] == index.dim]
+    if decoded:
+        index.add(
+            [row[0] for row, _ in decoded],
+            np.stack([vec for _, vec in decoded]),
+            [row[1] for row, _ in decoded],
+            [row[2] for row, _ in decoded],
+            [row[3] for row, _ in decoded],
+        )
+    return index
+
+
+def _build_compressed_index():
+    """
+    A CompressedIndex from the stored codes; only rows without a code from the loaded
+    codec (none yet, or made by an earlier fit) have their full vector read and encoded.
+    """
+    from wardrobe.models import ClothingItem
+
+    codec = get_codec()
+    if codec is None:
+        raise ValueError("No embedding codec; run `manage.py fit_embedding_codec` first")
+    index = CompressedIndex(codec.input_dim, codec)
+    rows = (
+        ClothingItem.objects
+        .filter(embedding_model=embedding_version())
+        .exclude(feature_vector=None)
+        .order_by('id')
+        .values_list('id', 'user_id', 'clothing_type', 'style', 'embedding_code', 'embedding_codec')
+        .iterator(chunk_size=5000)
+    )
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= 5000:
+            _add_code_rows(index, batch)
+            batch = []
+    _add_code_rows(index, batch)
+    return index
+
+
+def _add_code_rows(index, rows):
+    from wardrobe.models import ClothingItem
+
+    version = index.codec.version
+    codes = {row[0]: decode_code(row[4]) if row[5] == version else None for row in rows}
+    missing = [item_id for item_id, code in codes.items() if code is None or len(code) != index.codec.code_dim]
+    for item_id, raw in ClothingItem.objects.filter(id__in=missing).values_list('id', 'feature_vector'):
+        vector = decode_vector(raw)
+        valid = vector is not None and vector.shape[0] == index.dim
+        codes[item_id] = index.codec.encode(vector)[0] if valid else None
+    rows = [row for row in rows if codes[row[0]] is not None]
+    if rows:
+        index.add_codes(
+            [row[0] for row in rows],
+            np.stack([codes[row[0]] for row in rows]),
+            [row[1] for row in rows],
+            [row[2] for row in rows],
+            [row[3] for row in rows],
+        )
+
+
+catalog_index = CatalogIndex()
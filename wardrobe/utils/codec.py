@@ -0,0 +1,164 @@
+"""
+Compact embedding codes: PCA to a few dimensions, then int8 per dimension.
+
+A 512-dim float32 embedding (2 KB) becomes a 128-byte code stored next to it in
+ClothingItem.embedding_code, with the codec's version in embedding_codec. Codes are only good for coarse ranking: callers
+score all candidates on codes, keep the best few, then re-rank those with the
+full vectors. The codec is fitted on the corpus by `manage.py
+fit_embedding_codec` and persisted to WARDROBE_EMBEDDING_CODEC_PATH.
+"""
+import hashlib
+import os
+import threading
+
+import numpy as np
+from django.conf import settings
+
+from wardrobe.utils.embedding_cache import normalize_rows
+
+DEFAULT_CODE_DIM = 128
+# Codes are scored in chunks so the float copy of a chunk stays small.
+SCORE_CHUNK_ROWS = 65536
+
+
+class EmbeddingCodec:
+    """
+    code = round((unit_vector - mean) @ components.T / scale), clipped to int8.
+    """
+
+    def __init__(self, mean, components, scale):
+        self.mean = np.asarray(mean, dtype=np.float32)
+        self.components = np.asarray(components, dtype=np.float32)
+        self.scale = np.asarray(scale, dtype=np.float32)
+        self._version = None
+
+    @property
+    def version(self):
+        """
+        Short hash of the fitted parameters; codes are only comparable under the same one.
+        """
+        if self._version is None:
+            digest = hashlib.md5()
+            for array in (self.mean, self.components, self.scale):
+                digest.update(np.ascontiguousarray(array).tobytes())
+            self._version = digest.hexdigest()[:16]
+        return self._version
+
+    @property
+    def input_dim(self):
+        return self.components.shape[1]
+
+    @property
+    def code_dim(self):
+        return self.components.shape[0]
+
+    @classmethod
+    def fit(cls, vectors, code_dim=DEFAULT_CODE_DIM):
+        """
+        Fit on an (n, d) sample of embeddings. The scale of each component maps its
+        99.9th percentile magnitude to 127, so a handful of outliers don't cost precision.
+        """
+        vectors = normalize_rows(vectors)
+        mean = vectors.mean(axis=0)
+        centered = vectors - mean
+        covariance = (centered.T @ centered) / max(len(vectors) - 1, 1)
+        eigenvalues, eigenvectors = np.linalg.eigh(covariance)
+        components = eigenvectors[:, np.argsort(eigenvalues)[::-1][:code_dim]].T
+        projected = centered @ components.T
+        scale = np.maximum(np.percentile(np.abs(projected), 99.9, axis=0), 1e-6) / 127.0
+        return cls(mean, components, scale)
+
+    def encode(self, vectors):
+        """
+        (n, code_dim) int8 codes for (n, input_dim) embeddings.
+        """
+        projected = (normalize_rows(vectors) - self.mean) @ self.components.T
+        return np.clip(np.rint(projected / self.scale), -127, 127).astype(np.int8)
+
+    def decode(self, codes):
+        """
+        Approximate unit-length embeddings back from codes.
+        """
+        return normalize_rows(self.mean + (np.asarray(codes, dtype=np.float32) * self.scale) @ self.components)
+
+    def score(self, codes, query):
+        """
+        Approximate inner products of a unit query with the embeddings behind `codes`.
+        """
+        query = normalize_rows(query)[0]
+        weights = self.scale * (self.components @ query)
+        offset = float(self.mean @ query)
+        scores = np.empty(len(codes), dtype=np.float32)
+        for start in range(0, len(codes), SCORE_CHUNK_ROWS):
+            chunk = codes[start:start + SCORE_CHUNK_ROWS]
+            scores[start:start + len(chunk)] = chunk.astype(np.float32) @ weights + offset
+        return scores
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.tmp.npz"
+        np.savez(tmp, mean=self.mean, components=self.components, scale=self.scale)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(data['mean'], data['components'], data['scale'])
+
+
+def encode_code(codes):
+    """
+    Pack one int8 code into bytes for ClothingItem.embedding_code.
+    """
+    return None if codes is None else np.asarray(codes, dtype=np.int8).ravel().tobytes()
+
+
+def decode_code(data):
+    if not data:
+        return None
+    if isinstance(data, memoryview):
+        data = data.tobytes()
+    return np.frombuffer(data, dtype=np.int8)
+
+
+def codec_path():
+    return str(getattr(
+        settings, 'WARDROBE_EMBEDDING_CODEC_PATH',
+        os.path.join(settings.MEDIA_ROOT, 'indexes', 'embedding_codec.npz'),
+    ))
+
+
+_codec = None
+_codec_loaded = False
+_codec_lock = threading.Lock()
+
+
+def get_codec():
+    """
+    The fitted codec, loaded once per process; None until fit_embedding_codec has run.
+    """
+    global _codec, _codec_loaded
+    if not _codec_loaded:
+        with _codec_lock:
+            if not _codec_loaded:
+                path = codec_path()
+                _codec = EmbeddingCodec.load(path) if os.path.exists(path) else None
+                _codec_loaded = True
+    return _codec
+
+
+def reset_codec():
+    global _codec, _codec_loaded
+    with _codec_lock:
+        _codec, _codec_loaded = None, False
+
+
+def code_for(vector):
+    """
+    (packed code, codec version) for one embedding; (None, '') when there is no codec
+    or the dims don't match.
+    """
+    codec = get_codec()
+    if codec is None or vector is None or len(vector) != codec.input_dim:
+        return None, ''
+    return encode_code(codec.encode(np.asarray(vector, dtype=np.float32))[0]), codec.version
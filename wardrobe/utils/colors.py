@@ -1,34 +1,225 @@
 import json, os
-from webcolors import hex_to_rgb
+from functools import lru_cache
+
+import numpy as np
+from webcolors import hex_to_rgb, name_to_hex, normalize_hex
 
 # Load color name dataset once when the module is imported
 with open(os.path.join(os.path.dirname(__file__), 'json_colors.json')) as f:
     COLOR_LIST = json.load(f)
 
-def hex_to_name_extended(hex_color):
+
+def _parse_dataset(entries):
+    names, rgbs = [], []
+    for item in entries:
+        try:
+            rgbs.append(tuple(hex_to_rgb(item['hex'])))
+        except ValueError:
+            continue
+        names.append(item['name'])
+    return names, np.array(rgbs, dtype=np.int64).reshape(-1, 3)
+
+
+# Parsed once: names in dataset order plus an (n, 3) array of their RGB values.
+COLOR_NAMES, COLOR_RGB = _parse_dataset(COLOR_LIST)
+
+DISTANCE_METRICS = ('rgb', 'lab', 'ciede2000')
+
+
+def rgb_to_lab(rgb):
+    """
+    Convert an (..., 3) array of sRGB values in 0-255 to CIE L*a*b* (D65).
+    """
+    c = np.asarray(rgb, dtype=np.float64) / 255.0
+    c = np.where(c > 0.04045, ((c + 0.055) / 1.055) ** 2.4, c / 12.92)
+    xyz = c @ np.array([
+        [0.4124564, 0.2126729, 0.0193339],
+        [0.3575761, 0.7151522, 0.1191920],
+        [0.1804375, 0.0721750, 0.9503041],
+    ])
+    xyz = xyz / np.array([0.95047, 1.0, 1.08883])
+    f = np.where(xyz > (6 / 29) ** 3, np.cbrt(xyz), xyz / (3 * (6 / 29) ** 2) + 4 / 29)
+    L = 116 * f[..., 1] - 16
+    a = 500 * (f[..., 0] - f[..., 1])
+    b = 200 * (f[..., 1] - f[..., 2])
+    return np.stack([L, a, b], axis=-1)
+
+
+def ciede2000(lab1, lab2):
+    """
+    CIEDE2000 colour difference between broadcastable (..., 3) Lab arrays.
+    """
+    L1, a1, b1 = np.moveaxis(np.asarray(lab1, dtype=np.float64), -1, 0)
+    L2, a2, b2 = np.moveaxis(np.asarray(lab2, dtype=np.float64), -1, 0)
+
+    C1 = np.hypot(a1, b1)
+    C2 = np.hypot(a2, b2)
+    C_bar = (C1 + C2) / 2
+    G = 0.5 * (1 - np.sqrt(C_bar ** 7 / (C_bar ** 7 + 25 ** 7)))
+    a1p, a2p = (1 + G) * a1, (1 + G) * a2
+    C1p, C2p = np.hypot(a1p, b1), np.hypot(a2p, b2)
+    h1p = np.degrees(np.arctan2(b1, a1p)) % 360
+    h2p = np.degrees(np.arctan2(b2, a2p)) % 360
+
+    dLp = L2 - L1
+    dCp = C2p - C1p
+    dhp = h2p - h1p
+    dhp = np.where(dhp > 180, dhp - 360, dhp)
+    dhp = np.where(dhp < -180, dhp + 360, dhp)
+    dhp = np.where(C1p * C2p == 0, 0, dhp)
+    dHp = 2 * np.sqrt(C1p * C2p) * np.sin(np.radians(dhp) / 2)
+
+    Lp_bar = (L1 + L2) / 2
+    Cp_bar = (C1p + C2p) / 2
+    hp_sum = h1p + h2p
+    hp_bar = np.where(
+        C1p * C2p == 0,
+        hp_sum,
+        np.where(np.abs(h1p - h2p) <= 180, hp_sum / 2,
+                 np.where(hp_sum < 360, (hp_sum + 360) / 2, (hp_sum - 360) / 2)),
+    )
+    T = (1 - 0.17 * np.cos(np.radians(hp_bar - 30)) + 0.24 * np.cos(np.radians(2 * hp_bar))
+         + 0.32 * np.cos(np.radians(3 * hp_bar + 6)) - 0.20 * np.cos(np.radians(4 * hp_bar - 63)))
+    d_theta = 30 * np.exp(-(((hp_bar - 275) / 25) ** 2))
+    R_C = 2 * np.sqrt(Cp_bar ** 7 / (Cp_bar ** 7 + 25 ** 7))
+    S_L = 1 + 0.015 * (Lp_bar - 50) ** 2 / np.sqrt(20 + (Lp_bar - 50) ** 2)
+    S_C = 1 + 0.045 * Cp_bar
+    S_H = 1 + 0.015 * Cp_bar * T
+    R_T = -np.sin(np.radians(2 * d_theta)) * R_C
+
+    return np.sqrt(
+        (dLp / S_L) ** 2 + (dCp / S_C) ** 2 + (dHp / S_H) ** 2
+        + R_T * (dCp / S_C) * (dHp / S_H)
+    )
+
+
+# Dataset colours in Lab, for the perceptual metrics.
+COLOR_LAB = rgb_to_lab(COLOR_RGB)
+
+
+@lru_cache(maxsize=1)
+def _lab_tree():
+    """
+    KD-tree over the dataset in Lab space, or None when scipy isn't installed.
+    """
+    try:
+        from scipy.spatial import cKDTree
+    except ImportError:
+        return None
+    return cKDTree(COLOR_LAB)
+
+
+def _nearest_indices(rgb, metric):
+    """
+    Index into COLOR_NAMES of the nearest dataset colour for each row of an (m, 3) RGB array.
+    """
+    if metric == 'rgb':
+        # Squared RGB distance with first-wins ties, exactly like the original linear scan.
+        dist = ((rgb[:, None, :] - COLOR_RGB[None, :, :]) ** 2).sum(axis=2)
+        return dist.argmin(axis=1)
+    lab = rgb_to_lab(rgb)
+    if metric == 'lab':
+        tree = _lab_tree()
+        if tree is not None:
+            return tree.query(lab)[1]
+        dist = ((lab[:, None, :] - COLOR_LAB[None, :, :]) ** 2).sum(axis=2)
+        return dist.argmin(axis=1)
+    if metric == 'ciede2000':
+        return ciede2000(lab[:, None, :], COLOR_LAB[None, :, :]).argmin(axis=1)
+    raise ValueError(f"Unknown colour distance metric: {metric}")
+
+
+@lru_cache(maxsize=8192)
+def _cached_name(normalized_hex, metric):
+    rgb = np.array([tuple(hex_to_rgb(normalized_hex))], dtype=np.int64)
+    return COLOR_NAMES[int(_nearest_indices(rgb, metric)[0])]
+
+
+def hex_to_name_extended(hex_color, metric='rgb'):
     """
     Given a hex color code like '#f9f9f9',
     return the closest matching color name from the extended dataset.
+    `metric` is 'rgb' (squared RGB distance), 'lab' (CIE76) or 'ciede2000'.
     """
     try:
-        r, g, b = hex_to_rgb(hex_color)
-    except ValueError:
+        normalized = normalize_hex(hex_color)
+    except (ValueError, TypeError, AttributeError):
         return "unknown"
+    return _cached_name(normalized, metric)
 
-    best_name = "unknown"
-    min_dist = float('inf')
 
-    for item in COLOR_LIST:
+def hex_to_names(hex_colors, metric='rgb'):
+    """
+    Batch version of hex_to_name_extended: name a whole palette in one vectorized pass.
+    """
+    names = ["unknown"] * len(hex_colors)
+    rows, rgbs = [], []
+    for row, hex_color in enumerate(hex_colors):
         try:
-            r2, g2, b2 = hex_to_rgb(item['hex'])
-            dist = (r - r2)**2 + (g - g2)**2 + (b - b2)**2
-            if dist < min_dist:
-                min_dist = dist
-                best_name = item['name']
-        except ValueError:
+            rgbs.append(tuple(hex_to_rgb(hex_color)))
+        except (ValueError, TypeError, AttributeError):
             continue
+        rows.append(row)
+    if rows:
+        indices = _nearest_indices(np.array(rgbs, dtype=np.int64), metric)
+        for row, index in zip(rows, indices):
+            names[row] = COLOR_NAMES[int(index)]
+    return names
+
+
+# Coarse colour families: the vocabulary of the outfit colour-theory rules in
+# wardrobe.utils.scoring, each anchored at a representative sRGB value.
+FAMILY_RGB = {
+    'black': (0, 0, 0), 'white': (255, 255, 255), 'gray': (128, 128, 128),
+    'silver': (192, 192, 192), 'blue': (0, 87, 183), 'lightblue': (173, 216, 230),
+    'navy': (0, 0, 128), 'denim': (21, 96, 189), 'red': (220, 20, 60),
+    'burgundy': (128, 0, 32), 'maroon': (128, 0, 0), 'green': (0, 128, 0),
+    'olive': (128, 128, 0), 'mint': (152, 255, 152), 'beige': (245, 245, 220),
+    'brown': (139, 69, 19), 'tan': (210, 180, 140), 'camel': (193, 154, 107),
+    'khaki': (195, 176, 145), 'yellow': (255, 221, 0), 'mustard': (225, 173, 1),
+    'gold': (212, 175, 55), 'orange': (255, 140, 0), 'peach': (255, 203, 164),
+    'pink': (255, 105, 180), 'pastel pink': (255, 209, 220), 'blush': (222, 93, 131),
+    'purple': (128, 0, 128), 'lavender': (181, 126, 220),
+}
+FAMILY_NAMES = list(FAMILY_RGB)
+FAMILY_LAB = rgb_to_lab(np.array(list(FAMILY_RGB.values())))
+
+
+def to_hex(color):
+    """
+    Normalize a stored palette entry (hex code or CSS colour name) to '#rrggbb', or None.
+    """
+    if not color:
+        return None
+    try:
+        return normalize_hex(color)
+    except (ValueError, TypeError, AttributeError):
+        pass
+    try:
+        return name_to_hex(color.strip().lower())
+    except (ValueError, AttributeError):
+        return None
+
+
+def describe_palette(colors, metric='rgb'):
+    """
+    Resolve a palette once: normalized hex codes, dataset names, colour families and
+    Lab coordinates, in palette order. Unreadable entries are dropped.
+    """
+    hexes = [h for h in (to_hex(color) for color in colors or []) if h]
+    if not hexes:
+        return {'hexes': [], 'names': [], 'families': [], 'lab': []}
+    rgb = np.array([tuple(hex_to_rgb(h)) for h in hexes], dtype=np.int64)
+    lab = rgb_to_lab(rgb)
+    families = ((lab[:, None, :] - FAMILY_LAB[None, :, :]) ** 2).sum(axis=2).argmin(axis=1)
+    return {
+        'hexes': hexes,
+        'names': [COLOR_NAMES[int(i)] for i in _nearest_indices(rgb, metric)],
+        'families': [FAMILY_NAMES[int(i)] for i in families],
+        'lab': [[round(float(v), 3) for v in row] for row in lab],
+    }
+
 
-    return best_name
 # Alias for compatibility
 def hex_to_name(hex_code):
     return hex_to_name_extended(hex_code)
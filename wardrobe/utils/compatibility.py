@@ -0,0 +1,377 @@
+"""
+Pairwise compatibility between the items of one wardrobe.
+
+Everything the outfit endpoints score per pair of items (visual cosine, palette
+match, style match, colour harmony, primary-colour match) is computed with NumPy
+one base row at a time and memoized, so scoring a combination is only index
+lookups and sums. Per item the matrix keeps just small integer codes (style,
+primary colour name id, palette colour name ids) and its unit embedding.
+
+Matrices are cached per user along with the user's WardrobeVersion. When the
+version has moved on (a change saved by any process) or the ClothingItem signals
+marked the entry stale, the next lookup diffs a fingerprint of every item (light columns plus an MD5 of the
+vector, computed by the database) against the cached one and patches only the
+items that changed, including the memoized rows.
+"""
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from django.conf import settings
+
+from wardrobe.utils.colors import hex_to_names
+from wardrobe.utils.embedding_cache import UserEmbeddingMatrix, normalize_rows
+from wardrobe.utils.response_cache import wardrobe_version
+from wardrobe.utils.scoring import (
+    CLASH_PENALTY, COLOR_WEIGHT, HARMONY_LABELS, STYLE_WEIGHT, PairScore, color_match_scores, color_name_id,
+    compatible_pairs, harmony_bonus, harmony_label_ids, palette_ids,
+)
+from wardrobe.utils.vectors import decode_vector, embedding_version
+
+NO_SCORE = 0.5
+HARMONY_BONUSES = np.array([harmony_bonus(label) for label in HARMONY_LABELS])
+# Columns a cached matrix is built from, apart from the vector itself.
+ITEM_COLUMNS = ('id', 'style', 'primary_color', 'color_palette', 'palette_names', 'embedding_model')
+
+
+class CompatibilityRow:
+    """
+    Scores of one base item against every item in the wardrobe, indexed by position.
+    """
+    harmony_labels = HARMONY_LABELS
+
+    def __init__(self, palette, style, harmony_ids, primary, visual):
+        self.palette = palette
+        self.style = style
+        self.harmony_ids = harmony_ids
+        self.primary = primary
+        self.visual = visual
+        clash = np.where((style == 0) & (palette < 0.5), CLASH_PENALTY, 0.0)
+        self.total = COLOR_WEIGHT * palette + STYLE_WEIGHT * style + HARMONY_BONUSES[harmony_ids] - clash
+
+    def pair_score(self, position):
+        return PairScore(
+            float(self.palette[position]),
+            float(self.style[position]),
+            self.harmony_labels[self.harmony_ids[position]],
+            float(self.total[position]),
+        )
+
+    def patched(self, keep, changed, scores):
+        """
+        This row with only the `keep` positions left, then the positions in `changed`
+        (of the patched matrix) overwritten by `scores`, a CompatibilityMatrix._scores tuple.
+        """
+        parts = []
+        for old, new in zip((self.palette, self.style, self.harmony_ids, self.primary, self.visual), scores):
+            part = np.empty(len(keep) + np.count_nonzero(changed >= len(keep)), dtype=old.dtype)
+            part[:len(keep)] = old[keep]
+            part[changed] = new
+            parts.append(part)
+        return CompatibilityRow(*parts)
+
+
+class CompatibilityMatrix:
+    """
+    Lazily materialized (n, n) compatibility matrices for a fixed list of items.
+    """
+
+    def __init__(self, user_id=None):
+        self.user_id = user_id
+        self.item_ids = np.empty(0, dtype=np.int64)
+        self.position = {}
+        self.fingerprints = {}
+        # Style -> small integer code (-1 means "no style"); codes are only compared for equality.
+        self.style_vocab = {}
+        self.style_codes = np.empty(0, dtype=np.int64)
+        self.primary_ids = np.empty(0, dtype=np.intp)
+        # Palettes as one flat array of colour name ids; item i owns flat[offsets[i]:offsets[i + 1]].
+        self.palette_flat = np.empty(0, dtype=np.intp)
+        self.palette_offsets = np.zeros(1, dtype=np.intp)
+        self.embeddings = UserEmbeddingMatrix([], np.empty((0, 0), dtype=np.float32))
+        self.embedding_rows = np.empty(0, dtype=np.intp)
+        self._rows = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_rows(cls, rows, user_id=None):
+        """
+        `rows` are (id, style, primary_color, color_palette, palette_names, feature_vector) tuples.
+        """
+        matrix = cls(user_id)
+        matrix._set_items(list(rows))
+        return matrix
+
+    def __len__(self):
+        return len(self.item_ids)
+
+    def __contains__(self, item_id):
+        return int(item_id) in self.position
+
+    @property
+    def palette_lengths(self):
+        return np.diff(self.palette_offsets)
+
+    def row(self, item_id):
+        """
+        All pairwise scores for `item_id` as the base, computed once and memoized.
+        """
+        pos = self.position[int(item_id)]
+        row = self._rows.get(pos)
+        if row is None:
+            row = self._compute_row(pos)
+            with self._lock:
+                self._rows[pos] = row
+        return row
+
+    def pair_score(self, base_item, item):
+        return self.row(base_item.id).pair_score(self.position[item.id])
+
+    def unit_vector(self, item):
+        return self.embeddings.vector_of(item.id)
+
+    def visual(self, item_id, other_id):
+        return self.row(item_id).visual[self.position[int(other_id)]]
+
+    def refreshed(self):
+        """
+        This matrix brought up to date with the database: a new matrix that reuses
+        everything about items whose fingerprint hasn't changed, or self when none has.
+        """
+        from wardrobe.models import ClothingItem
+        current = {row[0]: row[1:] for row in _fingerprint_rows(ClothingItem.objects.filter(user_id=self.user_id))}
+        changed = [item_id for item_id, fingerprint in current.items() if self.fingerprints.get(item_id) != fingerprint]
+        removed = [item_id for item_id in self.fingerprints if item_id not in current]
+        if not changed and not removed:
+            return self
+        rows = _item_rows(ClothingItem.objects.filter(user_id=self.user_id, id__in=changed))
+        return self._patched(rows, removed)
+
+    def _compute_row(self, pos):
+        return CompatibilityRow(*self._scores(pos, np.arange(len(self.item_ids))))
+
+    def _scores(self, pos, columns):
+        """
+        (palette, style, harmony_ids, primary, visual) of the item at `pos` against the
+        items at `columns`.
+        """
+        lengths = self.palette_lengths[columns]
+
+        # color_match_score_palette: matches / len(compare palette), capped at 1; 0.5 if either is empty.
+        base_names = self._palette(pos)
+        if len(columns) == len(self.item_ids):
+            flat = self.palette_flat
+        else:
+            flat = np.concatenate([self._palette(c) for c in columns] + [np.empty(0, dtype=np.intp)])
+        owner = np.repeat(np.arange(len(columns)), lengths)
+        hits = compatible_pairs(base_names, flat).sum(axis=0)
+        matches = np.bincount(owner, weights=hits, minlength=len(columns))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            palette = np.minimum(matches / lengths, 1.0)
+        palette[lengths == 0] = NO_SCORE
+        if not len(base_names):
+            palette[:] = NO_SCORE
+
+        # style_match_score: 1 / 0 on equality, 0.5 if either is missing.
+        code = self.style_codes[pos]
+        styles = self.style_codes[columns]
+        style = (styles == code).astype(np.float64)
+        style[styles < 0] = NO_SCORE
+        if code < 0:
+            style[:] = NO_SCORE
+
+        base_primary = self.primary_ids[pos]
+        harmony_ids = harmony_label_ids(base_primary, self.primary_ids[columns])
+        primary = color_match_scores(base_primary, self.primary_ids[columns])
+
+        # Cosine against every item with an embedding; NaN where either side has none.
+        visual = np.full(len(columns), np.nan, dtype=np.float32)
+        base_vec = self.embeddings.vector_of(self.item_ids[pos])
+        if base_vec is not None:
+            rows = self.embedding_rows[columns]
+            present = rows >= 0
+            visual[present] = self.embeddings.matrix[rows[present]] @ base_vec
+        return palette, style, harmony_ids, primary, visual
+
+    def _palette(self, pos):
+        return self.palette_flat[self.palette_offsets[pos]:self.palette_offsets[pos + 1]]
+
+    def _set_items(self, rows, keep=None, previous=None):
+        """
+        Fill the per-item arrays: the `keep` positions of `previous`, then `rows`
+        (new items appended, changed ones replacing their old position).
+        """
+        if previous is None:
+            previous, keep = CompatibilityMatrix(), np.empty(0, dtype=np.intp)
+        self.style_vocab = dict(previous.style_vocab)
+        item_ids = list(previous.item_ids[keep])
+        position = {int(item_id): pos for pos, item_id in enumerate(item_ids)}
+        style_codes = list(previous.style_codes[keep])
+        primary_ids = list(previous.primary_ids[keep])
+        palettes = [previous._palette(pos) for pos in keep]
+        vectors = {}
+        for item_id, style, primary_color, color_palette, names, raw in rows:
+            if names is None or len(names) != len(color_palette or []):
+                names = hex_to_names(color_palette or [])
+            style = (style or '').lower()
+            if style and style not in self.style_vocab:
+                self.style_vocab[style] = len(self.style_vocab)
+            pos = position.get(item_id)
+            if pos is None:
+                pos = position[item_id] = len(item_ids)
+                item_ids.append(item_id)
+                style_codes.append(0)
+                primary_ids.append(0)
+                palettes.append(None)
+            style_codes[pos] = self.style_vocab.get(style, -1)
+            primary_ids[pos] = color_name_id(primary_color or None)
+            palettes[pos] = palette_ids(names)
+            vectors[item_id] = raw
+
+        self.item_ids = np.array(item_ids, dtype=np.int64)
+        self.position = position
+        self.style_codes = np.array(style_codes, dtype=np.int64)
+        self.primary_ids = np.array(primary_ids, dtype=np.intp)
+        lengths = [len(palette) for palette in palettes]
+        self.palette_offsets = np.concatenate([[0], np.cumsum(lengths)]).astype(np.intp)
+        self.palette_flat = np.concatenate(palettes).astype(np.intp) if sum(lengths) else np.empty(0, dtype=np.intp)
+        self.embeddings = _merged_embeddings(previous.embeddings, position, vectors)
+        # Position -> row of self.embeddings, -1 for items without a usable vector.
+        self.embedding_rows = np.full(len(item_ids), -1, dtype=np.intp)
+        self.embedding_rows[[position[int(item_id)] for item_id in self.embeddings.item_ids]] = \
+            np.arange(len(self.embeddings))
+
+    def _patched(self, rows, removed):
+        changed_ids = {row[0] for row in rows}
+        dropped = set(removed) | changed_ids
+        # Changed items keep their position, so memoized rows can be patched in place.
+        kept_ids = [int(item_id) for item_id in self.item_ids if int(item_id) not in removed]
+        keep = np.array([self.position[item_id] for item_id in kept_ids], dtype=np.intp)
+        matrix = CompatibilityMatrix(self.user_id)
+        matrix.fingerprints = {k: v for k, v in self.fingerprints.items() if k not in dropped}
+        matrix.fingerprints.update((row[0], row[1:]) for row in _fingerprints_of(rows))
+        matrix._set_items([row[:6] for row in rows], keep, self)
+
+        changed = np.array(sorted(matrix.position[item_id] for item_id in changed_ids), dtype=np.intp)
+        for old_pos, row in list(self._rows.items()):
+            item_id = int(self.item_ids[old_pos])
+            if item_id in dropped:
+                continue
+            new_pos = matrix.position[item_id]
+            matrix._rows[new_pos] = row.patched(keep, changed, matrix._scores(new_pos, changed))
+        return matrix
+
+
+def _merged_embeddings(previous, position, vectors):
+    """
+    The previous embedding matrix minus items that are gone or changed, plus the new
+    (raw) vectors.
+    """
+    kept = [
+        (int(item_id), row) for row, item_id in enumerate(previous.item_ids)
+        if int(item_id) in position and int(item_id) not in vectors
+    ]
+    if not kept:
+        return UserEmbeddingMatrix.from_rows(vectors.items())
+    fresh = [(item_id, decode_vector(raw)) for item_id, raw in vectors.items()]
+    fresh = [(item_id, vector) for item_id, vector in fresh if vector is not None]
+    fresh = [(item_id, vector) for item_id, vector in fresh if vector.shape[0] == previous.dim]
+    ids = [item_id for item_id, _ in kept] + [item_id for item_id, _ in fresh]
+    matrix = previous.matrix[[row for _, row in kept]]
+    if fresh:
+        matrix = np.concatenate([matrix, normalize_rows(np.stack([vector for _, vector in fresh]))])
+    return UserEmbeddingMatrix(ids, matrix)
+
+
+class CompatibilityCache:
+    """
+    Process-local LRU of CompatibilityMatrix objects keyed by user id. Entries from an
+    older WardrobeVersion, or invalidated in this process, are kept and refreshed
+    incrementally on their next lookup.
+    """
+
+    def __init__(self, max_users=None):
+        self._max_users = max_users
+        self._entries = OrderedDict()
+        self._stale = set()
+        self._generations = {}
+        self._lock = threading.Lock()
+
+    @property
+    def max_users(self):
+        if self._max_users is not None:
+            return self._max_users
+        return getattr(settings, 'WARDROBE_COMPATIBILITY_CACHE_USERS', 64)
+
+    def get(self, user_id):
+        # Read before refreshing: a change committed after this bumps past it.
+        version = wardrobe_version(user_id)[0]
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None:
+                self._entries.move_to_end(user_id)
+                if user_id not in self._stale and entry[0] == version:
+                    return entry[1]
+            generation = self._generations.get(user_id, 0)
+
+        matrix = entry[1].refreshed() if entry is not None else build_compatibility_matrix(user_id)
+
+        with self._lock:
+            if self._generations.get(user_id, 0) == generation:
+                self._entries[user_id] = (version, matrix)
+                self._stale.discard(user_id)
+                while len(self._entries) > self.max_users:
+                    evicted, _ = self._entries.popitem(last=False)
+                    self._stale.discard(evicted)
+        return matrix
+
+    def invalidate(self, user_id):
+        with self._lock:
+            if user_id in self._entries:
+                self._stale.add(user_id)
+            self._generations[user_id] = self._generations.get(user_id, 0) + 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._stale.clear()
+
+
+def build_compatibility_matrix(user_id):
+    from wardrobe.models import ClothingItem
+    rows = _item_rows(ClothingItem.objects.filter(user_id=user_id))
+    matrix = CompatibilityMatrix.from_rows((row[:6] for row in rows), user_id)
+    matrix.fingerprints = {row[0]: row[1:] for row in _fingerprints_of(rows)}
+    return matrix
+
+
+def _item_rows(queryset):
+    """
+    (id, style, primary_color, color_palette, palette_names, feature_vector, embedding_model, digest)
+    tuples. Vectors from another model version count as missing, so visual scores
+    never mix vector spaces.
+    """
+    from django.db.models.functions import MD5
+    version = embedding_version()
+    rows = queryset.order_by('id').values_list(*ITEM_COLUMNS[:5], 'feature_vector', 'embedding_model', MD5('feature_vector'))
+    return [row[:5] + (row[5] if row[6] == version else None,) + row[6:] for row in rows]
+
+
+def _fingerprint_rows(queryset):
+    """
+    (id, *fingerprint) for every item, without transferring the vectors.
+    """
+    from django.db.models.functions import MD5
+    return [_fingerprint(row) for row in queryset.values_list(*ITEM_COLUMNS, MD5('feature_vector'))]
+
+
+def _fingerprints_of(item_rows):
+    return [_fingerprint(row[:5] + row[6:]) for row in item_rows]
+
+
+def _fingerprint(row):
+    item_id, style, primary_color, color_palette, names, embedding_model, digest = row
+    return (item_id, style, primary_color, tuple(color_palette or ()), tuple(names or ()), embedding_model, digest)
+
+
+compatibility_cache = CompatibilityCache()
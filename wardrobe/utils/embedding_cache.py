@@ -0,0 +1,168 @@
+import threading
+from collections import Counter, OrderedDict
+
+import numpy as np
+from django.conf import settings
+
+from wardrobe.utils.response_cache import wardrobe_version
+from wardrobe.utils.vectors import decode_vector, embedding_version
+
+
+def normalize_rows(matrix, eps=1e-8):
+    """
+    L2-normalize each row of a 2-D float32 array (a 1-D array is treated as one row).
+    """
+    matrix = np.atleast_2d(np.asarray(matrix, dtype=np.float32))
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.maximum(norms, eps)
+
+
+class UserEmbeddingMatrix:
+    """
+    All of one user's embeddings as a contiguous (n, d) float32 matrix of unit vectors,
+    plus the ClothingItem id of every row.
+    """
+
+    def __init__(self, item_ids, matrix):
+        self.item_ids = np.asarray(item_ids, dtype=np.int64)
+        self.matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+        self._rows = {int(item_id): row for row, item_id in enumerate(self.item_ids)}
+
+    @classmethod
+    def from_rows(cls, rows):
+        """
+        Build from (item_id, raw feature_vector) pairs, dropping unreadable vectors.
+        If stored vectors disagree on dimension, the most common one wins.
+        """
+        decoded = [(item_id, decode_vector(raw)) for item_id, raw in rows]
+        decoded = [(item_id, vec) for item_id, vec in decoded if vec is not None]
+        if not decoded:
+            return cls([], np.empty((0, 0), dtype=np.float32))
+        dim = Counter(vec.shape[0] for _, vec in decoded).most_common(1)[0][0]
+        decoded = [(item_id, vec) for item_id, vec in decoded if vec.shape[0] == dim]
+        ids = [item_id for item_id, _ in decoded]
+        return cls(ids, normalize_rows(np.stack([vec for _, vec in decoded])))
+
+    def __len__(self):
+        return len(self.item_ids)
+
+    @property
+    def dim(self):
+        return self.matrix.shape[1] if self.matrix.ndim == 2 else 0
+
+    def row_of(self, item_id):
+        return self._rows.get(int(item_id))
+
+    def vector_of(self, item_id):
+        row = self.row_of(item_id)
+        return None if row is None else self.matrix[row]
+
+    def top_k(self, query, k, exclude_ids=(), min_score=None, max_score=None, include_ids=None):
+        """
+        Return up to k (item_id, cosine) pairs, best first, for a query vector.
+        One matrix-vector product plus argpartition; no per-item Python loop.
+        `include_ids`, when given, restricts the candidates to those items.
+        """
+        if not len(self) or k <= 0:
+            return []
+        query = normalize_rows(query)[0]
+        if query.shape[0] != self.dim:
+            return []
+
+        scores = self.matrix @ query
+        mask = np.ones(len(scores), dtype=bool)
+        if min_score is not None:
+            mask &= scores > min_score
+        if max_score is not None:
+            mask &= scores < max_score
+        if include_ids is not None:
+            rows = [self.row_of(item_id) for item_id in include_ids]
+            included = np.zeros(len(scores), dtype=bool)
+            included[[row for row in rows if row is not None]] = True
+            mask &= included
+        for item_id in exclude_ids:
+            row = self.row_of(item_id)
+            if row is not None:
+                mask[row] = False
+
+        candidates = np.flatnonzero(mask)
+        if len(candidates) > k:
+            best = np.argpartition(-scores[candidates], k - 1)[:k]
+            candidates = candidates[best]
+        candidates = candidates[np.argsort(-scores[candidates], kind='stable')]
+        return [(int(self.item_ids[row]), float(scores[row])) for row in candidates]
+
+
+class EmbeddingMatrixCache:
+    """
+    Process-local LRU of UserEmbeddingMatrix objects keyed by user id. Each entry
+    remembers the user's WardrobeVersion it was built at and is rebuilt once the
+    version moves on, so changes saved by other processes (the ingestion worker,
+    other web workers) are picked up; the ClothingItem signals also drop entries
+    in the process that made the change.
+    """
+
+    def __init__(self, max_users=None):
+        self._max_users = max_users
+        self._entries = OrderedDict()
+        self._generations = Counter()
+        self._lock = threading.Lock()
+
+    @property
+    def max_users(self):
+        if self._max_users is not None:
+            return self._max_users
+        return getattr(settings, 'WARDROBE_EMBEDDING_CACHE_USERS', 256)
+
+    def get(self, user_id):
+        # Read before building: a change committed after this bumps past it.
+        version = wardrobe_version(user_id)[0]
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(user_id)
+                return entry[1]
+            generation = self._generations[user_id]
+
+        matrix = self._build(user_id)
+
+        with self._lock:
+            # Don't cache a matrix that an invalidation raced past while we were building it.
+            if self._generations[user_id] != generation:
+                return matrix
+            self._entries[user_id] = (version, matrix)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_users:
+                self._entries.popitem(last=False)
+        return matrix
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+            self._generations[user_id] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _build(self, user_id):
+        return build_user_matrix(user_id, embedding_version())
+
+
+def build_user_matrix(user_id, version):
+    """
+    Embedding matrix of a user's items whose vectors come from model `version`.
+    The cache holds the current version; others are built on demand (during a re-embed).
+    """
+    from wardrobe.models import ClothingItem
+    rows = (
+        ClothingItem.objects
+        .filter(user_id=user_id, embedding_model=version)
+        .exclude(feature_vector=None)
+        .order_by('id')
+        .values_list('id', 'feature_vector')
+    )
+    return UserEmbeddingMatrix.from_rows(rows)
+
+
+embedding_cache = EmbeddingMatrixCache()
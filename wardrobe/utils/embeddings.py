@@ -0,0 +1,324 @@
+import json
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL_NAME = 'ViT-B-32'
+DEFAULT_PRETRAINED = 'laion2b_s34b_b79k'
+BACKENDS = ('torch', 'onnx', 'onnx-int8')
+# open_clip's defaults for the OpenAI/LAION ViT checkpoints.
+CLIP_IMAGE_SIZE = 224
+CLIP_MEAN = (0.48145466, 0.4578275, 0.40821073)
+CLIP_STD = (0.26862954, 0.26130258, 0.27577711)
+
+# Threads per inference call, set by workers before the model loads; None keeps the library default.
+_inference_threads = None
+
+
+def _current_rss_bytes():
+    """
+    Resident set size of the current process, or 0 when it can't be read.
+    """
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError, AttributeError):
+        return 0
+
+
+def backend_name():
+    backend = getattr(settings, 'WARDROBE_EMBEDDING_BACKEND', 'torch')
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown WARDROBE_EMBEDDING_BACKEND {backend!r}; expected one of {BACKENDS}")
+    return backend
+
+
+def set_inference_threads(threads):
+    """
+    Cap the threads used for inference in this process (torch and onnxruntime alike).
+    """
+    global _inference_threads
+    _inference_threads = threads
+    if threads and backend_name() == 'torch':
+        import torch
+        torch.set_num_threads(threads)
+
+
+def onnx_model_path(name=None, pretrained=None, quantized=False):
+    name = name or getattr(settings, 'WARDROBE_EMBEDDING_MODEL', DEFAULT_MODEL_NAME)
+    pretrained = pretrained or getattr(settings, 'WARDROBE_EMBEDDING_PRETRAINED', DEFAULT_PRETRAINED)
+    directory = getattr(settings, 'WARDROBE_ONNX_DIR', os.path.join(settings.MEDIA_ROOT, 'models'))
+    suffix = '-int8' if quantized else ''
+    return os.path.join(directory, f"{name}-{pretrained}{suffix}.onnx")
+
+
+class ClipPreprocess:
+    """
+    NumPy version of open_clip's eval transform (resize the short side with bicubic,
+    centre crop, normalize), so the ONNX backend doesn't need torch or torchvision.
+    Returns a (3, size, size) float32 array.
+    """
+
+    def __init__(self, image_size=CLIP_IMAGE_SIZE, mean=CLIP_MEAN, std=CLIP_STD):
+        self.image_size = image_size
+        self.mean = np.array(mean, dtype=np.float32)
+        self.std = np.array(std, dtype=np.float32)
+
+    def __call__(self, image):
+        from PIL import Image
+        size = self.image_size
+        image = image.convert('RGB')
+        width, height = image.size
+        if width <= height:
+            width, height = size, int(size * height / width)
+        else:
+            width, height = int(size * width / height), size
+        image = image.resize((width, height), Image.BICUBIC)
+        left, top = int(round((width - size) / 2)), int(round((height - size) / 2))
+        image = image.crop((left, top, left + size, top + size))
+        pixels = np.asarray(image, dtype=np.float32) / 255.0
+        return ((pixels - self.mean) / self.std).transpose(2, 0, 1)
+
+
+class EmbeddingModel:
+    """
+    A loaded CLIP model plus its preprocessing transform.
+    Instances are created by the registry and shared by every caller in the process.
+    """
+    backend = 'torch'
+
+    def __init__(self, name, pretrained, model, preprocess, device, load_seconds, rss_delta_bytes):
+        self.name = name
+        self.pretrained = pretrained
+        self.model = model
+        self.preprocess = preprocess
+        self.device = device
+        self.load_seconds = load_seconds
+        self.rss_delta_bytes = rss_delta_bytes
+        self.parameter_bytes = sum(
+            t.numel() * t.element_size()
+            for t in list(model.parameters()) + list(model.buffers())
+        )
+        self._tokenizer = None
+
+    def encode_image(self, image):
+        """
+        Return the embedding of a single PIL image as a list of floats.
+        """
+        return self.encode_images([image])[0]
+
+    def encode_images(self, images):
+        """
+        Return embeddings for a batch of PIL images, one list of floats per image.
+        """
+        import torch
+        batch = torch.stack([self.preprocess(image) for image in images])
+        return self.encode_tensor(batch)
+
+    def encode_tensor(self, batch):
+        """
+        Run the image tower on an already preprocessed (N, 3, H, W) tensor.
+        """
+        import torch
+        with torch.no_grad():
+            features = self.model.encode_image(batch.to(self.device))
+        return features.cpu().tolist()
+
+    def encode_texts(self, texts):
+        """
+        Return text tower embeddings for a list of strings, one list of floats each.
+        """
+        import open_clip
+        import torch
+        if self._tokenizer is None:
+            self._tokenizer = open_clip.get_tokenizer(self.name)
+        with torch.no_grad():
+            features = self.model.encode_text(self._tokenizer(texts).to(self.device))
+        return features.cpu().tolist()
+
+    def stats(self):
+        return {
+            'model': self.name,
+            'pretrained': self.pretrained,
+            'backend': self.backend,
+            'device': self.device,
+            'load_seconds': round(self.load_seconds, 3),
+            'parameter_bytes': self.parameter_bytes,
+            'rss_delta_bytes': self.rss_delta_bytes,
+        }
+
+
+class OnnxEmbeddingModel:
+    """
+    The CLIP image tower exported to ONNX, run with onnxruntime on the CPU. Same
+    interface as EmbeddingModel; `preprocess` produces NumPy arrays.
+    """
+    device = 'cpu'
+
+    def __init__(self, name, pretrained, backend, session, preprocess, path, load_seconds, rss_delta_bytes):
+        self.name = name
+        self.pretrained = pretrained
+        self.backend = backend
+        self.session = session
+        self.preprocess = preprocess
+        self.path = path
+        self.load_seconds = load_seconds
+        self.rss_delta_bytes = rss_delta_bytes
+        self.parameter_bytes = os.path.getsize(path)
+        self.input_name = session.get_inputs()[0].name
+
+    def encode_image(self, image):
+        return self.encode_images([image])[0]
+
+    def encode_images(self, images):
+        return self.encode_tensor(np.stack([self.preprocess(image) for image in images]))
+
+    def encode_tensor(self, batch):
+        """
+        Run the exported tower on a preprocessed (N, 3, H, W) array (or CPU tensor).
+        """
+        batch = np.ascontiguousarray(batch, dtype=np.float32)
+        features = self.session.run(None, {self.input_name: batch})[0]
+        return features.tolist()
+
+    def stats(self):
+        return {
+            'model': self.name,
+            'pretrained': self.pretrained,
+            'backend': self.backend,
+            'device': self.device,
+            'path': self.path,
+            'load_seconds': round(self.load_seconds, 3),
+            'parameter_bytes': self.parameter_bytes,
+            'rss_delta_bytes': self.rss_delta_bytes,
+        }
+
+
+class EmbeddingModelRegistry:
+    """
+    Loads each (backend, model, pretrained) combination at most once per process.
+    Safe to call from request threads and from a startup warm-up thread at the same time.
+    """
+
+    def __init__(self):
+        self._models = {}
+        self._lock = threading.Lock()
+
+    def get(self, name=None, pretrained=None, backend=None):
+        key = self._key(name, pretrained, backend)
+        model = self._models.get(key)
+        if model is not None:
+            return model
+        with self._lock:
+            # Another thread may have finished loading while we waited.
+            model = self._models.get(key)
+            if model is None:
+                model = self._load(*key)
+                self._models[key] = model
+        return model
+
+    def warm_up(self, name=None, pretrained=None):
+        try:
+            model = self.get(name, pretrained)
+        except Exception as e:
+            logger.error(f"Embedding model warm-up failed: {e}", exc_info=True)
+            return None
+        logger.info(f"Embedding model ready: {model.stats()}")
+        return model
+
+    def is_loaded(self, name=None, pretrained=None, backend=None):
+        return self._key(name, pretrained, backend) in self._models
+
+    def stats(self):
+        return [model.stats() for model in self._models.values()]
+
+    def clear(self):
+        with self._lock:
+            self._models.clear()
+
+    def _key(self, name, pretrained, backend):
+        return (
+            name or getattr(settings, 'WARDROBE_EMBEDDING_MODEL', DEFAULT_MODEL_NAME),
+            pretrained or getattr(settings, 'WARDROBE_EMBEDDING_PRETRAINED', DEFAULT_PRETRAINED),
+            backend or backend_name(),
+        )
+
+    def _load(self, name, pretrained, backend):
+        if backend != 'torch':
+            return self._load_onnx(name, pretrained, backend)
+
+        import open_clip
+        import torch
+
+        device = "cuda" if torch.cuda.is_available() else "cpu"
+        rss_before = _current_rss_bytes()
+        started = time.perf_counter()
+
+        model, _, preprocess = open_clip.create_model_and_transforms(name, pretrained=pretrained)
+        model.to(device)
+        model.eval()
+
+        load_seconds = time.perf_counter() - started
+        rss_delta = max(_current_rss_bytes() - rss_before, 0)
+        logger.info(f"Loaded embedding model {name}/{pretrained} on {device} in {load_seconds:.2f}s")
+        return EmbeddingModel(name, pretrained, model, preprocess, device, load_seconds, rss_delta)
+
+    def _load_onnx(self, name, pretrained, backend):
+        import onnxruntime
+
+        path = onnx_model_path(name, pretrained, quantized=backend == 'onnx-int8')
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"{path} not found; export it with `manage.py export_onnx_model`")
+        rss_before = _current_rss_bytes()
+        started = time.perf_counter()
+
+        options = onnxruntime.SessionOptions()
+        if _inference_threads:
+            options.intra_op_num_threads = _inference_threads
+        session = onnxruntime.InferenceSession(path, sess_options=options, providers=['CPUExecutionProvider'])
+        preprocess = ClipPreprocess(**read_onnx_metadata(path).get('preprocess', {}))
+
+        load_seconds = time.perf_counter() - started
+        rss_delta = max(_current_rss_bytes() - rss_before, 0)
+        logger.info(f"Loaded ONNX embedding model {path} in {load_seconds:.2f}s")
+        return OnnxEmbeddingModel(name, pretrained, backend, session, preprocess, path, load_seconds, rss_delta)
+
+
+def read_onnx_metadata(path):
+    """
+    The JSON written next to an exported model (preprocessing parameters), or {}.
+    """
+    try:
+        with open(f"{path}.json") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def write_onnx_metadata(path, metadata):
+    with open(f"{path}.json", 'w') as f:
+        json.dump(metadata, f, indent=2)
+
+
+registry = EmbeddingModelRegistry()
+
+
+def get_embedding_model():
+    """
+    Shortcut for the configured model from the process-wide registry.
+    """
+    return registry.get()
+
+
+def get_text_model():
+    """
+    The model used for text embeddings. Only the image tower is exported to ONNX,
+    so this is always the torch model.
+    """
+    return registry.get(backend='torch')
@@ -0,0 +1,31 @@
+"""
+Conditional GET helpers for DRF views: ETag / Last-Modified validators and 304s.
+"""
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from rest_framework import status
+from rest_framework.response import Response
+
+
+def conditional_response(request, etag=None, last_modified=None):
+    """
+    A 304 Response when the client's If-None-Match / If-Modified-Since already match, else None.
+    """
+    not_modified = get_conditional_response(
+        request,
+        etag=quote_etag(etag) if etag else None,
+        last_modified=int(last_modified.timestamp()) if last_modified else None,
+    )
+    if not_modified is None or not_modified.status_code != status.HTTP_304_NOT_MODIFIED:
+        return None
+    return set_validators(Response(status=status.HTTP_304_NOT_MODIFIED), etag, last_modified)
+
+
+def set_validators(response, etag=None, last_modified=None):
+    if etag:
+        response['ETag'] = quote_etag(etag)
+    if last_modified:
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+    # Per-user content: let browsers revalidate, but never share it between users.
+    response['Cache-Control'] = 'private, no-cache'
+    return response
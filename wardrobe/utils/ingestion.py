@@ -0,0 +1,254 @@
+"""
+Upload ingestion: computing an item's embedding and colour palette.
+
+Uploads are saved with status 'processing' and an IngestionJob row; the
+`run_ingestion_worker` management command claims jobs from the database and
+runs `compute_item_fields` in a local process pool, then stores the result with
+a single write. With WARDROBE_INGESTION_MODE = 'sync' the same code runs inline
+in the request instead. Uploads that duplicate an already processed image skip
+both paths and copy that item's fields.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from wardrobe.utils.media import (
+    EMBEDDING_VARIANT, PALETTE_VARIANT, build_variants, hamming_distance, hash_file, perceptual_bands, same_picture,
+    variant_path,
+)
+from wardrobe.utils.process_clothing import extract_color_palette, palette_fields
+from wardrobe.utils.vectors import embedding_version, encode_vector
+
+logger = logging.getLogger(__name__)
+
+RESULT_FIELDS = [
+    'feature_vector', 'embedding_code', 'embedding_codec', 'embedding_model', 'image_variants', 'primary_color', 'color_palette', 'palette_names',
+    'palette_families', 'palette_lab',
+]
+
+
+def is_async():
+    return getattr(settings, 'WARDROBE_INGESTION_MODE', 'async') == 'async'
+
+
+def compute_item_fields(image_path, content_hash=None):
+    """
+    Compute the model fields for an uploaded image. Touches no database, so it can run in
+    a worker process. Returns (fields, errors); a failed step leaves its fields empty
+    rather than failing the whole item.
+    """
+    from PIL import Image
+    from wardrobe.utils.codec import code_for
+    from wardrobe.utils.embeddings import get_embedding_model
+
+    errors = []
+    variants = {}
+    try:
+        variants = build_variants(image_path, content_hash or hash_file(image_path))
+    except Exception as e:
+        errors.append(f"Variant generation failed: {e}")
+
+    try:
+        with Image.open(variant_path(variants, EMBEDDING_VARIANT, image_path)) as image:
+            vector = get_embedding_model().encode_image(image.convert("RGB"))
+        feature_vector, (embedding_code, embedding_codec) = encode_vector(vector), code_for(vector)
+    except Exception as e:
+        errors.append(f"Feature extraction failed: {e}")
+        feature_vector, embedding_code, embedding_codec = None, None, ''
+
+    try:
+        palette = extract_color_palette(variant_path(variants, PALETTE_VARIANT, image_path), num_colors=5)
+    except Exception as e:
+        errors.append(f"Color extraction failed: {e}")
+        palette = []
+
+    fields = {
+        'feature_vector': feature_vector, 'embedding_code': embedding_code, 'embedding_codec': embedding_codec,
+        'embedding_model': embedding_version() if feature_vector else '', 'image_variants': variants,
+        **palette_fields(palette),
+    }
+    return fields, errors
+
+
+def apply_item_fields(item, fields):
+    """
+    Store computed fields and mark the item ready in one UPDATE (signals still fire).
+    """
+    from wardrobe.models import ClothingItem
+    for field, value in fields.items():
+        setattr(item, field, value)
+    item.status = ClothingItem.STATUS_READY
+    item.save(update_fields=RESULT_FIELDS + ['status'])
+
+
+def ingest_now(item):
+    """
+    Synchronous ingestion, used when the queue is disabled.
+    """
+    image_path = item.image.path if item.image else None
+    if image_path:
+        fields, errors = compute_item_fields(image_path, item.content_hash)
+    else:
+        fields, errors = {
+            'feature_vector': None, 'embedding_code': None, 'embedding_codec': '', 'embedding_model': '',
+            'image_variants': {},
+            **palette_fields([]),
+        }, []
+    for error in errors:
+        logger.warning(f"Item {item.id}: {error}")
+    apply_item_fields(item, fields)
+
+
+def find_duplicate(item):
+    """
+    A ready item whose computed fields can be reused for `item`: one with the same
+    content hash or, when WARDROBE_DEDUP_MAX_DISTANCE allows, a perceptual hash within
+    that many bits. Returns (source, exact) or (None, False).
+    """
+    from wardrobe.models import ClothingItem
+    ready = (
+        ClothingItem.objects
+        .filter(status=ClothingItem.STATUS_READY, feature_vector__isnull=False, embedding_model=embedding_version())
+        .exclude(id=item.id)
+        .only('id', 'perceptual_hash', *RESULT_FIELDS)
+    )
+    if item.content_hash:
+        source = ready.filter(content_hash=item.content_hash).first()
+        if source is not None:
+            return source, True
+
+    max_distance = getattr(settings, 'WARDROBE_DEDUP_MAX_DISTANCE', 3)
+    if item.perceptual_hash is None or max_distance is None:
+        return None, False
+    candidates = ready.filter(perceptual_bands__overlap=perceptual_bands(item.perceptual_hash))
+    ranked = sorted(
+        (hamming_distance(item.perceptual_hash, candidate.perceptual_hash), candidate.id, candidate)
+        for candidate in candidates[:50]
+    )
+    for distance, _, candidate in ranked:
+        if distance > max_distance:
+            break
+        # The hash ignores colour: confirm against the candidate's thumbnail before reusing a palette.
+        thumb = variant_path(candidate.image_variants, PALETTE_VARIANT, None)
+        try:
+            if thumb and same_picture(item.image.path, thumb):
+                return candidate, False
+        except Exception as e:
+            logger.warning(f"Item {item.id}: comparing with item {candidate.id} failed: {e}")
+    return None, False
+
+
+def reuse_duplicate(item):
+    """
+    Copy the embedding and palette of a duplicate upload instead of recomputing them.
+    Returns the source item, or None when there is no duplicate.
+    """
+    source, exact = find_duplicate(item)
+    if source is None:
+        return None
+    fields = {field: getattr(source, field) for field in RESULT_FIELDS}
+    if not exact:
+        # Same picture, different file: it still needs variants of its own.
+        try:
+            fields['image_variants'] = build_variants(item.image.path, item.content_hash)
+        except Exception as e:
+            logger.warning(f"Item {item.id}: Variant generation failed: {e}")
+            fields['image_variants'] = {}
+    apply_item_fields(item, fields)
+    logger.info(f"Item {item.id}: reused fields of item {source.id} ({'exact' if exact else 'perceptual'} match)")
+    return source
+
+
+def submit(item):
+    """
+    Ingest a freshly uploaded item: reuse a duplicate's fields when possible, otherwise
+    queue it (or process it inline in 'sync' mode).
+    """
+    if reuse_duplicate(item) is not None:
+        return
+    if is_async():
+        enqueue(item)
+    else:
+        ingest_now(item)
+
+
+def enqueue(item):
+    from wardrobe.models import IngestionJob
+    return IngestionJob.objects.create(item=item)
+
+
+def claim_jobs(limit):
+    """
+    Atomically move up to `limit` pending jobs to 'running'. Concurrent workers skip
+    each other's locked rows, so a job is only ever claimed once.
+    """
+    from wardrobe.models import IngestionJob
+    with transaction.atomic():
+        jobs = list(
+            IngestionJob.objects
+            # Lock only the job rows: the joined items stay writable by web requests.
+            .select_for_update(skip_locked=True, of=('self',))
+            .filter(status=IngestionJob.STATUS_PENDING)
+            .select_related('item')
+            .order_by('created_at')[:limit]
+        )
+        now = timezone.now()
+        IngestionJob.objects.filter(id__in=[job.id for job in jobs]).update(
+            status=IngestionJob.STATUS_RUNNING, attempts=F('attempts') + 1, updated_at=now,
+        )
+    for job in jobs:
+        job.status = IngestionJob.STATUS_RUNNING
+        job.attempts += 1
+        job.updated_at = now
+    return jobs
+
+
+def finish_job(job, fields, errors):
+    """
+    Store a job's result. The item save bumps the user's WardrobeVersion (through the
+    post_save signal), which is how web processes learn that their cached matrices
+    and responses for that user are out of date.
+
+    Returns False when the item was deleted while the job ran; its job row went with it.
+    """
+    from wardrobe.models import ClothingItem, IngestionJob
+    with transaction.atomic():
+        # Locked so the item can't be deleted between this check and the save.
+        if not ClothingItem.objects.select_for_update().filter(id=job.item_id).exists():
+            return False
+        apply_item_fields(job.item, fields)
+        job.status = IngestionJob.STATUS_DONE
+        job.error = "\n".join(errors)
+        job.save(update_fields=['status', 'error', 'updated_at'])
+    return True
+
+
+def fail_job(job, error, max_attempts):
+    """
+    Put a job back in the queue, or give up on it (and its item) after max_attempts.
+    """
+    from wardrobe.models import ClothingItem, IngestionJob
+    job.error = str(error)
+    if job.attempts >= max_attempts:
+        job.status = IngestionJob.STATUS_FAILED
+        ClothingItem.objects.filter(id=job.item_id).update(status=ClothingItem.STATUS_FAILED)
+    else:
+        job.status = IngestionJob.STATUS_PENDING
+    job.updated_at = timezone.now()
+    # An UPDATE rather than save(): the job is gone if its item was deleted meanwhile.
+    IngestionJob.objects.filter(id=job.id).update(status=job.status, error=job.error, updated_at=job.updated_at)
+
+
+def requeue_stale_jobs(older_than):
+    """
+    Return jobs stuck in 'running' (e.g. their worker was killed) to the queue.
+    """
+    from wardrobe.models import IngestionJob
+    cutoff = timezone.now() - timedelta(seconds=older_than)
+    return IngestionJob.objects.filter(
+        status=IngestionJob.STATUS_RUNNING, updated_at__lt=cutoff,
+    ).update(status=IngestionJob.STATUS_PENDING, updated_at=timezone.now())
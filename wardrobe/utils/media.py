@@ -0,0 +1,196 @@
+"""
+Content-addressed originals and their derived image variants.
+
+Uploads are stored as clothes/<sha[:2]>/<sha256>.<ext>, so re-uploading the same
+file reuses the existing original instead of creating a suffixed copy. At
+ingestion time each original gets downscaled variants under
+derived/<sha[:2]>/<sha256>/<variant>.<format>; clients display those and the
+embedding and palette code decode them instead of the full-resolution photo.
+A perceptual hash is kept alongside the SHA-256 so near-duplicates can be found too.
+"""
+import hashlib
+import io
+import os
+import uuid
+from functools import lru_cache
+
+import numpy as np
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from PIL import Image, ImageOps, features
+
+# Longest side in pixels for each variant.
+IMAGE_VARIANTS = {'thumb': 256, 'medium': 768}
+VARIANT_QUALITY = {'webp': 80, 'avif': 60}
+# Which variant each consumer decodes: CLIP resizes to 224 px on the short side,
+# the palette extractor to 128 px on the long side.
+EMBEDDING_VARIANT = 'medium'
+PALETTE_VARIANT = 'thumb'
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    File storage where a name identifies its content: saving a name that already
+    exists is a no-op instead of a suffixed duplicate.
+    """
+
+    def get_available_name(self, name, max_length=None):
+        return name
+
+    def _save(self, name, content):
+        if self.exists(name):
+            return name
+        # Two uploads of the same content can both get past exists(). FileSystemStorage
+        # would then retry the loser forever under the same name, so write to a unique
+        # temporary name and link it into place; whoever links second finds it done.
+        tmp = super()._save(f"{name}.{uuid.uuid4().hex}.tmp", content)
+        try:
+            os.link(self.path(tmp), self.path(name))
+        except FileExistsError:
+            pass
+        finally:
+            os.remove(self.path(tmp))
+        return name
+
+
+@lru_cache(maxsize=1)
+def content_store():
+    return ContentAddressedStorage()
+
+
+def variant_formats():
+    formats = ['webp']
+    if getattr(settings, 'WARDROBE_IMAGE_AVIF', True) and features.check('avif'):
+        formats.append('avif')
+    return formats
+
+
+def hash_file(file, chunk_size=1 << 20):
+    """
+    SHA-256 of a file object or path. File objects are rewound afterwards.
+    """
+    digest = hashlib.sha256()
+    if isinstance(file, (str, os.PathLike)):
+        with open(file, 'rb') as f:
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+    file.seek(0)
+    for chunk in iter(lambda: file.read(chunk_size), b''):
+        digest.update(chunk)
+    file.seek(0)
+    return digest.hexdigest()
+
+
+def perceptual_hash(file):
+    """
+    64-bit difference hash (dHash) of an image as a signed integer (it fits a
+    BigIntegerField). Near-identical images - re-encodes, resizes, small crops of
+    the same photo - differ in only a few bits. File objects are rewound afterwards.
+    """
+    if not isinstance(file, (str, os.PathLike)):
+        file.seek(0)
+    with Image.open(file) as image:
+        image.draft('L', (64, 64))
+        pixels = np.asarray(image.convert('L').resize((9, 8), Image.Resampling.BOX), dtype=np.int16)
+    if not isinstance(file, (str, os.PathLike)):
+        file.seek(0)
+    bits = (pixels[:, 1:] > pixels[:, :-1]).reshape(-1)
+    value = int(''.join('1' if bit else '0' for bit in bits), 2)
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def perceptual_bands(phash):
+    """
+    Split a perceptual hash into four tagged 16-bit bands. Two hashes within
+    3 bits of each other always share at least one band, so an indexed overlap
+    query finds every near-duplicate candidate.
+    """
+    value = phash & ((1 << 64) - 1)
+    return [(band << 16) | ((value >> (16 * band)) & 0xFFFF) for band in range(4)]
+
+
+def hamming_distance(a, b):
+    return bin((a ^ b) & ((1 << 64) - 1)).count('1')
+
+
+def colour_signature(file, size=16):
+    """
+    A (size, size, 3) RGB miniature. dHash only sees luminance gradients, so the same
+    garment photographed in two colourways hashes alike; this tells them apart.
+    """
+    if not isinstance(file, (str, os.PathLike)):
+        file.seek(0)
+    with Image.open(file) as image:
+        image.draft('RGB', (size * 4, size * 4))
+        signature = np.asarray(image.convert('RGB').resize((size, size), Image.Resampling.BOX), dtype=np.float32)
+    if not isinstance(file, (str, os.PathLike)):
+        file.seek(0)
+    return signature
+
+
+def same_picture(a, b, tolerance=10.0):
+    """
+    Whether two images (paths or files) look the same: mean absolute RGB difference of
+    their colour signatures at most `tolerance` (0-255 scale).
+    """
+    return float(np.abs(colour_signature(a) - colour_signature(b)).mean()) <= tolerance
+
+
+def original_name(content_hash, filename):
+    ext = os.path.splitext(filename)[1].lower() or '.jpg'
+    return f"clothes/{content_hash[:2]}/{content_hash}{ext}"
+
+
+def content_addressed_upload(instance, filename):
+    """
+    `upload_to` for ClothingItem.image. Uses the hash computed by the view when present.
+    """
+    if not instance.content_hash:
+        instance.content_hash = hash_file(instance.image.file)
+    return original_name(instance.content_hash, filename)
+
+
+def variant_name(content_hash, variant, fmt):
+    return f"derived/{content_hash[:2]}/{content_hash}/{variant}.{fmt}"
+
+
+def build_variants(image_path, content_hash):
+    """
+    Write every missing variant of `image_path` and return {variant: {format: name}}.
+    """
+    storage = content_store()
+    formats = variant_formats()
+    variants = {
+        variant: {fmt: variant_name(content_hash, variant, fmt) for fmt in formats}
+        for variant in IMAGE_VARIANTS
+    }
+    if all(storage.exists(name) for names in variants.values() for name in names.values()):
+        return variants
+
+    with Image.open(image_path) as image:
+        image = ImageOps.exif_transpose(image)
+        image = image.convert('RGBA' if image.mode in ('RGBA', 'LA', 'P') else 'RGB')
+        # Largest first, so each smaller variant is resampled from the one above it.
+        for variant, size in sorted(IMAGE_VARIANTS.items(), key=lambda kv: -kv[1]):
+            image.thumbnail((size, size), Image.Resampling.LANCZOS)
+            for fmt, name in variants[variant].items():
+                if storage.exists(name):
+                    continue
+                buffer = io.BytesIO()
+                image.save(buffer, format=fmt.upper(), quality=VARIANT_QUALITY[fmt])
+                storage.save(name, ContentFile(buffer.getvalue()))
+    return variants
+
+
+def variant_path(variants, variant, fallback):
+    """
+    Filesystem path of a variant for decoding (WebP, which every Pillow build reads),
+    or `fallback` when it hasn't been generated.
+    """
+    name = (variants or {}).get(variant, {}).get('webp')
+    if not name:
+        return fallback
+    path = content_store().path(name)
+    return path if os.path.exists(path) else fallback
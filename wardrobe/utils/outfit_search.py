@@ -0,0 +1,242 @@
+"""
+Top-K outfit search that never materializes the Cartesian product of slots.
+
+An outfit is a base item plus one candidate per slot (e.g. bottom and shoes). It scores
+
+    VISUAL_WEIGHT * visual + mean(pair_score(base, candidate).total over the slots)
+
+where `visual` is the mean pairwise cosine over every item in the outfit that has an
+embedding (0.5 when fewer than two do). The pair part is separable per slot and the
+visual part can be bounded from per-slot maxima, which is what makes pruning possible.
+
+Modes:
+  - 'exact': branch and bound with a bounded heap. Returns the true top-K.
+  - 'fast':  beam search. Near-exact, and its cost grows linearly with the wardrobe.
+"""
+import heapq
+import itertools
+from collections import Counter, namedtuple
+
+import numpy as np
+
+from wardrobe.utils.embedding_cache import normalize_rows
+from wardrobe.utils.scoring import VISUAL_WEIGHT, pair_score
+from wardrobe.utils.vectors import decode_vector
+
+SEARCH_MODES = ('exact', 'fast')
+DEFAULT_BEAM_WIDTH = 32
+NO_VISUAL_SCORE = 0.5
+
+ScoredOutfit = namedtuple('ScoredOutfit', ['score', 'visual', 'items', 'pair_scores'])
+
+
+class _Slot:
+    def __init__(self, name, items, pair_scores, units, has_vec, base_cos):
+        self.name = name
+        self.items = items
+        self.pair_scores = pair_scores
+        self.units = units
+        self.has_vec = has_vec
+        self.base_cos = base_cos
+        self.g = np.array([p.total for p in pair_scores], dtype=np.float64)
+        # Best-first by the separable part of the score.
+        self.order = np.argsort(-self.g, kind='stable')
+        # Beam search additionally looks at how well a candidate matches the base visually.
+        priority = self.g + VISUAL_WEIGHT * np.where(has_vec, base_cos, NO_VISUAL_SCORE)
+        self.priority_order = np.argsort(-priority, kind='stable')
+
+    def __len__(self):
+        return len(self.items)
+
+
+class OutfitSearch:
+    """
+    Score outfits built around `base_item` from `slots`, a mapping of slot name to
+    candidate items. Empty slots must be left out by the caller.
+    """
+
+    def __init__(self, base_item, slots, pair_scorer=pair_score, vector_of=None):
+        self.base_item = base_item
+        vector_of = vector_of or _unit_vector
+        vectors = {base_item.id: vector_of(base_item)}
+        for items in slots.values():
+            for item in items:
+                vectors[item.id] = vector_of(item)
+        dim = _common_dim(vectors.values(), vectors[base_item.id])
+
+        base_unit = vectors[base_item.id]
+        self.base_has_vec = base_unit is not None and base_unit.shape[0] == dim
+
+        self.slots = []
+        for name, items in slots.items():
+            units = np.zeros((len(items), dim or 0), dtype=np.float32)
+            has_vec = np.zeros(len(items), dtype=bool)
+            for row, item in enumerate(items):
+                vec = vectors[item.id]
+                if vec is not None and vec.shape[0] == dim:
+                    units[row] = vec
+                    has_vec[row] = True
+            base_cos = units @ base_unit if self.base_has_vec else np.zeros(len(items), dtype=np.float32)
+            pair_scores = [pair_scorer(base_item, item) for item in items]
+            self.slots.append(_Slot(name, items, pair_scores, units, has_vec, base_cos))
+
+        n = len(self.slots)
+        # suffix_max_g[l] = best possible separable score from slots l..n-1
+        self.suffix_max_g = np.zeros(n + 1)
+        for level in range(n - 1, -1, -1):
+            self.suffix_max_g[level] = self.suffix_max_g[level + 1] + self.slots[level].g.max()
+
+    def top_k(self, k=10, mode='exact', beam_width=DEFAULT_BEAM_WIDTH):
+        if not self.slots or k <= 0:
+            return []
+        if mode == 'fast':
+            states = self._beam(k, beam_width)
+        else:
+            states = self._branch_and_bound(k)
+        outfits = [self._outfit(idx) for idx in states]
+        outfits.sort(key=lambda outfit: outfit.score, reverse=True)
+        return outfits[:k]
+
+    # Scoring helpers
+
+    def _pair_contribution(self, level, row, chosen):
+        """
+        Sum and count of cosines between slot `level` row `row` and the base plus the
+        rows already chosen for earlier slots (only pairs where both sides have vectors).
+        """
+        slot = self.slots[level]
+        if not slot.has_vec[row]:
+            return 0.0, 0
+        total, count = 0.0, 0
+        if self.base_has_vec:
+            total += float(slot.base_cos[row])
+            count += 1
+        unit = slot.units[row]
+        for other_level, other_row in enumerate(chosen):
+            other = self.slots[other_level]
+            if other.has_vec[other_row]:
+                total += float(other.units[other_row] @ unit)
+                count += 1
+        return total, count
+
+    def _outfit(self, idx):
+        pair_sum, pair_count, g = 0.0, 0, 0.0
+        for level, row in enumerate(idx):
+            contribution, count = self._pair_contribution(level, row, idx[:level])
+            pair_sum += contribution
+            pair_count += count
+            g += self.slots[level].g[row]
+        visual = pair_sum / pair_count if pair_count else NO_VISUAL_SCORE
+        return ScoredOutfit(
+            score=VISUAL_WEIGHT * visual + g / len(self.slots),
+            visual=visual,
+            items=[slot.items[row] for slot, row in zip(self.slots, idx)],
+            pair_scores=[slot.pair_scores[row] for slot, row in zip(self.slots, idx)],
+        )
+
+    # Exact: branch and bound
+
+    def _branch_and_bound(self, k):
+        n = len(self.slots)
+        all_vec = self.base_has_vec and all(slot.has_vec.all() for slot in self.slots)
+
+        # Pairwise blocks between slots, masked so maxima only see real pairs.
+        blocks = {}
+        global_max = -np.inf
+        for a, b in itertools.combinations(range(n), 2):
+            block = self.slots[a].units @ self.slots[b].units.T
+            block[~self.slots[a].has_vec, :] = -np.inf
+            block[:, ~self.slots[b].has_vec] = -np.inf
+            blocks[a, b] = block
+            if block.size:
+                global_max = max(global_max, float(block.max()))
+        base_cos_max = []
+        for slot in self.slots:
+            valid = slot.base_cos[slot.has_vec] if self.base_has_vec else np.empty(0)
+            base_cos_max.append(float(valid.max()) if len(valid) else -np.inf)
+            global_max = max(global_max, base_cos_max[-1])
+        # A mean never exceeds its largest term, so this caps `visual` for any outfit.
+        visual_cap = max(NO_VISUAL_SCORE, global_max)
+
+        row_max = {key: block.max(axis=1) for key, block in blocks.items() if block.size}
+        total_pairs = n * (n + 1) // 2
+        # remaining_pairs_max[l] = best sum over pairs among slots l..n-1 plus base pairs of those slots
+        remaining_pairs_max = np.zeros(n + 1)
+        for level in range(n - 1, -1, -1):
+            remaining_pairs_max[level] = remaining_pairs_max[level + 1] + base_cos_max[level] + sum(
+                float(blocks[level, later].max()) for later in range(level + 1, n)
+            )
+
+        def visual_bound(level, chosen, pair_sum):
+            if not all_vec:
+                return visual_cap
+            future = remaining_pairs_max[level]
+            for later in range(level, n):
+                for earlier, row in enumerate(chosen):
+                    future += float(row_max[earlier, later][row])
+            return (pair_sum + future) / total_pairs
+
+        heap = []
+        counter = itertools.count()
+
+        def threshold():
+            return heap[0][0] if len(heap) >= k else -np.inf
+
+        def visit(level, chosen, pair_sum, pair_count, g):
+            if level == n:
+                visual = pair_sum / pair_count if pair_count else NO_VISUAL_SCORE
+                score = VISUAL_WEIGHT * visual + g / n
+                entry = (score, -next(counter), chosen)
+                if len(heap) < k:
+                    heapq.heappush(heap, entry)
+                elif score > heap[0][0]:
+                    heapq.heapreplace(heap, entry)
+                return
+
+            slot = self.slots[level]
+            rest = self.suffix_max_g[level + 1]
+            for row in slot.order:
+                separable = (g + slot.g[row] + rest) / n
+                # Rows are sorted by g, so once the loosest bound fails no later row can win.
+                if VISUAL_WEIGHT * visual_cap + separable <= threshold():
+                    break
+                contribution, count = self._pair_contribution(level, row, chosen)
+                next_chosen = chosen + (int(row),)
+                bound = VISUAL_WEIGHT * visual_bound(level + 1, next_chosen, pair_sum + contribution) + separable
+                if bound <= threshold():
+                    continue
+                visit(level + 1, next_chosen, pair_sum + contribution, pair_count + count, g + slot.g[row])
+
+        visit(0, (), 0.0, 0, 0.0)
+        return [entry[2] for entry in heap]
+
+    # Fast: beam search
+
+    def _beam(self, k, width):
+        n = len(self.slots)
+        width = max(width, k)
+        states = [((), 0.0, 0, 0.0)]
+        for level, slot in enumerate(self.slots):
+            rest = self.suffix_max_g[level + 1]
+            expanded = []
+            for chosen, pair_sum, pair_count, g in states:
+                for row in slot.priority_order[:width]:
+                    contribution, count = self._pair_contribution(level, row, chosen)
+                    new_sum, new_count = pair_sum + contribution, pair_count + count
+                    visual = new_sum / new_count if new_count else NO_VISUAL_SCORE
+                    estimate = VISUAL_WEIGHT * visual + (g + slot.g[row] + rest) / n
+                    expanded.append((estimate, chosen + (int(row),), new_sum, new_count, g + slot.g[row]))
+            states = [state[1:] for state in heapq.nlargest(width, expanded, key=lambda state: state[0])]
+        return [state[0] for state in states]
+
+
+def _unit_vector(item):
+    vector = decode_vector(item.feature_vector)
+    return None if vector is None else normalize_rows(vector)[0]
+
+
+def _common_dim(vectors, base_vector):
+    if base_vector is not None:
+        return base_vector.shape[0]
+    dims = Counter(vec.shape[0] for vec in vectors if vec is not None)
+    return dims.most_common(1)[0][0] if dims else None
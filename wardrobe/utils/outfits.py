@@ -0,0 +1,148 @@
+"""
+Wardrobe loading and the Outfit of the Day.
+
+The outfit endpoints load a user's items once (just OUTFIT_COLUMNS) and work on
+that list in memory. The Outfit of the Day is stored per user and date in
+DailyOutfit: `manage.py precompute_daily_outfits` fills the table ahead of time,
+the endpoint falls back to computing a missing row, and ClothingItem signals
+delete the current row when the wardrobe changes.
+"""
+import hashlib
+import json
+import random
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from wardrobe.utils.compatibility import compatibility_cache
+
+# Columns loaded for outfit endpoints; scores and vectors come from the compatibility matrix.
+OUTFIT_COLUMNS = (
+    'id', 'user_id', 'name', 'clothing_type', 'style', 'image', 'image_variants', 'primary_color', 'color_palette',
+)
+BASE_TYPES = ('top', 'bottom')
+OUTFIT_SLOTS = ('top', 'bottom', 'shoes')
+
+
+def load_wardrobe(user_id):
+    from wardrobe.models import ClothingItem
+    return list(ClothingItem.objects.filter(user_id=user_id).only(*OUTFIT_COLUMNS).order_by('id'))
+
+
+def partition_by_type(items):
+    """
+    Group items by lower-cased clothing type, keeping their order.
+    """
+    by_type = {}
+    for item in items:
+        by_type.setdefault(item.clothing_type.lower(), []).append(item)
+    return by_type
+
+
+def compatibility_matrix_for(user_id, items):
+    """
+    The cached pairwise compatibility matrix for a user's wardrobe, refreshed if it
+    predates any of `items` (e.g. an item saved by another worker).
+    """
+    matrix = compatibility_cache.get(user_id)
+    if any(item.id not in matrix for item in items):
+        compatibility_cache.invalidate(user_id)
+        matrix = compatibility_cache.get(user_id)
+    return matrix
+
+
+def best_outfit(base_item, wardrobe, matrix):
+    """
+    The best top/bottom/shoes around `base_item`, scoring every candidate of each
+    missing type on primary colour and style. Returns {type: item} or None.
+    """
+    needed = set(OUTFIT_SLOTS)
+    outfit = {base_item.clothing_type.lower(): base_item}
+    needed.discard(base_item.clothing_type.lower())
+
+    by_type = partition_by_type(item for item in wardrobe if item.id != base_item.id)
+    row = matrix.row(base_item.id)
+    for item_type in needed:
+        best_match = None
+        highest_score = -1
+        for candidate in by_type.get(item_type, []):
+            position = matrix.position[candidate.id]
+            # Weighted total: color is slightly more important than style.
+            total_score = 0.6 * row.primary[position] + 0.4 * row.style[position]
+            if total_score > highest_score:
+                highest_score = total_score
+                best_match = candidate
+        if best_match:
+            outfit[item_type] = best_match
+
+    if all(slot in outfit for slot in OUTFIT_SLOTS):
+        return outfit
+    return None
+
+
+def compute_outfit_of_the_day(user_id, day, context=None):
+    """
+    (payload, status_code) for a user's outfit on `day`. The base item is drawn with a
+    generator seeded by user and date, so recomputing gives the same outfit.
+    """
+    from wardrobe.serializers import OutfitItemSerializer
+
+    wardrobe = load_wardrobe(user_id)
+    if not wardrobe:
+        return {"error": "Your wardrobe is empty. Add items to get a suggestion!"}, 404
+
+    potential_bases = [item for item in wardrobe if item.clothing_type.lower() in BASE_TYPES]
+    if not potential_bases:
+        # If no tops/bottoms, fall back to any item as a base.
+        potential_bases = wardrobe
+    base_item = random.Random(f"{user_id}:{day.isoformat()}").choice(potential_bases)
+
+    outfit = best_outfit(base_item, wardrobe, compatibility_matrix_for(user_id, wardrobe))
+    if not outfit:
+        return {
+            "error": "We couldn't create a full outfit. Try adding more item types (tops, bottoms, shoes) to your wardrobe!",
+            "base_item_used": OutfitItemSerializer(base_item, context=context or {}).data,
+        }, 400
+
+    payload = {slot: OutfitItemSerializer(outfit[slot], context=context or {}).data for slot in OUTFIT_SLOTS}
+    payload['explanation'] = f"A stylish look featuring your {base_item.name}, selected for its excellent color and style harmony."
+    payload['tags'] = [base_item.style, 'Outfit of the Day', 'Smart Match']
+    return payload, 200
+
+
+def store_outfit_of_the_day(user_id, day, force=False):
+    """
+    Compute and save the DailyOutfit row for `day` (replacing it when `force`).
+    """
+    from wardrobe.models import DailyOutfit
+    payload, status_code = compute_outfit_of_the_day(user_id, day)
+    defaults = {'payload': payload, 'status_code': status_code, 'etag': payload_etag(payload, day)}
+    if force:
+        daily, _ = DailyOutfit.objects.update_or_create(user_id=user_id, date=day, defaults=defaults)
+        return daily
+    try:
+        with transaction.atomic():
+            return DailyOutfit.objects.create(user_id=user_id, date=day, **defaults)
+    except IntegrityError:
+        # Another request or the cron job stored it first.
+        return DailyOutfit.objects.get(user_id=user_id, date=day)
+
+
+def get_outfit_of_the_day(user_id, day=None):
+    """
+    Today's stored outfit: one indexed lookup, computed and stored on a miss.
+    """
+    from wardrobe.models import DailyOutfit
+    day = day or timezone.localdate()
+    daily = DailyOutfit.objects.filter(user_id=user_id, date=day).first()
+    return daily or store_outfit_of_the_day(user_id, day)
+
+
+def invalidate_outfit_of_the_day(user_id):
+    from wardrobe.models import DailyOutfit
+    DailyOutfit.objects.filter(user_id=user_id, date__gte=timezone.localdate()).delete()
+
+
+def payload_etag(payload, day):
+    body = json.dumps(payload, sort_keys=True, default=str)
+    return hashlib.md5(f"{day.isoformat()}:{body}".encode()).hexdigest()
@@ -0,0 +1,161 @@
+"""
+Palette extraction on a downsampled thumbnail with NumPy.
+
+The image is reduced to at most `max_side` pixels per side before any maths runs,
+so the cost no longer depends on the resolution of the uploaded photo. Two
+quantizers are available:
+
+  - 'kmeans':     mini-batch k-means with k-means++ seeding (the default)
+  - 'median_cut': recursive median splits along the widest channel
+
+Both are deterministic for a given `seed`. Transparent pixels are always ignored;
+with `mask_background` a flat backdrop (estimated from the thumbnail border) is
+dropped too, so a studio-white background doesn't end up as the primary colour.
+"""
+import numpy as np
+from PIL import Image
+
+PALETTE_METHODS = ('kmeans', 'median_cut')
+DEFAULT_MAX_SIDE = 128
+
+# Border pixels within this RGB distance of the border median count as background.
+BACKGROUND_TOLERANCE = 24.0
+# Only mask when the border is this uniform (mean distance to its median).
+BACKGROUND_MAX_SPREAD = 12.0
+# Masking never leaves fewer than this share of the foreground pixels.
+MIN_FOREGROUND_SHARE = 0.05
+
+
+def load_thumbnail_pixels(image, max_side=DEFAULT_MAX_SIDE):
+    """
+    Open `image` (a path, file or PIL image), shrink it with a cheap draft decode plus
+    a box filter, and return (pixels, alpha, shape): an (n, 3) float32 RGB array,
+    an (n,) alpha array and the thumbnail's (height, width).
+    """
+    if not isinstance(image, Image.Image):
+        image = Image.open(image)
+    # JPEG can decode straight to a reduced scale, skipping most of the IDCT work.
+    image.draft('RGB', (max_side * 2, max_side * 2))
+    image = image.convert('RGBA')
+    image.thumbnail((max_side, max_side), Image.Resampling.BOX)
+    array = np.asarray(image, dtype=np.float32)
+    height, width = array.shape[:2]
+    return array[..., :3].reshape(-1, 3), array[..., 3].reshape(-1), (height, width)
+
+
+def foreground_mask(pixels, alpha, shape, mask_background=True):
+    """
+    Boolean mask of the pixels that should contribute to the palette.
+    """
+    mask = alpha >= 125
+    if not mask_background or not mask.any():
+        return mask
+
+    height, width = shape
+    grid = np.zeros(shape, dtype=bool)
+    grid[0, :] = grid[-1, :] = grid[:, 0] = grid[:, -1] = True
+    border = grid.reshape(-1) & mask
+    if not border.any():
+        return mask
+
+    border_pixels = pixels[border]
+    backdrop = np.median(border_pixels, axis=0)
+    spread = np.linalg.norm(border_pixels - backdrop, axis=1).mean()
+    if spread > BACKGROUND_MAX_SPREAD:
+        # A busy border means a photo without a flat backdrop; keep everything.
+        return mask
+
+    foreground = mask & (np.linalg.norm(pixels - backdrop, axis=1) > BACKGROUND_TOLERANCE)
+    if foreground.sum() < MIN_FOREGROUND_SHARE * mask.sum():
+        return mask
+    return foreground
+
+
+def kmeans_palette(pixels, num_colors, seed=0, batch_size=1024, iterations=50):
+    """
+    Mini-batch k-means. Returns (centers, weights) sorted by weight, largest first.
+    """
+    rng = np.random.default_rng(seed)
+    k = min(num_colors, len(pixels))
+    centers = _kmeans_plus_plus(pixels, k, rng)
+    counts = np.zeros(k)
+
+    for _ in range(iterations):
+        batch = pixels[rng.integers(0, len(pixels), size=min(batch_size, len(pixels)))]
+        labels = _assign(batch, centers)
+        for cluster in np.unique(labels):
+            members = batch[labels == cluster]
+            counts[cluster] += len(members)
+            rate = len(members) / counts[cluster]
+            centers[cluster] += rate * (members.mean(axis=0) - centers[cluster])
+
+    weights = np.bincount(_assign(pixels, centers), minlength=k)
+    return _sorted(centers, weights)
+
+
+def median_cut_palette(pixels, num_colors):
+    """
+    Median cut: split the most populous, widest box at its median until there are
+    `num_colors` boxes. Returns (centers, weights) sorted by weight, largest first.
+    """
+    boxes = [pixels]
+    while len(boxes) < num_colors:
+        ranges = [np.ptp(box, axis=0).max() if len(box) > 1 else 0.0 for box in boxes]
+        scores = [len(box) * r for box, r in zip(boxes, ranges)]
+        target = int(np.argmax(scores))
+        if scores[target] == 0:
+            break
+        box = boxes.pop(target)
+        channel = int(np.argmax(np.ptp(box, axis=0)))
+        order = np.argsort(box[:, channel], kind='stable')
+        half = len(box) // 2
+        boxes.extend([box[order[:half]], box[order[half:]]])
+
+    centers = np.array([box.mean(axis=0) for box in boxes])
+    weights = np.array([len(box) for box in boxes])
+    return _sorted(centers, weights)
+
+
+def extract_palette(image, num_colors=5, method='kmeans', mask_background=True,
+                    max_side=DEFAULT_MAX_SIDE, seed=0):
+    """
+    Dominant colours of `image` as a list of (r, g, b) tuples, most common first.
+    """
+    if method not in PALETTE_METHODS:
+        raise ValueError(f"Unknown palette method: {method}")
+    pixels, alpha, shape = load_thumbnail_pixels(image, max_side)
+    pixels = pixels[foreground_mask(pixels, alpha, shape, mask_background)]
+    if not len(pixels):
+        return []
+
+    if method == 'median_cut':
+        centers, weights = median_cut_palette(pixels, num_colors)
+    else:
+        centers, weights = kmeans_palette(pixels, num_colors, seed=seed)
+    centers = centers[weights > 0]
+    return [tuple(int(v) for v in row) for row in np.clip(np.rint(centers), 0, 255)]
+
+
+def _assign(pixels, centers):
+    dist = (pixels ** 2).sum(axis=1)[:, None] - 2 * pixels @ centers.T + (centers ** 2).sum(axis=1)[None, :]
+    return dist.argmin(axis=1)
+
+
+def _kmeans_plus_plus(pixels, k, rng):
+    centers = np.empty((k, 3), dtype=np.float64)
+    centers[0] = pixels[rng.integers(len(pixels))]
+    closest = ((pixels - centers[0]) ** 2).sum(axis=1)
+    for i in range(1, k):
+        total = closest.sum()
+        if total == 0:
+            # Fewer distinct colours than clusters: duplicates are dropped by their zero weight.
+            centers[i:] = centers[0]
+            break
+        centers[i] = pixels[rng.choice(len(pixels), p=closest / total)]
+        closest = np.minimum(closest, ((pixels - centers[i]) ** 2).sum(axis=1))
+    return centers
+
+
+def _sorted(centers, weights):
+    order = np.argsort(-weights, kind='stable')
+    return centers[order], weights[order]
@@ -1,14 +1,40 @@
-from colorthief import ColorThief
+from django.conf import settings
 import webcolors
 
+from wardrobe.utils.colors import describe_palette
+from wardrobe.utils.palette import extract_palette
+
 def get_color_name(rgb_tuple):
     try:
         return webcolors.rgb_to_name(rgb_tuple)
     except ValueError:
         return '#{:02x}{:02x}{:02x}'.format(*rgb_tuple)
 
-def extract_color_palette(image_path, num_colors=5):
-    color_thief = ColorThief(image_path)
-    palette = color_thief.get_palette(color_count=num_colors)
-    color_names = [get_color_name(color) for color in palette]
-    return color_names
+def extract_color_palette(image_path, num_colors=5, engine=None):
+    engine = engine or getattr(settings, 'WARDROBE_PALETTE_ENGINE', 'kmeans')
+    if engine == 'colorthief':
+        from colorthief import ColorThief
+        palette = ColorThief(image_path).get_palette(color_count=num_colors)
+    else:
+        palette = extract_palette(
+            image_path,
+            num_colors=num_colors,
+            method=engine,
+            mask_background=getattr(settings, 'WARDROBE_PALETTE_MASK_BACKGROUND', True),
+        )
+    # Always hex, so stored palettes have a single format.
+    return ['#{:02x}{:02x}{:02x}'.format(*color) for color in palette]
+
+def palette_fields(palette):
+    """
+    Model field values for an extracted palette: the normalized hex palette plus the
+    colour names, families and Lab coordinates that scoring reads instead of re-deriving.
+    """
+    info = describe_palette(palette)
+    return {
+        'primary_color': info['names'][0] if info['names'] else "unknown",
+        'color_palette': info['hexes'],
+        'palette_names': info['names'],
+        'palette_families': info['families'],
+        'palette_lab': info['lab'],
+    }
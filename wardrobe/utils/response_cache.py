@@ -0,0 +1,109 @@
+"""
+Response cache for recommendation endpoints.
+
+Results are a function of the user's wardrobe plus the request parameters, so
+they are stored in the 'recommendations' cache under
+(user, wardrobe version, endpoint, params). Any ClothingItem change bumps the
+user's WardrobeVersion, which makes every older entry unreachable; nothing is
+ever deleted explicitly. The key doubles as the ETag, so a client revalidating
+an unchanged wardrobe gets a 304 without the view or the cache being touched.
+"""
+import hashlib
+import json
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from wardrobe.utils.http import conditional_response, set_validators
+
+CACHE_ALIAS = 'recommendations'
+
+
+def get_cache():
+    return caches[CACHE_ALIAS]
+
+
+def wardrobe_version(user_id):
+    """
+    (version, updated_at) of a user's wardrobe. The row is created on first use, so
+    every cached response has a row that later changes will bump.
+    """
+    from wardrobe.models import WardrobeVersion
+    row = WardrobeVersion.objects.filter(user_id=user_id).values_list('version', 'updated_at').first()
+    if row is None:
+        version, _ = WardrobeVersion.objects.get_or_create(user_id=user_id)
+        row = (version.version, version.updated_at)
+    return row
+
+
+def bump_wardrobe_version(user_id, create=True):
+    """
+    Increment a user's wardrobe version. With create=False a missing row is left
+    alone: deletes (including the cascade from deleting the user) must not insert.
+    """
+    from wardrobe.models import WardrobeVersion
+    updated = WardrobeVersion.objects.filter(user_id=user_id).update(
+        version=F('version') + 1, updated_at=timezone.now(),
+    )
+    if updated or not create:
+        return
+    try:
+        with transaction.atomic():
+            WardrobeVersion.objects.create(user_id=user_id, version=1)
+    except IntegrityError:
+        # Created concurrently; bump that row instead.
+        WardrobeVersion.objects.filter(user_id=user_id).update(version=F('version') + 1, updated_at=timezone.now())
+
+
+def cache_key(user_id, version, endpoint, params):
+    digest = hashlib.md5(json.dumps(params, sort_keys=True, default=str).encode()).hexdigest()
+    return f"wardrobe:{user_id}:{version}:{endpoint}:{digest}"
+
+
+def cached_response(request, endpoint, params, compute):
+    """
+    Serve `compute()` from the cache. Only 200 responses are stored.
+    """
+    version, updated_at = wardrobe_version(request.user.id)
+    # The absolute media URLs in the body depend on the host the client used.
+    key = cache_key(request.user.id, version, endpoint, {**params, 'host': request.get_host()})
+    etag = hashlib.md5(key.encode()).hexdigest()
+
+    if request.method in ('GET', 'HEAD'):
+        not_modified = conditional_response(request, etag, updated_at)
+        if not_modified is not None:
+            return not_modified
+
+    cache = get_cache()
+    hit = cache.get(key)
+    if hit is not None:
+        response = Response(hit)
+    else:
+        response = compute()
+        if response.status_code != status.HTTP_200_OK:
+            return response
+        cache.set(key, response.data, getattr(settings, 'WARDROBE_RESPONSE_CACHE_TIMEOUT', 3600))
+    return set_validators(response, etag, updated_at)
+
+
+def cache_per_wardrobe(endpoint, params):
+    """
+    Decorator for viewset actions. `params(request, **kwargs)` returns the request
+    parameters the result depends on, or None to bypass the cache for this request.
+    Goes below @action.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(self, request, *args, **kwargs):
+            key_params = params(request, **kwargs)
+            if key_params is None:
+                return view(self, request, *args, **kwargs)
+            return cached_response(request, endpoint, key_params, lambda: view(self, request, *args, **kwargs))
+        return wrapper
+    return decorator
@@ -0,0 +1,268 @@
+import threading
+from collections import namedtuple
+from functools import lru_cache
+
+import numpy as np
+
+from wardrobe.utils.colors import COLOR_NAMES, hex_to_names
+from wardrobe.utils.color_harmony import analogous_groups, complementary_colors, get_color_relationship
+
+# 🎨 Color theory palette matching
+COLOR_PALETTE_MAP = {
+    'black': ['white', 'beige', 'gray', 'olive', 'camel', 'khaki', 'red', 'gold', 'silver', 'denim', 'lightblue'],
+    'white': ['black', 'denim', 'gray', 'navy', 'khaki', 'olive', 'pastel pink', 'camel', 'mint', 'lavender'],
+    'gray': ['black', 'white', 'navy', 'maroon', 'blush', 'camel', 'mint', 'peach'],
+    'blue': ['white', 'tan', 'gray', 'beige', 'camel', 'mustard', 'brown', 'khaki', 'orange'],
+    'lightblue': ['white', 'gray', 'navy', 'beige', 'khaki', 'tan', 'pink', 'lavender'],
+    'navy': ['white', 'gray', 'red', 'khaki', 'brown', 'camel', 'yellow', 'mint', 'burgundy'],
+    'red': ['black', 'white', 'denim', 'tan', 'gray', 'navy', 'pink', 'gold'],
+    'burgundy': ['white', 'gray', 'navy', 'camel', 'gold', 'olive', 'beige'],
+    'green': ['white', 'brown', 'beige', 'tan', 'black', 'peach', 'denim', 'khaki'],
+    'olive': ['white', 'black', 'khaki', 'beige', 'camel', 'yellow', 'orange', 'blush'],
+    'mint': ['white', 'gray', 'beige', 'navy', 'peach', 'camel', 'lightblue'],
+    'beige': ['white', 'black', 'green', 'navy', 'brown', 'lavender', 'orange'],
+    'brown': ['white', 'beige', 'green', 'blue', 'khaki', 'mustard', 'orange', 'camel'],
+    'tan': ['white', 'blue', 'olive', 'burgundy', 'black', 'peach', 'camel'],
+    'camel': ['white', 'black', 'gray', 'navy', 'maroon', 'olive', 'blush'],
+    'maroon': ['white', 'gray', 'tan', 'camel', 'gold', 'black'],
+    'yellow': ['navy', 'white', 'denim', 'gray', 'olive', 'khaki', 'camel'],
+    'mustard': ['navy', 'black', 'gray', 'brown', 'denim', 'beige'],
+    'pink': ['white', 'gray', 'lightblue', 'navy', 'denim', 'burgundy'],
+    'blush': ['white', 'beige', 'gray', 'olive', 'camel', 'mint'],
+    'peach': ['white', 'beige', 'mint', 'gray', 'tan', 'green'],
+    'purple': ['white', 'gray', 'navy', 'camel', 'mint', 'gold'],
+    'lavender': ['white', 'beige', 'gray', 'lightblue', 'denim', 'pink'],
+    'orange': ['white', 'black', 'navy', 'olive', 'brown', 'tan'],
+    'denim': ['white', 'black', 'gray', 'beige', 'red', 'mustard', 'pink'],
+    'khaki': ['black', 'white', 'olive', 'blue', 'camel', 'mint'],
+    'gold': ['black', 'white', 'navy', 'burgundy', 'purple', 'red'],
+    'silver': ['black', 'white', 'gray', 'navy', 'lightblue'],
+    'pastel pink': ['white', 'gray', 'mint', 'lavender', 'lightblue'],
+}
+
+def get_color_palette():
+    return COLOR_PALETTE_MAP
+
+def color_match_score(base_color, other_color):
+    if not base_color or not other_color:
+        return 0.5
+    base = base_color.lower().strip()
+    other = other_color.lower().strip()
+    palette = get_color_palette()
+    if base == other:
+        return 1.0
+    if base in palette and other in palette[base]:
+        return 0.9
+    if other in palette and base in palette[other]:
+        return 0.9
+    return 0.4
+
+
+def _compile_palette_map(palette_map, names):
+    """
+    Number every colour name (the map's and the dataset's, lower-cased) and build the
+    symmetric (v, v) boolean matrix of pairs color_match_score scores >= 0.9. Id 0
+    stands for a missing name and matches nothing.
+    """
+    vocab = list(dict.fromkeys(
+        [None] +
+        [name.lower().strip() for name in palette_map] +
+        [other.lower().strip() for others in palette_map.values() for other in others] +
+        [name.lower().strip() for name in names]
+    ))
+    ids = {name: i for i, name in enumerate(vocab)}
+    compatible = np.eye(len(vocab), dtype=bool)
+    compatible[0, 0] = False
+    for base, others in palette_map.items():
+        for other in others:
+            a, b = ids[base.lower().strip()], ids[other.lower().strip()]
+            compatible[a, b] = compatible[b, a] = True
+    return ids, compatible
+
+
+COLOR_NAME_IDS, COLOR_COMPATIBLE = _compile_palette_map(COLOR_PALETTE_MAP, COLOR_NAMES)
+NO_COLOR_NAME = 0
+_color_name_lock = threading.Lock()
+
+
+def color_name_id(name):
+    """
+    Id of a colour name in COLOR_COMPATIBLE. A name outside the vocabulary (not one the
+    dataset produces) is added with a new id that only matches itself.
+    """
+    global COLOR_COMPATIBLE
+    if not name:
+        return NO_COLOR_NAME
+    name = name.lower().strip()
+    name_id = COLOR_NAME_IDS.get(name)
+    if name_id is not None:
+        return name_id
+    with _color_name_lock:
+        if name not in COLOR_NAME_IDS:
+            size = len(COLOR_COMPATIBLE)
+            grown = np.zeros((size + 1, size + 1), dtype=bool)
+            grown[:size, :size] = COLOR_COMPATIBLE
+            grown[size, size] = True
+            COLOR_COMPATIBLE = grown
+            COLOR_NAME_IDS[name] = size
+        return COLOR_NAME_IDS[name]
+
+
+@lru_cache(maxsize=4096)
+def _palette_ids(names):
+    ids = np.array([color_name_id(name) for name in names], dtype=np.intp)
+    ids.setflags(write=False)
+    return ids
+
+
+def palette_ids(names):
+    """
+    A palette's colour names as a (read-only, cached) array of colour name ids.
+    """
+    return _palette_ids(tuple(names))
+
+
+def _compile_harmonies():
+    """
+    get_color_relationship over the few colour names it knows, as a small table of
+    HARMONY_LABELS indexes, plus a name id -> table row map (every other name maps
+    to the last row, which has no relationships).
+    """
+    names = list(dict.fromkeys(
+        list(complementary_colors) + list(complementary_colors.values()) +
+        [name for group in analogous_groups for name in group]
+    ))
+    ids = [color_name_id(name) for name in names]
+    rows = np.full(max(ids) + 1, len(names), dtype=np.intp)
+    rows[ids] = np.arange(len(names))
+    table = np.zeros((len(names) + 1, len(names) + 1), dtype=np.intp)
+    for i, a in enumerate(names):
+        for j, b in enumerate(names):
+            table[i, j] = HARMONY_LABELS.index(get_color_relationship(a, b))
+    return rows, table
+
+
+HARMONY_LABELS = (None, 'complementary', 'analogous')
+_HARMONY_ROWS, _HARMONY_TABLE = _compile_harmonies()
+
+
+def harmony_label_ids(base_id, other_ids):
+    """
+    get_color_relationship of one colour name id against many, as HARMONY_LABELS indexes.
+    """
+    other_ids = np.asarray(other_ids)
+    last = len(_HARMONY_ROWS) - 1
+    rows = np.where(other_ids <= last, _HARMONY_ROWS[np.minimum(other_ids, last)], _HARMONY_TABLE.shape[0] - 1)
+    base_row = _HARMONY_ROWS[base_id] if base_id <= last else _HARMONY_TABLE.shape[0] - 1
+    return _HARMONY_TABLE[base_row, rows]
+
+
+def color_match_scores(base_id, other_ids):
+    """
+    color_match_score of one colour name id against many: 1.0 for the same name, 0.9
+    for a compatible one, 0.4 otherwise and 0.5 when either name is missing.
+    """
+    other_ids = np.asarray(other_ids)
+    scores = np.where(COLOR_COMPATIBLE[base_id, other_ids], 0.9, 0.4)
+    scores[other_ids == base_id] = 1.0
+    scores[other_ids == NO_COLOR_NAME] = 0.5
+    if base_id == NO_COLOR_NAME:
+        scores[:] = 0.5
+    return scores
+
+
+def compatible_pairs(base_ids, other_ids):
+    """
+    (len(base_ids), len(other_ids)) boolean matrix of the name pairs that match.
+    """
+    return COLOR_COMPATIBLE[np.asarray(base_ids)[:, None], other_ids]
+
+
+def palette_names_of(item):
+    """
+    Colour names for an item's palette: the stored ones, or resolved now for rows
+    that predate palette_names.
+    """
+    names = getattr(item, 'palette_names', None)
+    if names is not None and len(names) == len(item.color_palette or []):
+        return names
+    return hex_to_names(item.color_palette or [])
+
+def color_match_score_palette(base_palette, compare_palette, base_names=None, compare_names=None):
+    if not base_palette or not compare_palette:
+        return 0.5
+    # Name each palette once instead of once per colour pair (or not at all when precomputed).
+    base_names = base_names if base_names is not None else hex_to_names(base_palette)
+    compare_names = compare_names if compare_names is not None else hex_to_names(compare_palette)
+    matches = np.count_nonzero(compatible_pairs(palette_ids(base_names), palette_ids(compare_names)))
+    # Adjusting score based on length of compare_palette to avoid disproportionate influence
+    return min(matches / len(compare_palette), 1.0)
+
+
+def color_match_scores_palette(base_palette, compare_palettes, base_names=None, compare_names=None):
+    """
+    color_match_score_palette of one palette against N others, as an (N,) array.
+    All candidate names are matched against the base in a single gather.
+    """
+    scores = np.full(len(compare_palettes), 0.5)
+    if not base_palette or not len(compare_palettes):
+        return scores
+    base_names = base_names if base_names is not None else hex_to_names(base_palette)
+    if compare_names is None:
+        compare_names = [hex_to_names(palette or []) for palette in compare_palettes]
+    lengths = np.array([len(palette or []) for palette in compare_palettes])
+    ids = [palette_ids(names) for names in compare_names]
+    flat = np.concatenate(ids)
+    owner = np.repeat(np.arange(len(ids)), [len(i) for i in ids])
+    hits = compatible_pairs(palette_ids(base_names), flat).sum(axis=0)
+    matches = np.bincount(owner, weights=hits, minlength=len(ids))
+    nonempty = lengths > 0
+    scores[nonempty] = np.minimum(matches[nonempty] / lengths[nonempty], 1.0)
+    return scores
+
+
+def style_match_score(style1, style2):
+    if not style1 or not style2:
+        return 0.5
+    return 1.0 if style1.lower() == style2.lower() else 0.0
+
+
+# Outfit scoring weights. The visual term is shared by the whole outfit; the rest
+# is scored per candidate against the base item.
+COLOR_WEIGHT = 0.25
+STYLE_WEIGHT = 0.15
+VISUAL_WEIGHT = 0.6
+HARMONY_BONUS = 0.1
+CLASH_PENALTY = 0.2
+BONUS_HARMONIES = ("complementary", "analogous", "triadic")
+
+PairScore = namedtuple('PairScore', ['color', 'style', 'harmony', 'total'])
+
+
+def harmony_bonus(harmony):
+    return HARMONY_BONUS if harmony in BONUS_HARMONIES else 0
+
+
+def pair_score(base_item, item):
+    """
+    Score the parts of an outfit that depend only on (base item, candidate).
+    `total` is the weighted sum without the outfit-level visual term.
+    """
+    color_score = color_match_score_palette(
+        base_item.color_palette, item.color_palette,
+        palette_names_of(base_item), palette_names_of(item),
+    )
+    style_score = style_match_score(base_item.style, item.style)
+    harmony = get_color_relationship(base_item.primary_color, item.primary_color)
+    return combine_pair_score(color_score, style_score, harmony)
+
+
+def combine_pair_score(color_score, style_score, harmony):
+    clash_penalty = CLASH_PENALTY if style_score == 0 and color_score < 0.5 else 0
+    total = (
+        COLOR_WEIGHT * color_score +
+        STYLE_WEIGHT * style_score +
+        harmony_bonus(harmony) -
+        clash_penalty
+    )
+    return PairScore(color_score, style_score, harmony, total)
@@ -0,0 +1,161 @@
+"""
+Free-text search over a user's wardrobe with CLIP.
+
+A query is embedded with the text tower and ranked by cosine against the user's
+cached image embedding matrix (wardrobe.utils.embedding_cache). Text embeddings
+are kept in a process-local LRU; the common fashion vocabulary is embedded ahead
+of time by `manage.py precompute_text_embeddings`, so those queries never need
+the model loaded at all.
+"""
+import logging
+import os
+import re
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from django.conf import settings
+
+from wardrobe.utils.embedding_cache import embedding_cache, normalize_rows
+from wardrobe.utils.scoring import COLOR_PALETTE_MAP
+
+logger = logging.getLogger(__name__)
+
+# CLIP matches images best against captions, not bare keywords.
+TEXT_PROMPT = "a photo of {}"
+# CLIP reads at most 77 tokens; anything much longer is not a search query.
+MAX_QUERY_LENGTH = 200
+# What encoding a query raises when the text model can't be used here: torch/open_clip
+# not installed, weights missing or not downloadable, or the model failing to load.
+MODEL_UNAVAILABLE = (ImportError, OSError, RuntimeError)
+
+GARMENTS = [
+    't-shirt', 'shirt', 'blouse', 'sweater', 'hoodie', 'cardigan', 'jacket', 'blazer', 'coat', 'dress', 'skirt',
+    'jeans', 'trousers', 'shorts', 'leggings', 'sneakers', 'boots', 'heels', 'sandals', 'loafers', 'top',
+    'bottom', 'shoes', 'outerwear',
+]
+DESCRIPTORS = [
+    'casual', 'formal', 'sporty', 'streetwear', 'business', 'summer', 'winter', 'striped', 'floral',
+    'plaid', 'denim', 'leather', 'linen', 'wool', 'oversized', 'vintage', 'minimalist', 'party',
+]
+
+
+def fashion_vocabulary():
+    """
+    Queries worth embedding ahead of time: single terms plus every colour + garment pair.
+    """
+    colours = list(COLOR_PALETTE_MAP)
+    terms = colours + GARMENTS + DESCRIPTORS
+    terms += [f"{colour} {garment}" for colour in colours for garment in GARMENTS]
+    terms += [f"{descriptor} {garment}" for descriptor in DESCRIPTORS for garment in GARMENTS]
+    return list(dict.fromkeys(normalize_query(term) for term in terms))
+
+
+def normalize_query(query):
+    return re.sub(r'\s+', ' ', (query or '').strip().lower())
+
+
+def vocabulary_path():
+    return getattr(
+        settings, 'WARDROBE_TEXT_VOCABULARY_PATH',
+        os.path.join(settings.MEDIA_ROOT, 'indexes', 'text_vocabulary.npz'),
+    )
+
+
+def encode_queries(queries):
+    """
+    Unit-length (n, d) float32 text embeddings for normalized queries.
+    """
+    from wardrobe.utils.embeddings import get_text_model
+    vectors = get_text_model().encode_texts([TEXT_PROMPT.format(query) for query in queries])
+    return normalize_rows(np.array(vectors, dtype=np.float32))
+
+
+class TextEmbeddingCache:
+    """
+    Text embeddings by normalized query: the precomputed vocabulary (loaded from disk
+    once, never evicted) plus a process-local LRU for everything else.
+    """
+
+    def __init__(self, max_queries=None):
+        self._max_queries = max_queries
+        self._entries = OrderedDict()
+        self._vocabulary = None
+        self._lock = threading.Lock()
+
+    @property
+    def max_queries(self):
+        if self._max_queries is not None:
+            return self._max_queries
+        return getattr(settings, 'WARDROBE_TEXT_EMBEDDING_CACHE_SIZE', 1024)
+
+    def get(self, query):
+        query = normalize_query(query)
+        vector = self.vocabulary().get(query)
+        if vector is not None:
+            return vector
+        with self._lock:
+            vector = self._entries.get(query)
+            if vector is not None:
+                self._entries.move_to_end(query)
+                return vector
+
+        vector = encode_queries([query])[0]
+
+        with self._lock:
+            self._entries[query] = vector
+            while len(self._entries) > self.max_queries:
+                self._entries.popitem(last=False)
+        return vector
+
+    def vocabulary(self):
+        if self._vocabulary is None:
+            with self._lock:
+                if self._vocabulary is None:
+                    self._vocabulary = self._load_vocabulary()
+        return self._vocabulary
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._vocabulary = None
+
+    def _load_vocabulary(self):
+        from wardrobe.utils.embeddings import DEFAULT_MODEL_NAME, DEFAULT_PRETRAINED
+        path = vocabulary_path()
+        try:
+            data = np.load(path)
+        except (OSError, ValueError):
+            return {}
+        model = (
+            getattr(settings, 'WARDROBE_EMBEDDING_MODEL', DEFAULT_MODEL_NAME),
+            getattr(settings, 'WARDROBE_EMBEDDING_PRETRAINED', DEFAULT_PRETRAINED),
+        )
+        if (str(data['model']), str(data['pretrained'])) != model:
+            logger.warning(f"Ignoring {path}: it was built for a different embedding model")
+            return {}
+        return dict(zip(data['queries'].tolist(), data['vectors']))
+
+
+def save_vocabulary(queries, vectors, model, pretrained, path=None):
+    path = path or vocabulary_path()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.tmp.npz"
+    np.savez(
+        tmp, queries=np.array(queries), vectors=np.asarray(vectors, dtype=np.float32),
+        model=np.array(model), pretrained=np.array(pretrained),
+    )
+    os.replace(tmp, path)
+
+
+def search_wardrobe(user_id, query, k=20, include_ids=None):
+    """
+    (item_id, cosine) pairs for the user's items best matching `query`, best first.
+    """
+    matrix = embedding_cache.get(user_id)
+    if not len(matrix):
+        return []
+    return matrix.top_k(text_cache.get(query), k=k, include_ids=include_ids)
+
+
+text_cache = TextEmbeddingCache()
@@ -0,0 +1,63 @@
+import json
+
+import numpy as np
+
+# Embeddings are stored as raw little-endian float32 bytes: 512 dims -> 2 KB per row.
+VECTOR_DTYPE = np.dtype('<f4')
+
+
+def encode_vector(values):
+    """
+    Pack an embedding (list, tuple or array of floats) into bytes for ClothingItem.feature_vector.
+    """
+    if values is None:
+        return None
+    return np.asarray(values, dtype=VECTOR_DTYPE).ravel().tobytes()
+
+
+def embedding_version():
+    """
+    Id of the vector space new embeddings are computed in: "<model>:<pretrained>".
+    ClothingItem.embedding_model records it per row; vectors from different
+    versions must never be compared.
+    """
+    from django.conf import settings
+    from wardrobe.utils.embeddings import DEFAULT_MODEL_NAME, DEFAULT_PRETRAINED
+    name = getattr(settings, 'WARDROBE_EMBEDDING_MODEL', DEFAULT_MODEL_NAME)
+    pretrained = getattr(settings, 'WARDROBE_EMBEDDING_PRETRAINED', DEFAULT_PRETRAINED)
+    return f"{name}:{pretrained}"
+
+
+def decode_vector(data):
+    """
+    The single decode path for ClothingItem.feature_vector.
+    Returns a float32 numpy array, or None when the value is empty or unreadable.
+    Legacy JSON / Python-list text is still accepted so old dumps and fixtures load.
+    """
+    if data is None:
+        return None
+    if isinstance(data, memoryview):
+        data = data.tobytes()
+    if isinstance(data, str):
+        return _decode_legacy_text(data)
+    if not data or len(data) % VECTOR_DTYPE.itemsize:
+        return None
+    return np.frombuffer(data, dtype=VECTOR_DTYPE)
+
+
+def _decode_legacy_text(text):
+    try:
+        values = json.loads(text)
+    except ValueError:
+        return None
+    if not isinstance(values, list) or not values:
+        return None
+    return np.asarray(values, dtype=np.float32)
+
+
+def cosine_similarity(a, b, eps=1e-8):
+    """
+    Cosine similarity of two 1-D vectors (same epsilon handling as torch's cosine_similarity).
+    """
+    denom = max(float(np.linalg.norm(a)) * float(np.linalg.norm(b)), eps)
+    return float(np.dot(a, b)) / denom
@@ -3,97 +3,48 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework import status
 from difflib import SequenceMatcher
-from itertools import product
-from PIL import Image
-import open_clip
-import torch
-import json
 from rest_framework.permissions import AllowAny, IsAuthenticated
-from wardrobe.utils.colors import hex_to_name_extended
-from wardrobe.utils.color_harmony import get_color_relationship
-from wardrobe.utils.process_clothing import extract_color_palette
+from wardrobe.utils import ingestion
+from wardrobe.utils.media import hash_file, perceptual_bands, perceptual_hash
+from wardrobe.utils.vectors import decode_vector, embedding_version
+from wardrobe.utils.embedding_cache import build_user_matrix, embedding_cache
+from wardrobe.utils.ann_index import catalog_index
+from wardrobe.utils.outfit_search import SEARCH_MODES, OutfitSearch
+from wardrobe.utils.http import conditional_response, set_validators
+from wardrobe.utils.response_cache import cache_per_wardrobe
+from wardrobe.utils.text_search import MAX_QUERY_LENGTH, MODEL_UNAVAILABLE, normalize_query, search_wardrobe
+from wardrobe.utils.outfits import compatibility_matrix_for, get_outfit_of_the_day, load_wardrobe, partition_by_type
 from .models import ClothingItem
-from .serializers import ClothingItemSerializer
+from .pagination import WardrobeCursorPagination
+from .serializers import CatalogItemSerializer, ClothingItemListSerializer, ClothingItemSerializer, OutfitItemSerializer
 from django.contrib.auth.models import User
 from django.contrib.auth import authenticate
 import jwt, datetime
 from django.conf import settings
 from django.http import JsonResponse # Keep this for test_api and clothing_list
-import random
-from django.db.models.functions import Lower
-
-# 🎨 Color theory palette matching
-COLOR_PALETTE_MAP = {
-    'black': ['white', 'beige', 'gray', 'olive', 'camel', 'khaki', 'red', 'gold', 'silver', 'denim', 'lightblue'],
-    'white': ['black', 'denim', 'gray', 'navy', 'khaki', 'olive', 'pastel pink', 'camel', 'mint', 'lavender'],
-    'gray': ['black', 'white', 'navy', 'maroon', 'blush', 'camel', 'mint', 'peach'],
-    'blue': ['white', 'tan', 'gray', 'beige', 'camel', 'mustard', 'brown', 'khaki', 'orange'],
-    'lightblue': ['white', 'gray', 'navy', 'beige', 'khaki', 'tan', 'pink', 'lavender'],
-    'navy': ['white', 'gray', 'red', 'khaki', 'brown', 'camel', 'yellow', 'mint', 'burgundy'],
-    'red': ['black', 'white', 'denim', 'tan', 'gray', 'navy', 'pink', 'gold'],
-    'burgundy': ['white', 'gray', 'navy', 'camel', 'gold', 'olive', 'beige'],
-    'green': ['white', 'brown', 'beige', 'tan', 'black', 'peach', 'denim', 'khaki'],
-    'olive': ['white', 'black', 'khaki', 'beige', 'camel', 'yellow', 'orange', 'blush'],
-    'mint': ['white', 'gray', 'beige', 'navy', 'peach', 'camel', 'lightblue'],
-    'beige': ['white', 'black', 'green', 'navy', 'brown', 'lavender', 'orange'],
-    'brown': ['white', 'beige', 'green', 'blue', 'khaki', 'mustard', 'orange', 'camel'],
-    'tan': ['white', 'blue', 'olive', 'burgundy', 'black', 'peach', 'camel'],
-    'camel': ['white', 'black', 'gray', 'navy', 'maroon', 'olive', 'blush'],
-    'maroon': ['white', 'gray', 'tan', 'camel', 'gold', 'black'],
-    'yellow': ['navy', 'white', 'denim', 'gray', 'olive', 'khaki', 'camel'],
-    'mustard': ['navy', 'black', 'gray', 'brown', 'denim', 'beige'],
-    'pink': ['white', 'gray', 'lightblue', 'navy', 'denim', 'burgundy'],
-    'blush': ['white', 'beige', 'gray', 'olive', 'camel', 'mint'],
-    'peach': ['white', 'beige', 'mint', 'gray', 'tan', 'green'],
-    'purple': ['white', 'gray', 'navy', 'camel', 'mint', 'gold'],
-    'lavender': ['white', 'beige', 'gray', 'lightblue', 'denim', 'pink'],
-    'orange': ['white', 'black', 'navy', 'olive', 'brown', 'tan'],
-    'denim': ['white', 'black', 'gray', 'beige', 'red', 'mustard', 'pink'],
-    'khaki': ['black', 'white', 'olive', 'blue', 'camel', 'mint'],
-    'gold': ['black', 'white', 'navy', 'burgundy', 'purple', 'red'],
-    'silver': ['black', 'white', 'gray', 'navy', 'lightblue'],
-    'pastel pink': ['white', 'gray', 'mint', 'lavender', 'lightblue'],
-}
-
-def get_color_palette():
-    return COLOR_PALETTE_MAP
-
-def color_match_score(base_color, other_color):
-    if not base_color or not other_color:
-        return 0.5
-    base = base_color.lower().strip()
-    other = other_color.lower().strip()
-    palette = get_color_palette()
-    if base == other:
-        return 1.0
-    if base in palette and other in palette[base]:
-        return 0.9
-    if other in palette and base in palette[other]:
-        return 0.9
-    return 0.4
-
-def color_match_score_palette(base_palette, compare_palette):
-    if not base_palette or not compare_palette:
-        return 0.5
-    matches = 0
-    for color1 in base_palette:
-        for color2 in compare_palette:
-            name1 = hex_to_name_extended(color1)
-            name2 = hex_to_name_extended(color2)
-            if color_match_score(name1, name2) >= 0.9:
-                matches += 1
-    # Adjusting score based on length of compare_palette to avoid disproportionate influence
-    return min(matches / len(compare_palette) if compare_palette else 0, 1.0)
-
-
-def style_match_score(style1, style2):
-    if not style1 or not style2:
-        return 0.5
-    return 1.0 if style1.lower() == style2.lower() else 0.0
+
+def similar_cache_params(request, pk):
+    # Catalog-scope results depend on other users' items, so they aren't cached per wardrobe.
+    if request.query_params.get('scope') == 'catalog':
+        return None
+    return {'pk': pk, 'fields': request.query_params.get('fields')}
+
+
+def search_cache_params(request):
+    params = request.query_params
+    return {
+        'q': normalize_query(params.get('q')),
+        'clothing_type': (params.get('clothing_type') or '').lower(),
+        'style': (params.get('style') or '').lower(),
+        'limit': params.get('limit'),
+        'fields': params.get('fields'),
+    }
+
 
 class ClothingItemViewSet(viewsets.ModelViewSet):
     queryset = ClothingItem.objects.all()
     serializer_class = ClothingItemSerializer
+    pagination_class = WardrobeCursorPagination
     permission_classes = [IsAuthenticated] # Changed to IsAuthenticated
 
     def get_queryset(self):
@@ -101,49 +52,47 @@ class ClothingItemViewSet(viewsets.ModelViewSet):
         This view should return a list of all the clothing items
         for the currently authenticated user.
         """
-        queryset = ClothingItem.objects.filter(user=self.request.user)
+        # select_related: the serializers read user.username for every item.
+        queryset = ClothingItem.objects.filter(user=self.request.user).select_related('user')
         color = self.request.query_params.get('primary_color')
         if color:
-            queryset = queryset.filter(primary_color__iexact=color)
+            queryset = queryset.with_primary_color(color)
+        if self.action == 'list' and self.get_serializer_class() is ClothingItemListSerializer:
+            # Listings never read the embedding, so don't fetch it either.
+            queryset = queryset.defer('feature_vector', 'embedding_code', 'perceptual_bands', 'palette_lab')
         return queryset
 
+    def get_serializer_class(self):
+        if self.action in ('list', 'similar', 'search') and 'feature_vector' not in self.requested_fields():
+            return ClothingItemListSerializer
+        return ClothingItemSerializer
+
+    def requested_fields(self):
+        requested = self.request.query_params.get('fields', '')
+        return {name.strip() for name in requested.split(',') if name.strip()}
+
     def perform_create(self, serializer):
         """
         Save the clothing item with the current authenticated user.
         """
-        instance = serializer.save(user=self.request.user) # Assign the current user
-
-        try:
-            model, _, preprocess = open_clip.create_model_and_transforms('ViT-B-32', pretrained='laion2b_s34b_b79k')
-            image = Image.open(instance.image.path).convert("RGB")
-            image_input = preprocess(image).unsqueeze(0)
-            with torch.no_grad():
-                image_features = model.encode_image(image_input)
-            instance.feature_vector = json.dumps(image_features.tolist()[0])
-        except Exception as e:
-            print(f"⚠️ Feature extraction failed: {e}")
-            instance.feature_vector = None
-
+        image = serializer.validated_data['image']
         try:
-            if instance.image:
-                palette = extract_color_palette(instance.image.path, num_colors=5)
-                if palette:
-                    instance.primary_color = hex_to_name_extended(palette[0])
-                    instance.color_palette = palette
-                else:
-                    instance.primary_color = "unknown"
-                    instance.color_palette = []
-            else:
-                instance.primary_color = "unknown"
-                instance.color_palette = []
+            phash = perceptual_hash(image)
         except Exception as e:
-            print(f"⚠️ Color extraction failed: {e}")
-            instance.primary_color = "unknown"
-            instance.color_palette = []
-
-        instance.save() # Save again after updating feature_vector and color info
+            logger.warning(f"Perceptual hash failed for upload {image.name}: {e}")
+            phash = None
+        # Embedding and palette are filled in by ingestion; clients poll `status`.
+        instance = serializer.save(
+            user=self.request.user, # Assign the current user
+            content_hash=hash_file(image),
+            perceptual_hash=phash,
+            perceptual_bands=perceptual_bands(phash) if phash is not None else None,
+            status=ClothingItem.STATUS_PROCESSING,
+        )
+        ingestion.submit(instance)
 
     @action(detail=True, methods=['get'])
+    @cache_per_wardrobe('palette', lambda request, pk=None: {'pk': pk})
     def palette(self, request, pk=None):
         item = self.get_object() # get_object will already filter by user
         return Response({
@@ -153,51 +102,126 @@ class ClothingItemViewSet(viewsets.ModelViewSet):
         })
 
     @action(detail=True, methods=['get'])
+    @cache_per_wardrobe('similar', lambda request, pk=None: similar_cache_params(request, pk))
     def similar(self, request, pk=None):
         item = self.get_object() # get_object will already filter by user
         if not item.feature_vector:
             return Response({"error": "No feature vector found for this item."}, status=400)
-        try:
-            target_vector = torch.tensor(json.loads(item.feature_vector), dtype=torch.float32)
-        except Exception as e:
-            return Response({"error": f"Invalid feature vector: {str(e)}"}, status=400)
-
-        similarities = []
-        # Exclude current item and filter by current user's items
-        for other in ClothingItem.objects.filter(user=request.user).exclude(id=item.id).exclude(feature_vector=None):
+        target_vector = decode_vector(item.feature_vector)
+        if target_vector is None:
+            return Response({"error": "Invalid feature vector."}, status=400)
+
+        if item.embedding_model != embedding_version():
+            # Not re-embedded yet: compare only with the user's items from the same model.
+            if request.query_params.get('scope') == 'catalog':
+                return Response({"error": "This item is being re-processed; try again later."}, status=409)
+            matrix = build_user_matrix(request.user.id, item.embedding_model)
+            similarities = matrix.top_k(target_vector, k=4, exclude_ids=[item.id], min_score=0.65, max_score=1.0)
+        elif request.query_params.get('scope') == 'catalog':
+            # Store-wide search through the nearest-neighbour index, optionally narrowed by type/style.
             try:
-                other_vec = torch.tensor(json.loads(other.feature_vector), dtype=torch.float32)
-                sim = torch.nn.functional.cosine_similarity(target_vector, other_vec, dim=0)
-                sim_value = sim.item()
-                if 0.65 < sim_value < 1.0: # Only consider reasonably similar items
-                    similarities.append((other, sim_value))
-            except Exception:
-                continue
+                limit = min(max(int(request.query_params.get('limit', 4)), 1), 50)
+            except ValueError:
+                return Response({"error": "limit must be an integer."}, status=400)
+            results = catalog_index.search(
+                target_vector,
+                k=limit,
+                clothing_type=request.query_params.get('clothing_type'),
+                style=request.query_params.get('style'),
+                exclude_ids=[item.id],
+            )
+            if results is None:
+                return Response({"error": "Catalog search is not available yet."}, status=503)
+            items_by_id = ClothingItem.objects.defer('feature_vector', 'embedding_code', 'perceptual_bands', 'palette_lab').in_bulk(
+                [item_id for item_id, score in results if 0.65 < score < 1.0]
+            )
+            # Results span every user's wardrobe: serialize them without owner data.
+            return Response([
+                {
+                    **CatalogItemSerializer(items_by_id[item_id], context=self.get_serializer_context()).data,
+                    "similarity_score": round(score, 4)
+                } for item_id, score in results if item_id in items_by_id
+            ])
+        else:
+            # One cached (n, d) matrix per user; similarity is a single mat-vec + top-k.
+            matrix = embedding_cache.get(request.user.id)
+            query = matrix.vector_of(item.id)
+            if query is None:
+                query = target_vector
+            # Only consider reasonably similar items
+            similarities = matrix.top_k(query, k=4, exclude_ids=[item.id], min_score=0.65, max_score=1.0)
+
+        items_by_id = self.get_queryset().in_bulk([item_id for item_id, _ in similarities])
+        return Response([
+            {
+                **self.get_serializer(items_by_id[item_id]).data,
+                "similarity_score": round(score, 4)
+            } for item_id, score in similarities if item_id in items_by_id
+        ])
+
+    @action(detail=False, methods=['get'])
+    @cache_per_wardrobe('search', search_cache_params)
+    def search(self, request):
+        """
+        Rank the user's items against a free-text query (?q=) with CLIP, optionally
+        narrowed by ?clothing_type= and ?style=.
+        """
+        query = normalize_query(request.query_params.get('q'))
+        if not query:
+            return Response({"error": "q is required."}, status=400)
+        if len(query) > MAX_QUERY_LENGTH:
+            return Response({"error": f"q must be at most {MAX_QUERY_LENGTH} characters."}, status=400)
+        try:
+            limit = min(max(int(request.query_params.get('limit', 20)), 1), 50)
+        except ValueError:
+            return Response({"error": "limit must be an integer."}, status=400)
+
+        include_ids = None
+        clothing_type = request.query_params.get('clothing_type')
+        style = request.query_params.get('style')
+        if clothing_type or style:
+            candidates = ClothingItem.objects.filter(user=request.user)
+            if clothing_type:
+                candidates = candidates.of_type(clothing_type)
+            if style:
+                candidates = candidates.with_style(style)
+            include_ids = list(candidates.values_list('id', flat=True))
 
-        similarities.sort(key=lambda x: x[1], reverse=True)
+        try:
+            results = search_wardrobe(request.user.id, query, k=limit, include_ids=include_ids)
+        except MODEL_UNAVAILABLE as e:
+            logger.error(f"Text model unavailable for user {request.user.id}: {e}", exc_info=True)
+            return Response({"error": "Search is temporarily unavailable."}, status=503)
 
+        items_by_id = self.get_queryset().in_bulk([item_id for item_id, _ in results])
         return Response([
             {
-                **self.get_serializer(obj).data,
-                "similarity_score": round(score, 4)
-            } for obj, score in similarities[:4]
+                **self.get_serializer(items_by_id[item_id]).data,
+                "score": round(score, 4)
+            } for item_id, score in results if item_id in items_by_id
         ])
 
     @action(detail=False, methods=['post'])
+    @cache_per_wardrobe('generate_outfit', lambda request: {
+        'base_item_id': request.data.get("base_item_id"),
+        'occasion': request.data.get("occasion"),
+        'search_mode': request.data.get("search_mode"),
+        'fields': request.query_params.get('fields'),
+    })
     def generate_outfit(self, request):
         base_id = request.data.get("base_item_id")
         occasion = request.data.get("occasion")
 
+        # One query for the whole wardrobe; everything below partitions it in memory.
+        items = load_wardrobe(request.user.id)
         try:
             # Ensure base_item belongs to the current user
-            base_item = ClothingItem.objects.get(id=base_id, user=request.user)
-        except ClothingItem.DoesNotExist:
+            base_item = next(item for item in items if item.id == int(base_id))
+        except (StopIteration, TypeError, ValueError):
             return Response({"error": "Base item not found or does not belong to the current user."}, status=404)
 
         # Filter wardrobe to only include items of the current user, excluding the base item
-        wardrobe = ClothingItem.objects.filter(user=request.user).exclude(id=base_item.id)
-        if occasion:
-            wardrobe = wardrobe.filter(style=occasion)
+        wardrobe = [item for item in items if item.id != base_item.id and (not occasion or item.style == occasion)]
 
         match_map = {
             "top": ["bottom", "shoes", ],
@@ -209,94 +233,63 @@ class ClothingItemViewSet(viewsets.ModelViewSet):
 
         to_match = match_map.get(base_item.clothing_type.lower(), [])
         # Only consider categories that have at least one item for the current user
-        categories = {t: list(wardrobe.filter(clothing_type__iexact=t)) for t in to_match if wardrobe.filter(clothing_type__iexact=t).exists()}
+        by_type = partition_by_type(wardrobe)
+        categories = {t: by_type[t] for t in to_match if by_type.get(t)}
 
 
         # If no categories have items to match, return an error
         if not any(categories.values()):
             return Response({"error": "Not enough matching clothing items in your wardrobe to form an outfit for the selected base item and occasion."}, status=400)
 
-        all_combinations = product(*categories.values())
-        outfits = []
+        # 'exact' returns the true top 10 via branch and bound; 'fast' uses beam search.
+        search_mode = request.data.get("search_mode", "exact")
+        if search_mode not in SEARCH_MODES:
+            return Response({"error": f"search_mode must be one of: {', '.join(SEARCH_MODES)}."}, status=400)
+
+        categories = {t: items for t, items in categories.items() if items}
+        matrix = compatibility_matrix_for(request.user.id, [base_item] + [i for items in categories.values() for i in items])
+        search = OutfitSearch(base_item, categories, pair_scorer=matrix.pair_score, vector_of=matrix.unit_vector)
+        top_outfits = search.top_k(10, mode=search_mode)
 
-        for combo in all_combinations:
-            outfit_data = {"base": ClothingItemSerializer(base_item).data}
+        # Each item is serialized once; outfits refer to items by id.
+        outfit_items = {base_item.id: base_item}
+        outfits = []
+        for result in top_outfits:
+            outfit_data = {"base": base_item.id}
             explanation_parts = []
             tags = []
-            vectors = []
-            full_items = [base_item] + list(combo)
-
-            for item in full_items:
-                if item.feature_vector:
-                    try:
-                        vectors.append(torch.tensor(json.loads(item.feature_vector), dtype=torch.float32))
-                    except:
-                        # Skip items with invalid feature vectors
-                        continue
-
-            visual_score = 0.5 # Default if no visual scores can be calculated
-            if len(vectors) > 1:
-                visual_scores = []
-                for i in range(len(vectors)):
-                    for j in range(i+1, len(vectors)):
-                        try:
-                            sim = torch.nn.functional.cosine_similarity(vectors[i], vectors[j], dim=0).item()
-                            visual_scores.append(sim)
-                        except Exception as e:
-                            print(f"Error calculating visual similarity: {e}")
-                            continue # Skip this pair if an error occurs
-
-                if visual_scores:
-                    visual_score = sum(visual_scores) / len(visual_scores)
-                else:
-                    visual_score = 0.5 # Fallback if calculation failed for all pairs
-
-            total_score = 0
-            for item in combo:
-                clothing_type = item.clothing_type.lower()
-                outfit_data[clothing_type] = ClothingItemSerializer(item).data
-
-                color_score = color_match_score_palette(base_item.color_palette, item.color_palette)
-                style_score = style_match_score(base_item.style, item.style)
-                harmony = get_color_relationship(base_item.primary_color, item.primary_color)
-                harmony_bonus = 0.1 if harmony in ["complementary", "analogous", "triadic"] else 0
-                clash_penalty = 0.2 if style_score == 0 and color_score < 0.5 else 0
-
-                weighted_score = (
-                    0.25 * color_score +
-                    0.15 * style_score +
-                    0.6 * visual_score + # Visual score is now calculated once for the whole outfit
-                    harmony_bonus -
-                    clash_penalty
-                )
+            visual_score = result.visual
 
-                total_score += weighted_score
+            for item, pair in zip(result.items, result.pair_scores):
+                clothing_type = item.clothing_type.lower()
+                outfit_data[clothing_type] = item.id
+                outfit_items[item.id] = item
 
-                if color_score >= 0.9:
+                if pair.color >= 0.9:
                     tags.append("Color Harmony")
-                if style_score == 1.0:
+                if pair.style == 1.0:
                     tags.append("Style Aligned")
-                if harmony and harmony != 'no relationship': # Only add if a specific relationship exists
-                    tags.append(f"{harmony.capitalize()} Colors")
+                if pair.harmony and pair.harmony != 'no relationship': # Only add if a specific relationship exists
+                    tags.append(f"{pair.harmony.capitalize()} Colors")
                 if visual_score > 0.85:
                     tags.append("Visually Cohesive")
 
                 explanation_parts.append(
-                    f"{clothing_type}: color_match={round(color_score,2)}, style_match={round(style_score,2)}, harmony={harmony or 'none'}"
+                    f"{clothing_type}: color_match={round(pair.color,2)}, style_match={round(pair.style,2)}, harmony={pair.harmony or 'none'}"
                 )
 
-            # Average total_score across the number of items matched in the combo
-            # This helps normalize scores for outfits with different numbers of items
-            final_total_score = total_score / len(combo) if combo else 0
-
-            outfit_data["score"] = round(final_total_score, 2)
+            outfit_data["score"] = round(result.score, 2)
             outfit_data["visual_similarity"] = round(visual_score, 2)
             outfit_data["explanation"] = "; ".join(explanation_parts)
             outfit_data["tags"] = list(set(tags))
             outfits.append(outfit_data)
 
-        outfits.sort(key=lambda x: x["score"], reverse=True)
-        return Response(outfits[:10])
+        items = OutfitItemSerializer(list(outfit_items.values()), many=True, context=self.get_serializer_context()).data
+        return Response({
+            # Keyed by the model ids: ?fields= may leave `id` out of the serialized items.
+            "items": {str(item_id): item for item_id, item in zip(outfit_items, items)},
+            "outfits": outfits,
+        })
     # Add this new action to your ClothingItemViewSet, for example, after generate_outfit
 
     # In your ClothingItemViewSet class in views.py
@@ -305,93 +298,20 @@ class ClothingItemViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'], url_path='outfit-of-the-day')
     def outfit_of_the_day(self, request):
         """
-        Generates a single, high-quality "Outfit of the Day" suggestion
-        by finding the best-matching items.
+        The user's "Outfit of the Day": the same outfit all day, until the wardrobe
+        changes. Supports If-None-Match / If-Modified-Since.
         """
         try:
-            user_wardrobe = ClothingItem.objects.filter(user=request.user)
-            if not user_wardrobe.exists():
-                return Response({"error": "Your wardrobe is empty. Add items to get a suggestion!"}, status=404)
-
-            # BUG FIX: Use lowercase 'top' and 'bottom' to match the database query logic.
-            base_types = ['top', 'bottom']
-            potential_bases = user_wardrobe.annotate(
-                clothing_type_lower=Lower('clothing_type')
-            ).filter(clothing_type_lower__in=base_types)
-
-            if not potential_bases.exists():
-                 # If no tops/bottoms, fall back to any item as a base.
-                 potential_bases = user_wardrobe
-
-            # PERFORMANCE: More memory-efficient way to get one random item than loading the whole list.
-            base_item = potential_bases.order_by('?').first()
-
-            if not base_item:
-                 # This can happen if the wardrobe is empty, handle it just in case.
-                 return Response({"error": "Could not select a base item from your wardrobe."}, status=404)
-
-            # Call the now-smarter helper function to build the outfit.
-            outfit = self.generate_single_outfit(base_item, user_wardrobe)
-
-            if not outfit:
-                return Response({
-                    "error": "We couldn't create a full outfit. Try adding more item types (tops, bottoms, shoes) to your wardrobe!",
-                    "base_item_used": self.get_serializer(base_item).data
-                }, status=400)
-
-            return Response(outfit)
-
+            # Precomputed by `manage.py precompute_daily_outfits`; computed and stored on a miss.
+            daily = get_outfit_of_the_day(request.user.id)
         except Exception as e:
             logger.error(f"Critical error in outfit_of_the_day for user {request.user.id}: {e}", exc_info=True)
             return Response({"error": "A server error occurred while preparing your outfit."}, status=500)
 
-    def generate_single_outfit(self, base_item, user_wardrobe):
-        """
-        Helper function to build the BEST possible outfit around a single base item
-        by scoring all potential matches for color and style.
-        """
-        # Step 1: Identify the components we need to find.
-        needed = {'top', 'bottom', 'shoes'}
-        outfit = {base_item.clothing_type.lower(): base_item}
-        needed.discard(base_item.clothing_type.lower())
-
-        # Step 2: Find the highest-scoring match for each needed component.
-        for item_type in needed:
-            candidates = user_wardrobe.filter(clothing_type__iexact=item_type).exclude(id=base_item.id)
-            if not candidates:
-                continue # Skip if there are no items of this type.
-
-            best_match = None
-            highest_score = -1
-
-            # GREATNESS UPGRADE: Instead of random choice, we now score every candidate.
-            for candidate in candidates:
-                # Calculate scores based on the helper functions you already have.
-                color_score = color_match_score(base_item.primary_color, candidate.primary_color)
-                style_score = style_match_score(base_item.style, candidate.style)
-                
-                # Create a weighted total score. Here, color is slightly more important.
-                total_score = (0.6 * color_score) + (0.4 * style_score)
-
-                if total_score > highest_score:
-                    highest_score = total_score
-                    best_match = candidate
-            
-            # Add the best-scoring item to our outfit.
-            if best_match:
-                outfit[item_type] = best_match
-
-        # Step 3: Check if we have a complete outfit and serialize the data.
-        if 'top' in outfit and 'bottom' in outfit and 'shoes' in outfit:
-            return {
-                'top': self.get_serializer(outfit.get('top')).data,
-                'bottom': self.get_serializer(outfit.get('bottom')).data,
-                'shoes': self.get_serializer(outfit.get('shoes')).data,
-                'explanation': f"A stylish look featuring your {base_item.name}, selected for its excellent color and style harmony.",
-                'tags': [base_item.style, 'Outfit of the Day', 'Smart Match']
-            }
-        
-        return None # Return None if a complete outfit could not be formed.
+        not_modified = conditional_response(request, daily.etag, daily.updated_at)
+        if not_modified is not None:
+            return not_modified
+        return set_validators(Response(daily.payload, status=daily.status_code), daily.etag, daily.updated_at)
 # Existing test and authentication views (no changes needed for multi-user here)
 def test_api(request):
     return JsonResponse({'message': 'Hello from Django!'})
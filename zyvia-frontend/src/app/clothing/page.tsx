@@ -1,11 +1,13 @@
 'use client'
 
 import React, { useEffect, useState } from 'react'
+import { ImageVariants, variantUrl } from '@/lib/images'
 
 type ClothingItem = {
   id: number
   name: string
   image: string
+  image_variants?: ImageVariants
   clothing_type?: string
   style?: string
 }
@@ -21,9 +23,11 @@ const ClothingList = () => {
         const response = await fetch('http://localhost:8000/api/clothing/')
         const data = await response.json()
 
-        // Handle wrapped object or array
+        // Handle a paginated page, wrapped object or array
         const clothingArray = Array.isArray(data)
           ? data
+          : Array.isArray(data.results)
+          ? data.results
           : Array.isArray(data.clothing)
           ? data.clothing
           : []
@@ -58,7 +62,7 @@ const ClothingList = () => {
               className="bg-white border shadow rounded overflow-hidden"
             >
               <img
-                src={item.image}
+                src={variantUrl(item, 'medium')}
                 alt={item.name}
                 className="w-full h-64 object-cover"
               />
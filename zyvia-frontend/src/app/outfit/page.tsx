@@ -1,11 +1,14 @@
 'use client';
 
 import React, { useState, useCallback } from 'react';
+import { ImageVariants, variantUrl } from '@/lib/images';
+import { OutfitResponse, resolveOutfits } from '@/lib/outfits';
 
 interface ClothingItem {
   id: number;
   name: string;
   image: string;
+  image_variants?: ImageVariants;
   clothing_type: string;
   style: string;
   color_palette: string[];
@@ -57,8 +60,8 @@ export default function OutfitPage() {
           }
         );
         if (!response.ok) throw new Error('Failed to fetch outfit');
-        const data: Outfit[] = await response.json();
-        setOutfits(data);
+        const data: OutfitResponse<ClothingItem> = await response.json();
+        setOutfits(resolveOutfits<ClothingItem, Outfit>(data));
       } catch (err) {
         console.error(err);
         setError('Something went wrong. Please try again.');
@@ -71,7 +74,7 @@ export default function OutfitPage() {
 
   const renderItem = (item?: ClothingItem) => {
     if (!item) return null;
-    const src = getFullImageUrl(item.image);
+    const src = getFullImageUrl(variantUrl(item, 'medium'));
     return (
       <div key={item.id} className="text-center">
         <img
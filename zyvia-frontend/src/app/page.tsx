@@ -18,12 +18,16 @@ import {
   Heart,
 } from 'lucide-react'
 import * as auth from '@/lib/auth'
+import { ImageVariants, variantUrl } from '@/lib/images'
+import { OutfitResponse, resolveOutfits } from '@/lib/outfits'
+import { fetchAllPages } from '@/lib/pagination'
 
 // --- Interfaces ---
 interface ClothingItem {
   id: number;
   name: string;
   image: string;
+  image_variants?: ImageVariants;
   clothing_type: string;
   style: string;
   color_palette?: string[];
@@ -103,7 +107,7 @@ function WardrobeGrid({
                   : '0 4px 10px rgba(0, 0, 0, 0.1)'
               }}
             >
-              <img src={item.image} alt={item.name} className="w-full h-full object-cover transition-transform duration-300 group-hover:scale-110" />
+              <img src={variantUrl(item)} alt={item.name} className="w-full h-full object-cover transition-transform duration-300 group-hover:scale-110" />
               <div className="absolute bottom-0 left-0 right-0 p-3 bg-gradient-to-t from-black/70 to-transparent">
                 <p className="text-white text-sm font-bold truncate">{item.name}</p>
               </div>
@@ -136,7 +140,7 @@ function OutfitGenerator({
     if (!item) return null;
     return (
       <div key={item.id} className="text-center">
-        <img src={getFullImageUrl(item.image)} alt={item.name} className="w-full h-32 object-contain rounded-lg bg-zinc-100 dark:bg-zinc-800"/>
+        <img src={getFullImageUrl(variantUrl(item, 'medium'))} alt={item.name} className="w-full h-32 object-contain rounded-lg bg-zinc-100 dark:bg-zinc-800"/>
         <div className="mt-2 text-sm font-semibold truncate text-zinc-700 dark:text-zinc-300">{item.name}</div>
         <div className="text-xs text-zinc-500 capitalize">{item.clothing_type}</div>
       </div>
@@ -159,7 +163,7 @@ function OutfitGenerator({
         <div>
           <label className="block text-sm font-semibold mb-2 text-zinc-700 dark:text-zinc-300">Base Item</label>
           <div className="flex items-center gap-4 p-2 border border-zinc-200 dark:border-zinc-700 rounded-xl bg-zinc-50 dark:bg-zinc-800">
-             <img src={getFullImageUrl(baseItem.image)} alt={baseItem.name} className="w-16 h-16 rounded-lg object-cover"/>
+             <img src={getFullImageUrl(variantUrl(baseItem))} alt={baseItem.name} className="w-16 h-16 rounded-lg object-cover"/>
              <div className="flex-grow">
                <p className="font-bold text-zinc-800 dark:text-zinc-200">{baseItem.name}</p>
                <p className="text-xs text-zinc-500 capitalize">{baseItem.style} {baseItem.clothing_type}</p>
@@ -239,7 +243,7 @@ function RecommendedOutfitDisplay({ outfit, isLoading, error }: {
     return (
       <div className="text-center">
         <div className="relative aspect-square bg-zinc-100 dark:bg-zinc-800 rounded-xl overflow-hidden shadow-sm group">
-            <img src={getFullImageUrl(item.image)} alt={item.name} className="w-full h-full object-cover transition-transform duration-300 group-hover:scale-110"/>
+            <img src={getFullImageUrl(variantUrl(item, 'medium'))} alt={item.name} className="w-full h-full object-cover transition-transform duration-300 group-hover:scale-110"/>
         </div>
         <div className="mt-2 text-sm font-semibold truncate text-zinc-800 dark:text-zinc-200">{item.name}</div>
         <div className="text-xs text-zinc-500 capitalize">{label || item.clothing_type}</div>
@@ -341,11 +345,9 @@ export default function ZyviaProUI() {
     setIsWardrobeLoading(true);
     setWardrobeError(null);
     try {
-      const res = await fetch('http://127.0.0.1:8000/api/clothing/', {
+      const data = await fetchAllPages<ClothingItem>('http://127.0.0.1:8000/api/clothing/', {
         headers: { 'Authorization': `Bearer ${currentUser.accessToken}` },
       });
-      if (!res.ok) throw new Error('Failed to fetch wardrobe items.');
-      const data: ClothingItem[] = await res.json();
       setWardrobeItems(data);
     } catch (err) {
       setWardrobeError(err instanceof Error ? err.message : 'An unknown error occurred.');
@@ -410,8 +412,8 @@ export default function ZyviaProUI() {
         const errorData = await response.json();
         throw new Error(errorData.detail || 'Failed to generate outfits.');
       }
-      const data: Outfit[] = await response.json();
-      setGeneratedOutfits(data);
+      const data: OutfitResponse<ClothingItem> = await response.json();
+      setGeneratedOutfits(resolveOutfits<ClothingItem, Outfit>(data));
     } catch (err) {
       setGenerationError(err instanceof Error ? err.message : 'An unknown error occurred.');
     } finally {
@@ -1,5 +1,6 @@
 import { useState, useEffect, useCallback } from 'react';
 import * as auth from '@/lib/auth';
+import { fetchAllPages } from '@/lib/pagination';
 
 // Custom hook to manage the user's wardrobe
 export function useWardrobe(isTabActive, username) {
@@ -14,11 +15,9 @@ export function useWardrobe(isTabActive, username) {
     setIsLoading(true);
     setError(null);
     try {
-      const res = await fetch('http://127.0.0.1:8000/api/clothing/', {
+      const data = await fetchAllPages('http://127.0.0.1:8000/api/clothing/', {
         headers: { 'Authorization': `Bearer ${currentUser.accessToken}` },
       });
-      if (!res.ok) throw new Error('Failed to fetch wardrobe items.');
-      const data = await res.json();
       setItems(data);
     } catch (err) {
       setError(err instanceof Error ? err.message : 'An unknown error occurred.');
@@ -0,0 +1,17 @@
+/**
+ * Helpers for the downscaled image variants the backend generates at upload time.
+ */
+
+// { thumb: { webp: url, avif: url }, medium: { ... } }
+export type ImageVariants = Record<string, Record<string, string>>;
+
+export interface HasImage {
+  image: string;
+  image_variants?: ImageVariants;
+}
+
+/**
+ * URL of a display-sized variant, falling back to the original while the item is still processing.
+ */
+export const variantUrl = (item: HasImage, variant: 'thumb' | 'medium' = 'thumb'): string =>
+  item.image_variants?.[variant]?.webp ?? item.image;
@@ -0,0 +1,25 @@
+/**
+ * generate_outfit returns every item once, keyed by id, and outfits that refer to them:
+ *   { items: { "12": {...} }, outfits: [{ base: 12, top: 40, shoes: 7, score, ... }] }
+ * resolveOutfits turns that back into outfits with the item objects inlined.
+ */
+
+const ITEM_SLOTS = ['base', 'top', 'bottom', 'shoes', 'outerwear'] as const;
+
+export interface OutfitResponse<Item> {
+  items: Record<string, Item>;
+  outfits: Record<string, unknown>[];
+}
+
+export function resolveOutfits<Item, Outfit>(data: OutfitResponse<Item>): Outfit[] {
+  return data.outfits.map((outfit) => {
+    const resolved: Record<string, unknown> = { ...outfit };
+    for (const slot of ITEM_SLOTS) {
+      const id = outfit[slot];
+      if (id !== undefined && id !== null) {
+        resolved[slot] = data.items[String(id)];
+      }
+    }
+    return resolved as Outfit;
+  });
+}
@@ -0,0 +1,24 @@
+/**
+ * The wardrobe list endpoint is cursor-paginated: { next, previous, results }.
+ */
+export interface Page<T> {
+  next: string | null;
+  previous: string | null;
+  results: T[];
+}
+
+/**
+ * Follow `next` links until the last page and return every result.
+ */
+export async function fetchAllPages<T>(url: string, init?: RequestInit): Promise<T[]> {
+  const results: T[] = [];
+  let next: string | null = url;
+  while (next) {
+    const res = await fetch(next, init);
+    if (!res.ok) throw new Error('Failed to fetch wardrobe items.');
+    const page: Page<T> = await res.json();
+    results.push(...page.results);
+    next = page.next;
+  }
+  return results;
+}
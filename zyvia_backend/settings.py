@@ -154,3 +154,65 @@ LOGGING = {
     },
 }
 CORS_ALLOW_ALL_ORIGINS = True
+
+# --- Wardrobe ML Configuration ---
+# The CLIP model used for image embeddings. It is loaded once per worker process.
+WARDROBE_EMBEDDING_MODEL = 'ViT-B-32'
+WARDROBE_EMBEDDING_PRETRAINED = 'laion2b_s34b_b79k'
+# Load the embedding model when the app starts instead of on the first upload.
+WARDROBE_WARM_UP_EMBEDDING_MODEL = os.environ.get('WARDROBE_WARM_UP_EMBEDDING_MODEL', '') == '1'
+# Inference backend: 'torch' (eager fp32), or 'onnx' / 'onnx-int8' (onnxruntime on the image tower
+# exported by `manage.py export_onnx_model`; int8 is dynamically quantized).
+WARDROBE_EMBEDDING_BACKEND = os.environ.get('WARDROBE_EMBEDDING_BACKEND', 'torch')
+WARDROBE_ONNX_DIR = MEDIA_ROOT / 'models'
+# How many users' embedding matrices each worker keeps in memory for similarity search.
+WARDROBE_EMBEDDING_CACHE_USERS = 256
+# Text search: queries whose CLIP text embeddings each worker keeps, and the precomputed
+# vocabulary written by `manage.py precompute_text_embeddings`.
+WARDROBE_TEXT_EMBEDDING_CACHE_SIZE = 1024
+WARDROBE_TEXT_VOCABULARY_PATH = MEDIA_ROOT / 'indexes' / 'text_vocabulary.npz'
+# Catalog-wide nearest-neighbour index: 'auto' (faiss, then hnswlib, then exact), 'faiss', 'hnswlib', 'exact'
+# or 'pca-int8' (compressed codes with exact re-ranking).
+WARDROBE_ANN_BACKEND = 'auto'
+WARDROBE_ANN_INDEX_DIR = MEDIA_ROOT / 'indexes' / 'catalog'
+# PCA + int8 codes used by the 'pca-int8' ANN backend; written by `manage.py fit_embedding_codec`.
+WARDROBE_EMBEDDING_CODEC_PATH = MEDIA_ROOT / 'indexes' / 'embedding_codec.npz'
+# How many users' pairwise compatibility matrices each worker keeps for outfit scoring.
+WARDROBE_COMPATIBILITY_CACHE_USERS = 64
+# 'async': uploads return immediately with status 'processing' and `manage.py run_ingestion_worker`
+# computes the embedding and palette. 'sync': compute them inside the upload request.
+WARDROBE_INGESTION_MODE = os.environ.get('WARDROBE_INGESTION_MODE', 'async')
+# Palette extractor: 'kmeans' or 'median_cut' (NumPy, on a thumbnail) or 'colorthief' (legacy).
+WARDROBE_PALETTE_ENGINE = os.environ.get('WARDROBE_PALETTE_ENGINE', 'kmeans')
+# Drop a flat studio backdrop before clustering so it can't become the primary colour.
+WARDROBE_PALETTE_MASK_BACKGROUND = True
+# Also write AVIF variants when Pillow was built with AVIF support (WebP is always written).
+WARDROBE_IMAGE_AVIF = True
+# Uploads whose perceptual hash is within this many bits of a processed item reuse its
+# embedding and palette (at most 3, the band index's guarantee). None: exact duplicates only.
+WARDROBE_DEDUP_MAX_DISTANCE = 3
+
+# --- Recommendation response cache ---
+# 'locmem' (per process), 'file' (shared by processes on one host) or 'redis' (needs redis-py).
+WARDROBE_CACHE_BACKEND = os.environ.get('WARDROBE_CACHE_BACKEND', 'locmem')
+_RECOMMENDATION_CACHES = {
+    'locmem': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'wardrobe-recommendations',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+    'file': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('WARDROBE_CACHE_DIR', str(BASE_DIR / '.cache' / 'recommendations')),
+    },
+    'redis': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ.get('REDIS_URL', 'redis://127.0.0.1:6379/1'),
+    },
+}
+CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'recommendations': _RECOMMENDATION_CACHES[WARDROBE_CACHE_BACKEND],
+}
+# Cached recommendation responses are keyed by wardrobe version, so this only bounds memory.
+WARDROBE_RESPONSE_CACHE_TIMEOUT = 24 * 3600